@@ -1,58 +1,201 @@
+import hashlib
 import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Optional
-from pydantic import BaseModel
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple
+from pydantic import BaseModel, Field
 
 # Path to the tag master JSON file
-TAG_MASTER_PATH = Path(__file__).parent / "tag_master.json"
+TAG_MASTER_PATH = Path(os.environ.get("TAG_MASTER_PATH", Path(__file__).parent / "tag_master.json"))
+# Per-tenant overrides live in <dir>/<tenant>.json. Fields present in an override
+# replace the base lists; synonyms are merged per tag.
+TAG_MASTER_OVERRIDES_DIR = Path(os.environ.get("TAG_MASTER_OVERRIDES_DIR", "data/tag_masters"))
+# How often get_instance() checks the files' mtimes; 0 disables automatic reload.
+TAG_MASTER_RELOAD_INTERVAL_SECONDS = float(os.environ.get("TAG_MASTER_RELOAD_INTERVAL_SEC", "5"))
+# Most recently used tenant snapshots kept in memory; older ones are rebuilt on demand.
+TAG_MASTER_TENANT_CACHE_SIZE = int(os.environ.get("TAG_MASTER_TENANT_CACHE_SIZE", "256"))
+_TENANT_PATTERN = re.compile(r"[A-Za-z0-9_.-]+")
 
 class TagMasterData(BaseModel):
     doc_types: List[str]
     topics: List[str]
     states: List[str]
     extras: List[str]
+    # Alternative spellings per tag, used by the local tagger.
+    synonyms: Dict[str, List[str]] = Field(default_factory=dict)
+
+# (mtime_ns, size) per source file; None when the file does not exist.
+_Fingerprint = Tuple[Optional[Tuple[int, int]], ...]
+
+
+def _file_fingerprint(path: Optional[Path]) -> Optional[Tuple[int, int]]:
+    if path is None:
+        return None
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _override_path(tenant: str) -> Optional[Path]:
+    if not _TENANT_PATTERN.fullmatch(tenant) or tenant.startswith("."):
+        return None
+    return TAG_MASTER_OVERRIDES_DIR / f"{tenant}.json"
+
 
 class TagMaster:
+    """
+    Immutable snapshot of the tag vocabulary. get_instance() returns the
+    current snapshot for the process (or a tenant); a changed file or reload()
+    swaps in a new snapshot, so a caller holding one always sees a consistent set.
+    """
     _instance: Optional['TagMaster'] = None
+    _tenants: "OrderedDict[str, TagMaster]" = OrderedDict()
+    # Reentrant: tenant snapshots are built (and numbered) while it is held.
+    _lock = threading.RLock()
+    _checked_at = 0.0
+    _revision = 0
     data: TagMasterData
 
-    def __init__(self):
-        if not TAG_MASTER_PATH.exists():
-            raise FileNotFoundError(f"Tag master file not found at {TAG_MASTER_PATH}")
-        
-        with open(TAG_MASTER_PATH, "r", encoding="utf-8") as f:
-            raw_data = json.load(f)
-            self.data = TagMasterData(**raw_data)
+    def __init__(self, data: TagMasterData, version: str, fingerprint: _Fingerprint = (), tenant: Optional[str] = None):
+        self.data = data
+        # Content hash of the vocabulary; part of classification cache keys.
+        self.version = version
+        self.tenant = tenant
+        self.fingerprint = fingerprint
+        # Increases with every snapshot built in this process.
+        with TagMaster._lock:
+            TagMaster._revision += 1
+            self.revision = TagMaster._revision
+        self._doc_types = tuple(data.doc_types)
+        self._topics = tuple(data.topics)
+        self._states = tuple(data.states)
+        self._extras = tuple(data.extras)
+        self._synonyms = MappingProxyType({tag: tuple(values) for tag, values in data.synonyms.items()})
+        self._valid = {
+            "doc_type": frozenset(self._doc_types),
+            "topic": frozenset(self._topics),
+            "state": frozenset(self._states),
+            "extra": frozenset(self._extras),
+        }
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None, override_path: Optional[Path] = None, tenant: Optional[str] = None) -> 'TagMaster':
+        path = path or TAG_MASTER_PATH
+        if not path.exists():
+            raise FileNotFoundError(f"Tag master file not found at {path}")
+
+        raw = path.read_bytes()
+        payload = json.loads(raw.decode("utf-8"))
+        digest = hashlib.sha256(raw)
+        if override_path is not None and override_path.exists():
+            override_raw = override_path.read_bytes()
+            override = json.loads(override_raw.decode("utf-8"))
+            synonyms = {**payload.get("synonyms", {}), **override.pop("synonyms", {})}
+            payload = {**payload, **override, "synonyms": synonyms}
+            digest.update(b"\0" + override_raw)
+        fingerprint = (_file_fingerprint(path), _file_fingerprint(override_path))
+        return cls(TagMasterData(**payload), digest.hexdigest()[:16], fingerprint, tenant)
 
     @classmethod
-    def get_instance(cls) -> 'TagMaster':
+    def get_instance(cls, tenant: Optional[str] = None) -> 'TagMaster':
+        """Current snapshot for the tenant (or the base vocabulary)."""
         if cls._instance is None:
-            cls._instance = cls()
-        return cls._instance
+            cls.reload()
+        elif TAG_MASTER_RELOAD_INTERVAL_SECONDS > 0 and time.monotonic() - cls._checked_at >= TAG_MASTER_RELOAD_INTERVAL_SECONDS:
+            cls._reload_if_changed()
+        override_path = _override_path(tenant) if tenant else None
+        if override_path is None:
+            # No tenant, or a name that cannot have an override file: never cached.
+            return cls._instance
+        with cls._lock:
+            snapshot = cls._tenants.get(tenant)
+            if snapshot is not None:
+                cls._tenants.move_to_end(tenant)
+                return snapshot
+            if override_path.exists():
+                try:
+                    snapshot = cls.load(override_path=override_path, tenant=tenant)
+                except (OSError, ValueError) as e:
+                    print(f"Tag master override for {tenant} is invalid: {e}")
+                    return cls._instance
+            else:
+                # Remembered too, so tenants without overrides cost no stat per call.
+                snapshot = cls._instance
+            cls._tenants[tenant] = snapshot
+            while len(cls._tenants) > max(1, TAG_MASTER_TENANT_CACHE_SIZE):
+                cls._tenants.popitem(last=False)
+        return snapshot
+
+    @classmethod
+    def reload(cls) -> 'TagMaster':
+        """Rebuilds the base snapshot and drops cached tenant snapshots."""
+        snapshot = cls.load()
+        with cls._lock:
+            cls._instance = snapshot
+            cls._tenants = OrderedDict()
+            cls._checked_at = time.monotonic()
+        return snapshot
+
+    @classmethod
+    def _reload_if_changed(cls) -> None:
+        cls._checked_at = time.monotonic()
+        current = cls._instance
+        if current is not None and current.fingerprint[0] != _file_fingerprint(TAG_MASTER_PATH):
+            try:
+                cls.reload()
+            except (OSError, ValueError) as e:
+                # Keep serving the last good snapshot while the file is being edited.
+                print(f"Tag master reload failed: {e}")
+            return
+        stale = [
+            tenant for tenant, snapshot in list(cls._tenants.items())
+            if snapshot.fingerprint[1] != _file_fingerprint(_override_path(tenant))
+        ]
+        if stale:
+            with cls._lock:
+                cls._tenants = OrderedDict(
+                    (key, value) for key, value in cls._tenants.items() if key not in stale
+                )
+
+    @property
+    def doc_types(self) -> Tuple[str, ...]:
+        return self._doc_types
 
     @property
-    def doc_types(self) -> List[str]:
-        return self.data.doc_types
+    def topics(self) -> Tuple[str, ...]:
+        return self._topics
 
     @property
-    def topics(self) -> List[str]:
-        return self.data.topics
+    def states(self) -> Tuple[str, ...]:
+        return self._states
 
     @property
-    def states(self) -> List[str]:
-        return self.data.states
+    def extras(self) -> Tuple[str, ...]:
+        return self._extras
 
     @property
-    def extras(self) -> List[str]:
-        return self.data.extras
+    def synonyms(self) -> Mapping[str, Tuple[str, ...]]:
+        return self._synonyms
 
     def validate_tag(self, category: str, value: str) -> bool:
-        if category == "doc_type":
-            return value in self.data.doc_types
-        if category == "topic":
-            return value in self.data.topics
-        if category == "state":
-            return value in self.data.states
-        if category == "extra":
-            return value in self.data.extras
-        return False
+        valid = self._valid.get(category)
+        return valid is not None and value in valid
+
+    def describe(self) -> Dict[str, object]:
+        return {
+            "version": self.version,
+            "revision": self.revision,
+            "tenant": self.tenant,
+            "doc_types": list(self._doc_types),
+            "topics": list(self._topics),
+            "states": list(self._states),
+            "extras": list(self._extras),
+            "synonyms": {tag: list(values) for tag, values in self._synonyms.items()},
+        }
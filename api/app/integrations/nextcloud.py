@@ -5,16 +5,21 @@ import json
 import logging
 import os
 import time
-from collections import deque
+from contextlib import asynccontextmanager, nullcontext
 from dataclasses import dataclass, field
 from datetime import datetime
 from email.utils import parsedate_to_datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence
+from typing import Any, AsyncContextManager, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
 from urllib.parse import urljoin, urlparse, unquote
+from xml.sax.saxutils import escape as xml_escape
 
 import httpx
 
+from ..services.http_client import get_http_client, h2_installed, request_timeout
+from ..services.multipart import MULTIPART_CHUNK_BYTES, MultipartStream
+from ..services.rate_limit import Clock, TokenBucket
+
 logger = logging.getLogger(__name__)
 
 _PROPFIND_BODY = """<?xml version="1.0" encoding="UTF-8"?>
@@ -28,6 +33,29 @@ _PROPFIND_BODY = """<?xml version="1.0" encoding="UTF-8"?>
   </d:prop>
 </d:propfind>
 """
+_DAV_NS = {"d": "DAV:"}
+
+_SYNC_COLLECTION_BODY = """<?xml version="1.0" encoding="UTF-8"?>
+<d:sync-collection xmlns:d="DAV:">
+  <d:sync-token>{token}</d:sync-token>
+  <d:sync-level>infinite</d:sync-level>
+  <d:prop>
+    <d:getlastmodified/>
+    <d:getetag/>
+    <d:getcontentlength/>
+    <d:getcontenttype/>
+    <d:resourcetype/>
+  </d:prop>
+</d:sync-collection>
+"""
+
+# Answers to a sync-collection REPORT from servers that don't implement it.
+_SYNC_COLLECTION_REFUSED = {400, 403, 405, 415, 501}
+
+# Responses meaning "no Depth: infinity here" (RFC 4918 §9.1 suggests 403 with
+# propfind-finite-depth; some servers answer 400 or 501 instead).
+_DEPTH_INFINITY_REFUSED = {400, 403, 405, 501}
+
 
 
 def _env_bool(name: str, default: bool) -> bool:
@@ -59,6 +87,24 @@ class NextcloudSettings:
     max_file_bytes: int = 200 * 1024 * 1024
     state_file: Path = Path("data/nextcloud/state.json")
     timeout_seconds: int = 60
+    # Connection pool shared by every WebDAV request (see build_webdav_http_client).
+    max_connections: int = 10
+    max_keepalive: int = 10
+    keepalive_expiry_seconds: float = 30.0
+    http2: bool = False
+    # Recursive scans: try Depth: infinity first, else walk with this many listings in flight.
+    depth_infinity: bool = True
+    walk_concurrency: int = 4
+    # Incremental sync: try the RFC 6578 sync-collection REPORT before folder ETags.
+    sync_collection: bool = True
+    # Files downloaded and forwarded at once by a scan.
+    scan_concurrency: int = 4
+    # Request budgets (see NextcloudRateLimiter); rate_limit_per_min covers metadata
+    # requests, 0 means "same as rate_limit_per_min" / one minute's worth / unlimited.
+    downloads_per_min: int = 0
+    rate_limit_burst: int = 0
+    download_bytes_per_sec: int = 0
+    max_in_flight: int = 0
 
     @classmethod
     def from_env(cls) -> NextcloudSettings | None:
@@ -83,6 +129,7 @@ class NextcloudSettings:
         )
         state_file.parent.mkdir(parents=True, exist_ok=True)
         timeout = _maybe_int(os.getenv("NEXTCLOUD_TIMEOUT_SEC"), 60)
+        max_connections = max(1, _maybe_int(os.getenv("NEXTCLOUD_MAX_CONNECTIONS"), 10))
         return cls(
             base.rstrip("/"),
             username,
@@ -93,6 +140,18 @@ class NextcloudSettings:
             max(1, max_file_bytes),
             state_file,
             max(10, timeout),
+            max_connections=max_connections,
+            max_keepalive=max(0, _maybe_int(os.getenv("NEXTCLOUD_MAX_KEEPALIVE"), max_connections)),
+            keepalive_expiry_seconds=float(_maybe_int(os.getenv("NEXTCLOUD_KEEPALIVE_EXPIRY_SEC"), 30)),
+            http2=_env_bool("NEXTCLOUD_HTTP2", False),
+            depth_infinity=_env_bool("NEXTCLOUD_DEPTH_INFINITY", True),
+            walk_concurrency=max(1, _maybe_int(os.getenv("NEXTCLOUD_WALK_CONCURRENCY"), 4)),
+            sync_collection=_env_bool("NEXTCLOUD_SYNC_COLLECTION", True),
+            scan_concurrency=max(1, _maybe_int(os.getenv("NEXTCLOUD_SCAN_CONCURRENCY"), 4)),
+            downloads_per_min=max(0, _maybe_int(os.getenv("NEXTCLOUD_DOWNLOADS_PER_MIN"), 0)),
+            rate_limit_burst=max(0, _maybe_int(os.getenv("NEXTCLOUD_RATELIMIT_BURST"), 0)),
+            download_bytes_per_sec=max(0, _maybe_int(os.getenv("NEXTCLOUD_DOWNLOAD_BYTES_PER_SEC"), 0)),
+            max_in_flight=max(0, _maybe_int(os.getenv("NEXTCLOUD_MAX_IN_FLIGHT"), 0)),
         )
 
 
@@ -148,34 +207,193 @@ class NextcloudEntry:
     size: Optional[int]
 
 
-class SimpleRateLimiter:
-    """Coarse per-minute limiter to avoid hammering WebDAV."""
+class SyncTokenInvalid(Exception):
+    """The server no longer accepts the stored sync token; start a full sync."""
+
+
+class SyncCollectionUnsupported(Exception):
+    """The server does not implement the RFC 6578 sync-collection REPORT."""
+
+
+@dataclass(slots=True)
+class SyncChanges:
+    changed: List[NextcloudEntry]
+    removed: List[str]
+    token: Optional[str]
+    truncated: bool = False
+
+
+# Called after each file of a scan with the running totals and the file's result
+# (None when the file disappeared before it could be fetched).
+ScanProgressCallback = Callable[[Dict[str, Any], Optional[Dict[str, Any]]], None]
+
 
-    def __init__(self, limit_per_minute: int) -> None:
-        self.limit = max(1, limit_per_minute)
-        self._events: deque[float] = deque(maxlen=self.limit)
+def _outcome(result: Dict[str, Any]) -> str:
+    status = result.get("status")
+    return status if status in ("ingested", "skipped") else "errors"
 
-    async def wait(self) -> None:
-        now = time.monotonic()
-        window = 60.0
-        while self._events and now - self._events[0] > window:
-            self._events.popleft()
-        if len(self._events) >= self.limit:
-            sleep_for = window - (now - self._events[0])
-            if sleep_for > 0:
-                await asyncio.sleep(sleep_for)
-        self._events.append(time.monotonic())
+
+def _summarize(processed: List[Dict[str, Any]]) -> Dict[str, int]:
+    summary = {"ingested": 0, "skipped": 0, "errors": 0}
+    for item in processed:
+        summary[_outcome(item)] += 1
+    return summary
+
+
+def _throttled(throttle: Optional[Callable[[], AsyncContextManager[Any]]]) -> AsyncContextManager[Any]:
+    return throttle() if throttle is not None else nullcontext()
+
+
+def _parse_multistatus(payload: str) -> Any:
+    import xml.etree.ElementTree as ET
+
+    try:
+        return ET.fromstring(payload)
+    except ET.ParseError as exc:  # pragma: no cover - network data
+        raise RuntimeError(f"Failed to parse WebDAV response: {exc}") from exc
+
+
+class NextcloudRateLimiter:
+    """
+    Request and bandwidth budgets for WebDAV. Metadata requests (PROPFIND,
+    REPORT) and downloads draw from separate per-minute token buckets with a
+    burst capacity, download bodies from an optional bytes/sec bucket, and at
+    most `max_in_flight` requests run at once. Tokens are reserved without
+    awaiting in between, so concurrent callers queue behind one another
+    instead of overshooting. Clock and sleep are injectable for tests.
+    """
+
+    def __init__(
+        self,
+        *,
+        metadata_per_min: float,
+        downloads_per_min: float,
+        burst: Optional[float] = None,
+        download_bytes_per_sec: float = 0,
+        max_in_flight: int = 0,
+        clock: Clock = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self._metadata = TokenBucket(metadata_per_min / 60.0, burst or metadata_per_min, clock=clock)
+        self._downloads = TokenBucket(downloads_per_min / 60.0, burst or downloads_per_min, clock=clock)
+        # Bandwidth bursts up to one second's worth.
+        self._bandwidth = (
+            TokenBucket(download_bytes_per_sec, download_bytes_per_sec, clock=clock)
+            if download_bytes_per_sec > 0
+            else None
+        )
+        self._slots = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._sleep = sleep
+
+    @classmethod
+    def from_settings(cls, settings: NextcloudSettings) -> NextcloudRateLimiter:
+        return cls(
+            metadata_per_min=settings.rate_limit_per_min,
+            downloads_per_min=settings.downloads_per_min or settings.rate_limit_per_min,
+            burst=settings.rate_limit_burst or None,
+            download_bytes_per_sec=settings.download_bytes_per_sec,
+            max_in_flight=settings.max_in_flight or settings.max_connections,
+        )
+
+    async def _take(self, bucket: TokenBucket, amount: float) -> None:
+        delay = bucket.reserve(amount)
+        if delay <= 0:
+            return
+        try:
+            await self._sleep(delay)
+        except asyncio.CancelledError:
+            # Hand the reservation back so callers queued behind it move up.
+            bucket.adjust(min(amount, bucket.capacity))
+            raise
+
+    @asynccontextmanager
+    async def _request(self, bucket: TokenBucket) -> AsyncIterator[None]:
+        await self._take(bucket, 1)
+        if self._slots is not None:
+            await self._slots.acquire()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    def metadata(self) -> AsyncContextManager[None]:
+        """Wrap one PROPFIND/REPORT request."""
+        return self._request(self._metadata)
+
+    def download(self) -> AsyncContextManager[None]:
+        """Wrap one download, including reading its body."""
+        return self._request(self._downloads)
+
+    async def throttle_bytes(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+        """Passes a download body through at no more than the bytes/sec budget."""
+        async for chunk in chunks:
+            if self._bandwidth is not None:
+                remaining = len(chunk)
+                while remaining > 0:
+                    piece = min(remaining, self._bandwidth.capacity)
+                    await self._take(self._bandwidth, piece)
+                    remaining -= piece
+            yield chunk
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "metadata_tokens": round(self._metadata.available, 2),
+            "download_tokens": round(self._downloads.available, 2),
+            "download_bytes_available": (
+                int(self._bandwidth.available) if self._bandwidth is not None else None
+            ),
+        }
+
+
+def build_webdav_http_client(settings: NextcloudSettings) -> httpx.AsyncClient:
+    """
+    Long-lived authenticated client for the Nextcloud server. Keep-alive
+    connections are reused across stats, listings and downloads, so a scan
+    pays the TCP/TLS handshake once per pooled connection rather than per request.
+    HTTP/2 is used when enabled and the h2 package is installed.
+    """
+    return httpx.AsyncClient(
+        auth=(settings.username, settings.password),
+        verify=settings.verify_tls,
+        http2=settings.http2 and h2_installed(),
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive,
+            keepalive_expiry=settings.keepalive_expiry_seconds,
+        ),
+        timeout=settings.timeout_seconds,
+    )
 
 
 class NextcloudWebDAVClient:
     """Minimal WebDAV client for the specific operations we need."""
 
-    def __init__(self, settings: NextcloudSettings) -> None:
+    def __init__(self, settings: NextcloudSettings, http: Optional[httpx.AsyncClient] = None) -> None:
         self.settings = settings
-        self._auth = (settings.username, settings.password)
+        # Owned by the runtime when passed in; otherwise created on first use.
+        self._http = http
+        # Learned from the first recursive listing: None until tried.
+        self._infinity_supported: Optional[bool] = None
         parsed = urlparse(settings.base_url)
         self._base_path = parsed.path.rstrip("/")
 
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = build_webdav_http_client(self.settings)
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+
     def _normalize_path(self, path: str) -> str:
         cleaned = "/" + path.strip()
         cleaned = cleaned.replace("//", "/")
@@ -191,12 +409,7 @@ class NextcloudWebDAVClient:
     async def propfind(self, path: str, depth: str = "0") -> List[NextcloudEntry]:
         url = self._build_url(path)
         headers = {"Depth": depth, "Content-Type": "application/xml; charset=utf-8"}
-        async with httpx.AsyncClient(
-            auth=self._auth,
-            verify=self.settings.verify_tls,
-            timeout=self.settings.timeout_seconds,
-        ) as client:
-            resp = await client.request("PROPFIND", url, headers=headers, content=_PROPFIND_BODY)
+        resp = await self.http.request("PROPFIND", url, headers=headers, content=_PROPFIND_BODY)
         if resp.status_code not in (200, 207):
             resp.raise_for_status()
         return self._parse_propfind_response(resp.text)
@@ -206,78 +419,226 @@ class NextcloudWebDAVClient:
         normalized = self._normalize_path(path)
         return [entry for entry in entries if entry.path != normalized]
 
+    async def walk(
+        self,
+        path: str,
+        *,
+        concurrency: int = 4,
+        throttle: Optional[Callable[[], AsyncContextManager[Any]]] = None,
+    ) -> List[NextcloudEntry]:
+        """
+        Every entry below `path` (files and folders, excluding `path` itself).
+        Tries a single Depth: infinity PROPFIND; servers that refuse it (Nextcloud
+        does by default) are remembered and walked breadth-first instead, with
+        up to `concurrency` Depth: 1 listings in flight. Each request runs
+        inside `throttle()` when given.
+        """
+        root = self._normalize_path(path).rstrip("/") or "/"
+        if self.settings.depth_infinity and self._infinity_supported is not False:
+            try:
+                async with _throttled(throttle):
+                    entries = await self.propfind(root, depth="infinity")
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code not in _DEPTH_INFINITY_REFUSED:
+                    raise
+                logger.info("WebDAV server refused Depth: infinity (%s); walking the tree", exc.response.status_code)
+                self._infinity_supported = False
+            else:
+                self._infinity_supported = True
+                return [entry for entry in entries if entry.path.rstrip("/") != root.rstrip("/")]
+
+        limit = asyncio.Semaphore(max(1, concurrency))
+        found: List[NextcloudEntry] = []
+        seen = {root.rstrip("/")}
+
+        async def _list(folder: str) -> List[NextcloudEntry]:
+            async with limit, _throttled(throttle):
+                return await self.list_folder(folder)
+
+        level = [root]
+        while level:
+            listings = await asyncio.gather(*(_list(folder) for folder in level))
+            level = []
+            for entries in listings:
+                for entry in entries:
+                    key = entry.path.rstrip("/")
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    found.append(entry)
+                    if entry.is_dir:
+                        level.append(entry.path)
+        return found
+
+    async def changed_entries(
+        self,
+        path: str,
+        known_etags: Dict[str, str],
+        *,
+        concurrency: int = 4,
+        throttle: Optional[Callable[[], AsyncContextManager[Any]]] = None,
+    ) -> Tuple[List[NextcloudEntry], Dict[str, str]]:
+        """
+        Walks only the folders whose ETag differs from `known_etags` (a folder's
+        ETag changes whenever anything below it does), so an unchanged tree costs
+        one request. Returns the entries (files and subfolders) listed in the
+        visited folders and the current ETags of those folders, keyed by path
+        without trailing slash.
+        """
+        root = self._normalize_path(path).rstrip("/") or "/"
+        async with _throttled(throttle):
+            root_entry = await self.stat(root)
+        if root_entry is None or not root_entry.is_dir:
+            raise FileNotFoundError(f"No folder at {root}")
+        if root_entry.etag and known_etags.get(root) == root_entry.etag:
+            return [], {}
+
+        limit = asyncio.Semaphore(max(1, concurrency))
+        listed: List[NextcloudEntry] = []
+        etags: Dict[str, str] = {root: root_entry.etag} if root_entry.etag else {}
+
+        async def _list(folder: str) -> List[NextcloudEntry]:
+            async with limit, _throttled(throttle):
+                return await self.list_folder(folder)
+
+        level = [root]
+        seen = {root}
+        while level:
+            listings = await asyncio.gather(*(_list(folder) for folder in level))
+            level = []
+            for entries in listings:
+                for entry in entries:
+                    key = entry.path.rstrip("/") or "/"
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    listed.append(entry)
+                    if entry.is_dir and (not entry.etag or known_etags.get(key) != entry.etag):
+                        if entry.etag:
+                            etags[key] = entry.etag
+                        level.append(key)
+        return listed, etags
+
+    async def sync_collection(self, path: str, token: Optional[str]) -> SyncChanges:
+        """
+        RFC 6578 sync-collection REPORT: everything below `path` that changed
+        since `token` (all members when token is None) plus the new token.
+        Raises SyncTokenInvalid when the server rejects the token and
+        SyncCollectionUnsupported when it does not implement the REPORT.
+        """
+        url = self._build_url(path)
+        headers = {"Depth": "0", "Content-Type": "application/xml; charset=utf-8"}
+        body = _SYNC_COLLECTION_BODY.format(token=xml_escape(token or ""))
+        resp = await self.http.request("REPORT", url, headers=headers, content=body)
+        if resp.status_code == 207:
+            return self._parse_sync_response(resp.text)
+        if token and (resp.status_code == 409 or (resp.status_code == 403 and "valid-sync-token" in resp.text)):
+            raise SyncTokenInvalid(f"sync token rejected with {resp.status_code}")
+        if resp.status_code in _SYNC_COLLECTION_REFUSED:
+            raise SyncCollectionUnsupported(f"sync-collection REPORT answered {resp.status_code}")
+        resp.raise_for_status()
+        raise SyncCollectionUnsupported(f"unexpected sync-collection status {resp.status_code}")
+
     async def stat(self, path: str) -> Optional[NextcloudEntry]:
         entries = await self.propfind(path, depth="0")
         return entries[0] if entries else None
 
     async def download(self, path: str) -> tuple[bytes, Optional[str]]:
         url = self._build_url(path)
-        async with httpx.AsyncClient(
-            auth=self._auth,
-            verify=self.settings.verify_tls,
-            timeout=self.settings.timeout_seconds,
-        ) as client:
-            resp = await client.get(url)
+        resp = await self.http.get(url)
         resp.raise_for_status()
         return resp.content, resp.headers.get("content-type")
 
-    def _parse_propfind_response(self, payload: str) -> List[NextcloudEntry]:
-        import xml.etree.ElementTree as ET
-
-        ns = {"d": "DAV:"}
-        try:
-            root = ET.fromstring(payload)
-        except ET.ParseError as exc:  # pragma: no cover - network data
-            raise RuntimeError(f"Failed to parse WebDAV response: {exc}") from exc
+    @asynccontextmanager
+    async def stream_download(self, path: str) -> AsyncIterator[Tuple[AsyncIterator[bytes], Optional[str], Optional[int]]]:
+        """
+        Opens a download and yields (chunks, content type, content length) while
+        the response is still arriving; the connection is released on exit. The
+        length is None when unknown or when it counts compressed bytes.
+        """
+        url = self._build_url(path)
+        async with self.http.stream("GET", url) as resp:
+            resp.raise_for_status()
+            length = resp.headers.get("content-length")
+            encoded = resp.headers.get("content-encoding", "identity").strip().lower() != "identity"
+            yield (
+                resp.aiter_bytes(MULTIPART_CHUNK_BYTES),
+                resp.headers.get("content-type"),
+                int(length) if length and length.isdigit() and not encoded else None,
+            )
 
+    def _parse_propfind_response(self, payload: str) -> List[NextcloudEntry]:
+        root = _parse_multistatus(payload)
         entries: List[NextcloudEntry] = []
-        for response in root.findall("d:response", ns):
-            href = response.findtext("d:href", default="", namespaces=ns) or ""
-            propstat_nodes = response.findall("d:propstat", ns)
-            prop = None
-            for node in propstat_nodes:
-                status = (node.findtext("d:status", default="", namespaces=ns) or "").strip()
-                if status.endswith(" 200 OK"):
-                    prop = node.find("d:prop", ns)
-                    break
-            if prop is None:
-                continue
-            etag = prop.findtext("d:getetag", default="", namespaces=ns) or None
-            if etag:
-                etag = etag.strip('"')
-            last_modified_raw = prop.findtext("d:getlastmodified", default="", namespaces=ns) or None
-            last_modified = None
-            if last_modified_raw:
-                try:
-                    last_modified = parsedate_to_datetime(last_modified_raw)
-                except (TypeError, ValueError):  # pragma: no cover - depends on remote server
-                    last_modified = None
-            content_length = prop.findtext("d:getcontentlength", default="", namespaces=ns) or None
-            size = None
-            if content_length:
-                try:
-                    size = int(content_length)
-                except (TypeError, ValueError):  # pragma: no cover
-                    size = None
-            content_type = prop.findtext("d:getcontenttype", default="", namespaces=ns) or None
-            resource_type = prop.find("d:resourcetype", ns)
-            is_dir = False
-            if resource_type is not None:
-                is_dir = resource_type.find("d:collection", ns) is not None
-            normalized_path = self._normalize_href(href)
-            entries.append(
-                NextcloudEntry(
-                    path=normalized_path,
-                    href=href,
-                    is_dir=is_dir,
-                    etag=etag,
-                    last_modified=last_modified,
-                    content_type=content_type,
-                    size=size,
-                )
-            )
+        for response in root.findall("d:response", _DAV_NS):
+            entry = self._entry_from_response(response)
+            if entry is not None:
+                entries.append(entry)
         return entries
 
+    def _parse_sync_response(self, payload: str) -> SyncChanges:
+        root = _parse_multistatus(payload)
+        changes = SyncChanges(changed=[], removed=[], token=None)
+        changes.token = (root.findtext("d:sync-token", default="", namespaces=_DAV_NS) or "").strip() or None
+        for response in root.findall("d:response", _DAV_NS):
+            status = (response.findtext("d:status", default="", namespaces=_DAV_NS) or "").strip()
+            href = response.findtext("d:href", default="", namespaces=_DAV_NS) or ""
+            if " 404 " in f"{status} ":
+                changes.removed.append(self._normalize_href(href))
+            elif " 507 " in f"{status} ":
+                # RFC 6578 §3.6: the server truncated the result; ask again with the new token.
+                changes.truncated = True
+            else:
+                entry = self._entry_from_response(response)
+                if entry is not None:
+                    changes.changed.append(entry)
+        return changes
+
+    def _entry_from_response(self, response: Any) -> Optional[NextcloudEntry]:
+        ns = _DAV_NS
+        href = response.findtext("d:href", default="", namespaces=ns) or ""
+        propstat_nodes = response.findall("d:propstat", ns)
+        prop = None
+        for node in propstat_nodes:
+            status = (node.findtext("d:status", default="", namespaces=ns) or "").strip()
+            if status.endswith(" 200 OK"):
+                prop = node.find("d:prop", ns)
+                break
+        if prop is None:
+            return None
+        etag = prop.findtext("d:getetag", default="", namespaces=ns) or None
+        if etag:
+            etag = etag.strip('"')
+        last_modified_raw = prop.findtext("d:getlastmodified", default="", namespaces=ns) or None
+        last_modified = None
+        if last_modified_raw:
+            try:
+                last_modified = parsedate_to_datetime(last_modified_raw)
+            except (TypeError, ValueError):  # pragma: no cover - depends on remote server
+                last_modified = None
+        content_length = prop.findtext("d:getcontentlength", default="", namespaces=ns) or None
+        size = None
+        if content_length:
+            try:
+                size = int(content_length)
+            except (TypeError, ValueError):  # pragma: no cover
+                size = None
+        content_type = prop.findtext("d:getcontenttype", default="", namespaces=ns) or None
+        resource_type = prop.find("d:resourcetype", ns)
+        is_dir = False
+        if resource_type is not None:
+            is_dir = resource_type.find("d:collection", ns) is not None
+        normalized_path = self._normalize_href(href)
+        return NextcloudEntry(
+            path=normalized_path,
+            href=href,
+            is_dir=is_dir,
+            etag=etag,
+            last_modified=last_modified,
+            content_type=content_type,
+            size=size,
+        )
+
     def _normalize_href(self, href: str) -> str:
         parsed = urlparse(href)
         path = parsed.path
@@ -318,9 +679,63 @@ class NextcloudIngestState:
                 **fingerprint,
                 "updated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
             }
-            tmp_path = self.path.with_suffix(".tmp")
-            tmp_path.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
-            tmp_path.replace(self.path)
+            self._save()
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def folder_etags(self) -> Dict[str, str]:
+        """Folder ETags recorded by the last incremental sync, keyed by path (no trailing slash)."""
+        return dict(self._data.get("folders", {}))
+
+    async def update_folders(self, etags: Dict[str, str]) -> None:
+        if not etags:
+            return
+        async with self._lock:
+            self._data.setdefault("folders", {}).update(etags)
+            self._save()
+
+    def sync_token(self, root: str) -> Optional[str]:
+        return self._data.get("sync_tokens", {}).get(root)
+
+    async def set_sync_token(self, root: str, token: Optional[str]) -> None:
+        async with self._lock:
+            tokens = self._data.setdefault("sync_tokens", {})
+            if token:
+                tokens[root] = token
+            else:
+                tokens.pop(root, None)
+            self._save()
+
+    def known_files(self) -> List[str]:
+        return list(self._data.get("files", {}))
+
+    async def forget(self, paths: Iterable[str], *, folders: Iterable[str] = ()) -> None:
+        """Drops files (and folder ETags) deleted on the server, so a re-created file is ingested again."""
+        async with self._lock:
+            files = self._data.setdefault("files", {})
+            for path in paths:
+                files.pop(path, None)
+            known_folders = self._data.get("folders", {})
+            for path in folders:
+                known_folders.pop(path, None)
+            self._save()
+
+
+async def _single_chunk(content: bytes) -> AsyncIterator[bytes]:
+    yield content
+
+
+async def _limited(chunks: AsyncIterable[bytes], max_bytes: int, path: str) -> AsyncIterator[bytes]:
+    """Passes chunks through, failing once more than max_bytes have arrived."""
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if total > max_bytes:
+            raise ValueError(f"File {path} is larger than allowed max {max_bytes} bytes")
+        yield chunk
 
 
 class RagIngestClient:
@@ -339,11 +754,17 @@ class RagIngestClient:
         self,
         *,
         file_name: str,
-        content: bytes,
+        content: Union[bytes, AsyncIterable[bytes]],
         content_type: Optional[str],
         source_path: str,
         metadata: Optional[Dict[str, Any]] = None,
+        content_length: Optional[int] = None,
     ) -> Dict[str, Any]:
+        """
+        `content` may be an async byte stream (e.g. a download in progress); it is
+        forwarded as it arrives. Pass its size as content_length when known so the
+        upload is not sent chunked.
+        """
         params = {"tenant": self.settings.tenant}
         fields = {
             "notebook_id": self.settings.notebook_id,
@@ -356,20 +777,25 @@ class RagIngestClient:
             fields["metadata"] = json.dumps(metadata, ensure_ascii=False)
         if self.settings.tags:
             fields["tags"] = ",".join(self.settings.tags)
-        files = {
-            "file": (file_name, content, content_type or "application/octet-stream"),
-        }
-        async with httpx.AsyncClient(
-            verify=self.settings.verify_tls,
-            timeout=self.settings.timeout_seconds,
-        ) as client:
-            resp = await client.post(
-                f"{self.settings.base_url}/ingest",
-                params=params,
-                headers=self._headers,
-                data=fields,
-                files=files,
-            )
+        if isinstance(content, bytes):
+            content_length = len(content)
+            content = _single_chunk(content)
+        body = MultipartStream(
+            fields,
+            file_field="file",
+            file_name=file_name,
+            content=content,
+            content_type=content_type,
+            content_length=content_length,
+        )
+        client = get_http_client(verify=self.settings.verify_tls)
+        resp = await client.post(
+            f"{self.settings.base_url}/ingest",
+            params=params,
+            headers={**self._headers, **body.headers},
+            content=body,
+            timeout=request_timeout(self.settings.timeout_seconds),
+        )
         resp.raise_for_status()
         try:
             return resp.json()
@@ -384,14 +810,19 @@ class NextcloudIngestManager:
         self,
         nc_settings: NextcloudSettings,
         rag_settings: RagIngestSettings,
+        http: Optional[httpx.AsyncClient] = None,
     ) -> None:
         self.settings = nc_settings
-        self.nextcloud = NextcloudWebDAVClient(nc_settings)
+        self.nextcloud = NextcloudWebDAVClient(nc_settings, http)
         self.rag = RagIngestClient(rag_settings)
         self.state = NextcloudIngestState(nc_settings.state_file)
-        self.rate_limiter = SimpleRateLimiter(nc_settings.rate_limit_per_min)
+        self.rate_limiter = NextcloudRateLimiter.from_settings(nc_settings)
         self._tasks: Dict[str, asyncio.Task[Any]] = {}
         self._task_lock = asyncio.Lock()
+        # Progress of the scans currently running, for the status endpoint.
+        self._scans: Dict[str, Dict[str, Any]] = {}
+        # Learned from the first incremental sync: None until tried.
+        self._sync_collection_supported: Optional[bool] = None
 
     def _fingerprint(self, entry: NextcloudEntry) -> Dict[str, Any]:
         return {
@@ -421,12 +852,15 @@ class NextcloudIngestManager:
         force: bool = False,
         reason: str = "manual",
         metadata: Optional[Dict[str, Any]] = None,
+        entry: Optional[NextcloudEntry] = None,
     ) -> Dict[str, Any]:
+        """`entry` (e.g. from a folder listing) saves the stat request when given."""
         normalized = "/" + path.strip()
         if not self._within_scope(normalized):
             raise ValueError(f"path {normalized} is outside allowed folder {self.settings.rag_folder}")
-        await self.rate_limiter.wait()
-        entry = await self.nextcloud.stat(normalized)
+        if entry is None:
+            async with self.rate_limiter.metadata():
+                entry = await self.nextcloud.stat(normalized)
         if not entry or entry.is_dir:
             raise FileNotFoundError(f"No file at {normalized}")
         fingerprint = self._fingerprint(entry)
@@ -448,7 +882,6 @@ class NextcloudIngestManager:
             raise ValueError(
                 f"File {entry.path} is larger than allowed max {self.settings.max_file_bytes} bytes"
             )
-        payload, content_type = await self.nextcloud.download(entry.path)
         metadata = metadata or {}
         metadata.update(
             {
@@ -459,13 +892,19 @@ class NextcloudIngestManager:
                 "trigger": reason,
             }
         )
-        response = await self.rag.ingest(
-            file_name=entry.path.split("/")[-1] or "document",
-            content=payload,
-            content_type=content_type or entry.content_type,
-            source_path=entry.path,
-            metadata=metadata,
-        )
+        # The download is forwarded while it arrives instead of being buffered.
+        async with self.rate_limiter.download():
+            async with self.nextcloud.stream_download(entry.path) as (chunks, content_type, length):
+                response = await self.rag.ingest(
+                    file_name=entry.path.split("/")[-1] or "document",
+                    content=self.rate_limiter.throttle_bytes(
+                        _limited(chunks, self.settings.max_file_bytes, entry.path)
+                    ),
+                    content_type=content_type or entry.content_type,
+                    source_path=entry.path,
+                    metadata=metadata,
+                    content_length=length,
+                )
         await self.state.update(entry.path, fingerprint)
         return {
             "status": "ingested",
@@ -474,33 +913,234 @@ class NextcloudIngestManager:
             "response": response,
         }
 
-    async def scan_folder(self, *, folder: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+    async def scan_folder(
+        self,
+        *,
+        folder: Optional[str] = None,
+        force: bool = False,
+        recursive: bool = False,
+        concurrency: Optional[int] = None,
+        on_progress: Optional[ScanProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Ingests the files in `folder` (its whole subtree when recursive) with
+        `concurrency` workers (default NEXTCLOUD_SCAN_CONCURRENCY).
+        """
         target = folder or self.settings.rag_folder
-        entries = await self.nextcloud.list_folder(target)
-        processed: List[Dict[str, Any]] = []
-        for entry in entries:
-            if entry.is_dir:
-                continue
+        if recursive:
+            entries = await self.nextcloud.walk(
+                target,
+                concurrency=self.settings.walk_concurrency,
+                throttle=self.rate_limiter.metadata,
+            )
+        else:
+            async with self.rate_limiter.metadata():
+                entries = await self.nextcloud.list_folder(target)
+        processed = await self._ingest_entries(
+            entries, force=force, folder=target, concurrency=concurrency, on_progress=on_progress
+        )
+        return {
+            "folder": target,
+            "processed": processed,
+            "summary": _summarize(processed),
+        }
+
+    async def sync_folder(
+        self,
+        *,
+        folder: Optional[str] = None,
+        force: bool = False,
+        concurrency: Optional[int] = None,
+        on_progress: Optional[ScanProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Incremental recursive scan. Uses the RFC 6578 sync-collection REPORT
+        with the token persisted from the previous run when the server supports
+        it; otherwise only descends into folders whose ETag changed since the
+        last sync. `force` ignores stored tokens, ETags and file fingerprints.
+        """
+        root = self.nextcloud.normalize_path(folder or self.settings.rag_folder).rstrip("/") or "/"
+        if self.settings.sync_collection and self._sync_collection_supported is not False:
             try:
-                result = await self.ingest_by_path(entry.path, force=force, reason="scan")
-            except FileNotFoundError:
-                continue
-            except Exception as exc:
-                logger.warning("Failed to ingest %s: %s", entry.path, exc)
-                processed.append(
-                    {
-                        "status": "error",
-                        "path": entry.path,
-                        "error": str(exc),
-                    }
-                )
+                result = await self._sync_with_token(root, force, concurrency, on_progress)
+            except SyncCollectionUnsupported as exc:
+                logger.info("Falling back to folder ETag sync: %s", exc)
+                self._sync_collection_supported = False
+            else:
+                self._sync_collection_supported = True
+                return result
+        return await self._sync_with_etags(root, force, concurrency, on_progress)
+
+    async def _sync_with_token(
+        self,
+        root: str,
+        force: bool,
+        concurrency: Optional[int],
+        on_progress: Optional[ScanProgressCallback],
+    ) -> Dict[str, Any]:
+        token = None if force else self.state.sync_token(root)
+        changed: Dict[str, NextcloudEntry] = {}
+        removed: set[str] = set()
+        while True:
+            try:
+                async with self.rate_limiter.metadata():
+                    changes = await self.nextcloud.sync_collection(root, token)
+            except SyncTokenInvalid:
+                if token is None:
+                    raise SyncCollectionUnsupported("initial sync-collection was rejected")
+                logger.info("Stored sync token for %s expired; running a full sync", root)
+                token = None
+                changed.clear()
+                removed.clear()
                 continue
-            processed.append(result)
+            for entry in changes.changed:
+                changed[entry.path] = entry
+                removed.discard(entry.path)
+            for path in changes.removed:
+                changed.pop(path, None)
+                removed.add(path)
+            token = changes.token
+            if not changes.truncated or not token:
+                break
+        processed = await self._ingest_entries(
+            changed.values(), force=force, folder=root, concurrency=concurrency, on_progress=on_progress
+        )
+        if removed:
+            await self.state.forget(removed)
+        # On errors the old token is kept, so the failed files come back next run
+        # (files that did go through are skipped by their fingerprints).
+        if not any(item.get("status") == "error" for item in processed):
+            await self.state.set_sync_token(root, token)
         return {
-            "folder": target,
+            "folder": root,
+            "mode": "sync-collection",
             "processed": processed,
+            "removed": sorted(removed),
+            "summary": _summarize(processed),
         }
 
+    async def _sync_with_etags(
+        self,
+        root: str,
+        force: bool,
+        concurrency: Optional[int],
+        on_progress: Optional[ScanProgressCallback],
+    ) -> Dict[str, Any]:
+        entries, etags = await self.nextcloud.changed_entries(
+            root,
+            {} if force else self.state.folder_etags(),
+            concurrency=self.settings.walk_concurrency,
+            throttle=self.rate_limiter.metadata,
+        )
+        processed = await self._ingest_entries(
+            entries, force=force, folder=root, concurrency=concurrency, on_progress=on_progress
+        )
+        # A known path is gone when the deepest re-listed folder above it no longer
+        # lists the file, or the subfolder leading to it (a deleted folder takes
+        # its whole subtree along).
+        listed = {entry.path.rstrip("/") or "/" for entry in entries}
+
+        def _gone(path: str) -> bool:
+            child, parent = path, path.rsplit("/", 1)[0] or "/"
+            while parent not in etags:
+                if parent == "/":
+                    return False
+                child, parent = parent, parent.rsplit("/", 1)[0] or "/"
+            return child not in listed
+
+        removed = [path for path in self.state.known_files() if _gone(path)]
+        removed_folders = [path for path in self.state.folder_etags() if path not in etags and _gone(path)]
+        if removed or removed_folders:
+            await self.state.forget(removed, folders=removed_folders)
+        failed = [item["path"] for item in processed if item.get("status") == "error"]
+        # A folder's ETag is only recorded once everything below it went through;
+        # otherwise the next sync would skip the failed files.
+        await self.state.update_folders(
+            {
+                path: etag
+                for path, etag in etags.items()
+                if not any(failed_path.startswith(path.rstrip("/") + "/") for failed_path in failed)
+            }
+        )
+        return {
+            "folder": root,
+            "mode": "etag",
+            "processed": processed,
+            "removed": sorted(removed),
+            "summary": _summarize(processed),
+        }
+
+    async def _ingest_one(self, entry: NextcloudEntry, force: bool) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.ingest_by_path(entry.path, force=force, reason="scan", entry=entry)
+        except FileNotFoundError:
+            return None
+        except Exception as exc:
+            logger.warning("Failed to ingest %s: %s", entry.path, exc)
+            return {
+                "status": "error",
+                "path": entry.path,
+                "error": str(exc),
+            }
+
+    async def _ingest_entries(
+        self,
+        entries: Iterable[NextcloudEntry],
+        *,
+        force: bool,
+        folder: str,
+        concurrency: Optional[int] = None,
+        on_progress: Optional[ScanProgressCallback] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Ingests the files with `concurrency` workers (each download + upload is
+        one unit of work; the rate limiter still spaces the requests). Results
+        keep the listing order. Cancelling the caller cancels every worker.
+        """
+        files = [entry for entry in entries if not entry.is_dir]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+        progress = {
+            "folder": folder,
+            "total": len(files),
+            "done": 0,
+            "ingested": 0,
+            "skipped": 0,
+            "errors": 0,
+            "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        }
+        scan_id = os.urandom(8).hex()
+        self._scans[scan_id] = progress
+        pending = iter(range(len(files)))
+
+        async def _worker() -> None:
+            # Workers share one iterator, so each file is taken exactly once.
+            for index in pending:
+                result = await self._ingest_one(files[index], force)
+                results[index] = result
+                progress["done"] += 1
+                if result is not None:
+                    progress[_outcome(result)] += 1
+                if on_progress is not None:
+                    on_progress(dict(progress), result)
+
+        workers = [
+            asyncio.create_task(_worker())
+            for _ in range(min(max(1, concurrency or self.settings.scan_concurrency), len(files)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            self._scans.pop(scan_id, None)
+        return [result for result in results if result is not None]
+
+    def active_scans(self) -> List[Dict[str, Any]]:
+        return [dict(progress) for progress in self._scans.values()]
+
     async def schedule_ingest(
         self,
         path: str,
@@ -531,19 +1171,32 @@ class NextcloudIngestManager:
     def pending_tasks(self) -> int:
         return len(self._tasks)
 
+    async def aclose(self) -> None:
+        """Cancels queued ingest tasks and closes the WebDAV connection pool."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await self.nextcloud.aclose()
+
 
 @dataclass(slots=True)
 class NextcloudRuntime:
     manager: NextcloudIngestManager
     flow_token: Optional[str]
 
+    async def aclose(self) -> None:
+        """Releases the runtime's resources; called from the application lifespan."""
+        await self.manager.aclose()
+
 
 def build_runtime_from_env() -> Optional[NextcloudRuntime]:
     nc_settings = NextcloudSettings.from_env()
     if not nc_settings:
         return None
     rag_settings = RagIngestSettings.from_env()
-    manager = NextcloudIngestManager(nc_settings, rag_settings)
+    manager = NextcloudIngestManager(nc_settings, rag_settings, build_webdav_http_client(nc_settings))
     flow_token = os.getenv("NEXTCLOUD_FLOW_TOKEN") or None
     if flow_token:
         flow_token = flow_token.strip()
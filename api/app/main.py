@@ -1,8 +1,33 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from .routers import docs, files, nextcloud
+from .services.extraction import shutdown_extraction_executor
+from .services.http_client import close_http_clients
+from .services.processing import JOB_QUEUE_ENABLED, get_job_queue, stop_job_queue
+from .services.reclaimer import reclaimer
+from .services.retag import retag_job
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    reclaimer.start()
+    if JOB_QUEUE_ENABLED:
+        get_job_queue().start()
+    retag_job.resume_if_interrupted()
+    try:
+        yield
+    finally:
+        await retag_job.stop()
+        await stop_job_queue()
+        await reclaimer.stop()
+        shutdown_extraction_executor()
+        await nextcloud.close_runtime()
+        await close_http_clients()
+
 
-app = FastAPI(title="RAG Docs API")
+app = FastAPI(title="RAG Docs API", lifespan=lifespan)
 app.include_router(docs.router)
 app.include_router(files.router)
 app.include_router(nextcloud.router)
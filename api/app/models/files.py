@@ -23,6 +23,7 @@ class FileModel(BaseModel):
     mime_type: str
     size_bytes: int
     storage_path: str
+    sha256: Optional[str] = None
     created_at: str
     updated_at: str
     tags: FileTags = Field(default_factory=FileTags)
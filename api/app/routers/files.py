@@ -1,23 +1,46 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import mimetypes
+import os
+import zipfile
+from dataclasses import dataclass, field
 from datetime import datetime
-from pathlib import Path
-from typing import List, Literal, Optional
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
-import httpx
 from fastapi import APIRouter, BackgroundTasks, File, Form, HTTPException, Query, UploadFile
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+from ..core.tagging import TagMaster
 from ..integrations.nextcloud import RagIngestSettings
-from ..schemas.files import FileInfo, FileListResponse
+from ..schemas.files import BulkUploadItem, BulkUploadResponse, FileInfo, FileListResponse
 from ..services import file_storage
-from ..services.extraction import extract_text_from_file
-from ..services.llm import LLMService
+from ..services import extractors, processing, text_sidecar
+from ..services.classification_cache import classification_cache
+from ..services.extraction import EXTRACTOR_VERSION, ensure_text_sidecar_async
+from ..services.http_client import get_http_client, request_timeout
+from ..services.llm_scheduler import INTERACTIVE_PRIORITY, classification_scheduler
+from ..services.local_tagger import local_tagger
+from ..services.multipart import MultipartStream, iter_file_chunks
+from ..services.reclaimer import reclaimer
+from ..services.retag import retag_job
 
 router = APIRouter(prefix="/files", tags=["files"])
 
+BULK_UPLOAD_MAX_FILES = int(os.environ.get("FILES_BULK_MAX_FILES", "1000"))
+# Size caps for POST /files/bulk, after decompression: per stored file (each
+# zip member counts as one) and for the whole request.
+BULK_UPLOAD_MAX_FILE_BYTES = int(os.environ.get("FILES_BULK_MAX_FILE_MB", "256")) * 1024 * 1024
+BULK_UPLOAD_MAX_TOTAL_BYTES = int(os.environ.get("FILES_BULK_MAX_TOTAL_MB", "2048")) * 1024 * 1024
+# Files read and forwarded to the ingest backend at once by POST /files/link.
+LINK_CONCURRENCY = int(os.environ.get("FILES_LINK_CONCURRENCY", "4"))
+_ZIP_MIME_TYPES = {"application/zip", "application/x-zip-compressed"}
+# Single interactive uploads are processed ahead of bulk imports.
+INTERACTIVE_JOB_PRIORITY = INTERACTIVE_PRIORITY
+
 
 def _normalize_scope(value: str) -> Literal["personal", "org"]:
     normalized = value.strip().lower()
@@ -48,7 +71,7 @@ async def upload_file(
     if not payload:
         raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
-    storage_path = file_storage.store_bytes(payload, suffix=Path(file.filename or "").suffix)
+    storage_path, digest = file_storage.store_object(payload, suffix=Path(file.filename or "").suffix)
     metadata = file_storage.create_metadata(
         tenant=tenant.strip() or "default",
         user_id=user_id.strip() or "local",
@@ -59,35 +82,251 @@ async def upload_file(
         mime_type=file.content_type or "application/octet-stream",
         size_bytes=len(payload),
         storage_path=storage_path,
+        sha256=digest,
     )
     stored = file_storage.register_file(metadata)
-    
-    background_tasks.add_task(process_file_upload, stored["id"], storage_path, file.filename or "unknown")
-    
+
+    # Identical content is extracted and classified once per digest.
+    shared = file_storage.begin_object_processing(digest)
+    if shared is None:
+        await _schedule_processing(
+            background_tasks,
+            [(stored["id"], Path(stored["storage_path"]), file.filename or "unknown", digest)],
+            priority=INTERACTIVE_JOB_PRIORITY,
+        )
+    elif shared.get("tags"):
+        stored = file_storage.update_file_metadata(stored["id"], tags=shared["tags"]) or stored
+
     return _to_file_info(stored)
 
 
-async def process_file_upload(file_id: str, file_path: Path, filename: str):
+async def _schedule_processing(
+    background_tasks: BackgroundTasks,
+    items: List[processing.UploadItem],
+    *,
+    priority: int = 0,
+) -> None:
+    if not items:
+        return
+    if processing.JOB_QUEUE_ENABLED:
+        await processing.enqueue_uploads(items, priority=priority)
+    else:
+        background_tasks.add_task(processing.process_file_batch, items, priority)
+
+
+def _is_zip_upload(upload: UploadFile) -> bool:
+    if Path(upload.filename or "").suffix.lower() == ".zip":
+        return True
+    return (upload.content_type or "").lower() in _ZIP_MIME_TYPES
+
+
+class _BulkLimitExceeded(Exception):
+    """The request as a whole is over the file count or total size limit."""
+
+
+@dataclass
+class _BulkBudget:
+    """Files and bytes a bulk request may still store, plus every blob it stored."""
+
+    files: int
+    bytes: int
+    stored: List[Path] = field(default_factory=list)
+
+    def check(self, files: int, size: int) -> None:
+        if files > self.files:
+            raise _BulkLimitExceeded(f"too many files (limit {BULK_UPLOAD_MAX_FILES})")
+        if size > self.bytes:
+            raise _BulkLimitExceeded(f"upload too large (limit {BULK_UPLOAD_MAX_TOTAL_BYTES} bytes)")
+
+    def max_bytes(self) -> int:
+        return min(BULK_UPLOAD_MAX_FILE_BYTES, self.bytes)
+
+    def spend(self, path: Path, size: int) -> None:
+        self.stored.append(path)
+        self.files -= 1
+        self.bytes -= size
+
+    def too_large(self, filename: str) -> Dict[str, Any]:
+        """Item error for a file over the per-file cap; raises if the request budget ran out instead."""
+        if self.bytes < BULK_UPLOAD_MAX_FILE_BYTES:
+            raise _BulkLimitExceeded(f"upload too large (limit {BULK_UPLOAD_MAX_TOTAL_BYTES} bytes)")
+        return {"filename": filename, "error": "too_large"}
+
+
+def _store_bulk_upload(upload: UploadFile, expand_archives: bool, budget: _BulkBudget) -> List[Dict[str, Any]]:
     """
-    Background task to extract text and classify the file.
+    Streams one multipart part (or every member of a zip part) into the object store.
+    Runs in a worker thread; returns one entry per stored file or per failure.
+    Zip members are counted and their declared sizes checked against the
+    budget before anything is extracted; the byte caps are enforced again
+    while streaming, since the declared sizes can lie.
     """
+    filename = upload.filename or "uploaded-file"
+    if expand_archives and _is_zip_upload(upload):
+        entries: List[Dict[str, Any]] = []
+        with zipfile.ZipFile(upload.file) as archive:
+            members = []
+            for member in archive.infolist():
+                member_path = PurePosixPath(member.filename)
+                if member.is_dir() or member_path.name.startswith(".") or "__MACOSX" in member_path.parts:
+                    continue
+                members.append(member)
+            wanted = [member for member in members if 0 < member.file_size <= BULK_UPLOAD_MAX_FILE_BYTES]
+            budget.check(len(wanted), sum(member.file_size for member in wanted))
+            for member in members:
+                member_path = PurePosixPath(member.filename)
+                if member.file_size == 0:
+                    entries.append({"filename": member.filename, "error": "empty"})
+                    continue
+                if member.file_size > BULK_UPLOAD_MAX_FILE_BYTES:
+                    entries.append({"filename": member.filename, "error": "too_large"})
+                    continue
+                try:
+                    with archive.open(member) as source:
+                        path, digest, size = file_storage.store_stream(
+                            source, suffix=member_path.suffix, max_bytes=budget.max_bytes()
+                        )
+                except file_storage.ObjectTooLargeError:
+                    entries.append(budget.too_large(member.filename))
+                    continue
+                except Exception as exc:
+                    entries.append({"filename": member.filename, "error": f"store_failed: {exc}"})
+                    continue
+                budget.spend(path, size)
+                entries.append(
+                    {
+                        "filename": member_path.name,
+                        "folder": str(member_path.parent) if str(member_path.parent) != "." else "",
+                        "mime_type": mimetypes.guess_type(member_path.name)[0] or "application/octet-stream",
+                        "storage_path": path,
+                        "sha256": digest,
+                        "size_bytes": size,
+                    }
+                )
+        return entries
+
+    upload.file.seek(0, os.SEEK_END)
+    declared = upload.file.tell()
+    if declared == 0:
+        return [{"filename": filename, "error": "empty"}]
+    if declared > BULK_UPLOAD_MAX_FILE_BYTES:
+        return [{"filename": filename, "error": "too_large"}]
+    budget.check(1, declared)
+    upload.file.seek(0)
     try:
-        # 1. Extract text
-        text = extract_text_from_file(file_path)
-        if not text:
-            print(f"No text extracted from {filename}")
-            return
-
-        # 2. Classify with LLM
-        llm_service = LLMService()
-        tags = await llm_service.classify_document(text, filename)
-        
-        # 3. Update metadata
-        file_storage.update_file_metadata(file_id, tags=tags.dict())
-        print(f"File {file_id} tagged: {tags}")
-        
-    except Exception as e:
-        print(f"Error processing file upload for {file_id}: {e}")
+        path, digest, size = file_storage.store_stream(
+            upload.file, suffix=Path(filename).suffix, max_bytes=budget.max_bytes()
+        )
+    except file_storage.ObjectTooLargeError:
+        return [budget.too_large(filename)]
+    budget.spend(path, size)
+    return [
+        {
+            "filename": filename,
+            "folder": "",
+            "mime_type": upload.content_type or "application/octet-stream",
+            "storage_path": path,
+            "sha256": digest,
+            "size_bytes": size,
+        }
+    ]
+
+
+@router.post("/bulk", response_model=BulkUploadResponse)
+async def upload_files_bulk(
+    files: List[UploadFile] = File(...),
+    tenant: str = Form(...),
+    user_id: str = Form(...),
+    scope: str = Form("personal"),
+    folder_path: str = Form("/"),
+    notebook_id: Optional[str] = Form(default=None),
+    expand_archives: bool = Form(True),
+    background_tasks: BackgroundTasks = BackgroundTasks(),
+):
+    """
+    Stores many files (or zip archives) and commits all records in one registry transaction.
+    Per-file failures (empty, over FILES_BULK_MAX_FILE_MB) are reported without
+    failing the whole request; more than FILES_BULK_MAX_FILES files or
+    FILES_BULK_MAX_TOTAL_MB in total rejects it with 413.
+    """
+    if not files:
+        raise HTTPException(status_code=422, detail="files must not be empty")
+    tenant_value = tenant.strip() or "default"
+    user_value = user_id.strip() or "local"
+    scope_value = _normalize_scope(scope)
+    base_folder = _clean_folder_path(folder_path)
+    notebook_value = notebook_id.strip() if notebook_id else None
+
+    items: List[Optional[BulkUploadItem]] = []
+    pending: List[Tuple[int, Dict[str, Any]]] = []
+    budget = _BulkBudget(BULK_UPLOAD_MAX_FILES, BULK_UPLOAD_MAX_TOTAL_BYTES)
+    for upload in files:
+        stored_before = len(budget.stored)
+        try:
+            stored_entries = await asyncio.to_thread(_store_bulk_upload, upload, expand_archives, budget)
+        except _BulkLimitExceeded as exc:
+            # Nothing is registered yet: hand every blob this request stored to the reclaimer.
+            await asyncio.to_thread(file_storage.release_unregistered_objects, budget.stored)
+            raise HTTPException(status_code=413, detail=str(exc))
+        except Exception as exc:
+            await asyncio.to_thread(file_storage.release_unregistered_objects, budget.stored[stored_before:])
+            del budget.stored[stored_before:]
+            items.append(BulkUploadItem(filename=upload.filename or "uploaded-file", ok=False, error=str(exc)))
+            continue
+        for entry in stored_entries:
+            if entry.get("error"):
+                items.append(BulkUploadItem(filename=entry["filename"], ok=False, error=entry["error"]))
+                continue
+            folder = base_folder
+            if entry["folder"]:
+                folder = _clean_folder_path(f"{base_folder.rstrip('/')}/{entry['folder']}")
+            metadata = file_storage.create_metadata(
+                tenant=tenant_value,
+                user_id=user_value,
+                scope=scope_value,
+                folder_path=folder,
+                notebook_id=notebook_value,
+                original_name=entry["filename"],
+                mime_type=entry["mime_type"],
+                size_bytes=entry["size_bytes"],
+                storage_path=entry["storage_path"],
+                sha256=entry["sha256"],
+            )
+            pending.append((len(items), metadata))
+            items.append(None)
+
+    # Registry transactions take a file lock and rewrite the JSON; keep them off the event loop.
+    stored_records = await asyncio.to_thread(
+        file_storage.register_files, [metadata for _, metadata in pending]
+    )
+
+    # One claim transaction and one tag copy for duplicates of already-processed objects.
+    claims = await asyncio.to_thread(
+        file_storage.begin_objects_processing, [record.get("sha256") for record in stored_records]
+    )
+    shared_tags: Dict[str, Dict[str, Any]] = {}
+    batch: List[processing.UploadItem] = []
+    scheduled: set[str] = set()
+    for record in stored_records:
+        digest = record.get("sha256")
+        shared = claims.get(digest) if digest else None
+        if shared is None and not (file_storage.CONTENT_ADDRESSED and digest in scheduled):
+            if digest:
+                scheduled.add(digest)
+            batch.append((record["id"], Path(record["storage_path"]), record["original_name"], digest))
+        elif shared and shared.get("tags"):
+            shared_tags[record["id"]] = {"tags": shared["tags"]}
+    updated = {
+        record["id"]: record for record in await asyncio.to_thread(file_storage.update_files_metadata, shared_tags)
+    }
+    await _schedule_processing(background_tasks, batch)
+
+    for (slot, _), record in zip(pending, stored_records):
+        record = updated.get(record["id"], record)
+        items[slot] = BulkUploadItem(filename=record["original_name"], ok=True, file=_to_file_info(record))
+    results = [item for item in items if item is not None]
+    stored_count = sum(1 for item in results if item.ok)
+    return BulkUploadResponse(items=results, stored=stored_count, failed=len(results) - stored_count)
 
 
 @router.get("/", response_model=FileListResponse)
@@ -114,11 +353,95 @@ async def list_files(
 async def list_folders(
     tenant: Optional[str] = Query(default=None),
     user_id: Optional[str] = Query(default=None),
+    path: Optional[str] = Query(default=None),
+    recursive: bool = Query(default=False),
 ):
-    folders = file_storage.list_folders(tenant=tenant, user_id=user_id)
+    folders = file_storage.list_folders(tenant=tenant, user_id=user_id, path=path, recursive=recursive)
     return {"folders": folders}
 
 
+@router.get("/jobs")
+async def list_jobs(
+    status: Optional[str] = Query(default=None),
+    stage: Optional[str] = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=1000),
+):
+    jobs = await processing.get_job_queue().list(status=status, stage=stage, limit=limit)
+    for job in jobs:
+        job["payload"].pop("text", None)
+    return {"items": jobs, "counts": await processing.get_job_queue().counts()}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await processing.get_job_queue().get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job["payload"].pop("text", None)
+    return job
+
+
+@router.get("/classification/metrics")
+async def classification_metrics():
+    cache = await asyncio.to_thread(classification_cache.stats)
+    return {**classification_scheduler.metrics(), "cache": cache, "local_tagger": local_tagger.stats()}
+
+
+@router.get("/tag-master")
+async def get_tag_master(tenant: Optional[str] = Query(default=None)):
+    return TagMaster.get_instance(tenant).describe()
+
+
+@router.post("/tag-master/reload")
+async def reload_tag_master():
+    try:
+        snapshot = await asyncio.to_thread(TagMaster.reload)
+    except (OSError, ValueError) as exc:
+        raise HTTPException(status_code=422, detail=f"tag master reload failed: {exc}")
+    return {"version": snapshot.version, "revision": snapshot.revision}
+
+
+@router.get("/gc")
+async def gc_status():
+    return reclaimer.status()
+
+
+@router.post("/gc/reconcile")
+async def gc_reconcile(dry_run: bool = Query(default=True)):
+    return await reclaimer.reconcile(dry_run=dry_run)
+
+
+class RetagRequest(BaseModel):
+    tenant: Optional[str] = None
+    only_untagged: bool = False
+    bypass_cache: bool = False
+    # False discards an unfinished run's checkpoint and starts from the first file.
+    resume: bool = True
+
+
+@router.post("/retag", status_code=202)
+async def start_retag(request: RetagRequest):
+    try:
+        return retag_job.start(
+            tenant=request.tenant,
+            only_untagged=request.only_untagged,
+            bypass_cache=request.bypass_cache,
+            resume=request.resume,
+        )
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@router.get("/retag")
+async def retag_status():
+    return retag_job.status()
+
+
+@router.post("/retag/cancel")
+async def cancel_retag():
+    return await retag_job.cancel()
+
+
 @router.get("/{file_id}", response_model=FileInfo)
 async def get_file_info(file_id: str):
     record = file_storage.get_file(file_id)
@@ -140,6 +463,57 @@ async def download_file(file_id: str):
     )
 
 
+def _parse_page_selection(value: Optional[str]) -> Optional[set[int]]:
+    """Parses "1-3,7" into {1, 2, 3, 7}; None selects every page."""
+    if not value or not value.strip():
+        return None
+    pages: set[int] = set()
+    try:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            if "-" in part:
+                start_raw, end_raw = part.split("-", 1)
+                start, end = int(start_raw), int(end_raw)
+                if start < 1 or end < start or end - start > 10000:
+                    raise ValueError(part)
+                pages.update(range(start, end + 1))
+            else:
+                page = int(part)
+                if page < 1:
+                    raise ValueError(part)
+                pages.add(page)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="pages must look like '1-3,7'")
+    return pages or None
+
+
+@router.get("/{file_id}/text")
+async def get_file_text(file_id: str, pages: Optional[str] = Query(default=None)):
+    """
+    Streams extracted page text as NDJSON lines: {"page": n, "text": "..."}.
+    The first request for an object builds its text sidecar.
+    """
+    record = file_storage.get_file(file_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="File not found")
+    wanted = _parse_page_selection(pages)
+    storage_path = Path(record["storage_path"])
+    if extractors.find_extractor(storage_path, record.get("mime_type")) is None:
+        raise HTTPException(status_code=422, detail="Text extraction is not supported for this file type")
+    digest = record.get("sha256") or await asyncio.to_thread(file_storage.hash_file, storage_path)
+    if text_sidecar.sidecar_path(digest, EXTRACTOR_VERSION) is None:
+        if not await ensure_text_sidecar_async(storage_path, digest, record.get("mime_type")):
+            raise HTTPException(status_code=422, detail="No text could be extracted from this file")
+
+    def _stream():
+        for number, text in text_sidecar.iter_sidecar_pages(digest, EXTRACTOR_VERSION, wanted):
+            yield json.dumps({"page": number, "text": text}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_stream(), media_type="application/x-ndjson")
+
+
 class LinkRequest(BaseModel):
     tenant: str
     user_id: str
@@ -148,8 +522,84 @@ class LinkRequest(BaseModel):
     include_global: bool = False
 
 
+def _link_result_line(result: Dict[str, Any], stream: str) -> str:
+    body = json.dumps(result, ensure_ascii=False)
+    if stream == "sse":
+        return f"event: {result['event']}\ndata: {body}\n\n"
+    return body + "\n"
+
+
+async def _link_one(
+    client: Any,
+    file_id: str,
+    record: Optional[Dict[str, Any]],
+    *,
+    settings: RagIngestSettings,
+    tenant: str,
+    user_id: str,
+    notebook_id: str,
+    include_global: bool,
+    headers: Dict[str, str],
+    limit: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    """Forwards one stored file to the ingest backend; returns an `item` result instead of raising."""
+    if not record:
+        return {"event": "item", "id": file_id, "ok": False, "error": "not_found"}
+    async with limit:
+        storage_path = Path(record.get("storage_path", ""))
+        try:
+            size = (await asyncio.to_thread(storage_path.stat)).st_size
+        except Exception as exc:
+            return {"event": "item", "id": file_id, "ok": False, "error": f"read_failed: {exc}"}
+
+        metadata = {
+            "file_id": file_id,
+            "folder_path": record.get("folder_path"),
+            "uploaded_at": record.get("created_at"),
+        }
+        data = {
+            "notebook_id": notebook_id,
+            "user_id": user_id,
+            "source": "library-upload",
+            "original_path": f"{record.get('folder_path', '/')}/{record.get('original_name', '')}",
+            "include_global": "true" if include_global else "false",
+            "metadata": json.dumps(metadata, ensure_ascii=False),
+        }
+        # Streamed from disk while sending, so large files don't sit in memory.
+        body = MultipartStream(
+            data,
+            file_field="file",
+            file_name=record.get("original_name") or "file",
+            content=iter_file_chunks(storage_path),
+            content_type=record.get("mime_type"),
+            content_length=size,
+        )
+        try:
+            resp = await client.post(
+                f"{settings.base_url}/ingest",
+                params={"tenant": tenant},
+                headers={**headers, **body.headers},
+                content=body,
+                timeout=request_timeout(settings.timeout_seconds),
+            )
+            resp.raise_for_status()
+            try:
+                ingest_result = resp.json()
+            except json.JSONDecodeError:
+                ingest_result = {"status": "ok"}
+        except Exception as exc:
+            return {"event": "item", "id": file_id, "ok": False, "error": str(exc)}
+    return {"event": "item", "id": file_id, "ok": True, "ingest": ingest_result}
+
+
 @router.post("/link")
-async def link_files(payload: LinkRequest):
+async def link_files(payload: LinkRequest, stream: Optional[Literal["ndjson", "sse"]] = Query(default=None)):
+    """
+    Forwards the files to the ingest backend, up to FILES_LINK_CONCURRENCY at a
+    time, then records the notebook on every linked file in one registry write.
+    With ?stream=ndjson (or sse) each item's result is sent as soon as it is
+    known, followed by a `done` summary.
+    """
     if not payload.item_ids:
         raise HTTPException(status_code=422, detail="item_ids must not be empty")
 
@@ -164,60 +614,69 @@ async def link_files(payload: LinkRequest):
             "x-api-key": settings.api_key,
         }
 
-    successes: List[dict] = []
-    errors: List[dict] = []
-
-    async with httpx.AsyncClient(verify=settings.verify_tls, timeout=settings.timeout_seconds) as client:
-        for file_id in payload.item_ids:
-            record = file_storage.get_file(file_id)
-            if not record:
-                errors.append({"id": file_id, "error": "not_found"})
-                continue
-            storage_path = Path(record.get("storage_path", ""))
-            try:
-                content = storage_path.read_bytes()
-            except Exception as exc:
-                errors.append({"id": file_id, "error": f"read_failed: {exc}"})
-                continue
-
-            metadata = {
-                "file_id": file_id,
-                "folder_path": record.get("folder_path"),
-                "uploaded_at": record.get("created_at"),
-            }
-            data = {
-                "notebook_id": notebook_id,
-                "user_id": user_id,
-                "source": "library-upload",
-                "original_path": f"{record.get('folder_path', '/')}/{record.get('original_name', '')}",
-                "include_global": "true" if payload.include_global else "false",
-                "metadata": json.dumps(metadata, ensure_ascii=False),
-            }
-            files = {
-                "file": (
-                    record.get("original_name") or "file",
-                    content,
-                    record.get("mime_type") or "application/octet-stream",
-                )
-            }
-            try:
-                resp = await client.post(
-                    f"{settings.base_url}/ingest",
-                    params={"tenant": tenant},
+    item_ids = list(dict.fromkeys(payload.item_ids))
+    records = await asyncio.to_thread(file_storage.get_files, item_ids)
+    client = get_http_client(verify=settings.verify_tls)
+    limit = asyncio.Semaphore(max(1, LINK_CONCURRENCY))
+
+    async def _results():
+        tasks = [
+            asyncio.ensure_future(
+                _link_one(
+                    client,
+                    file_id,
+                    records.get(file_id),
+                    settings=settings,
+                    tenant=tenant,
+                    user_id=user_id,
+                    notebook_id=notebook_id,
+                    include_global=payload.include_global,
                     headers=headers,
-                    data=data,
-                    files=files,
+                    limit=limit,
                 )
-                resp.raise_for_status()
-                try:
-                    ingest_result = resp.json()
-                except json.JSONDecodeError:
-                    ingest_result = {"status": "ok"}
-                successes.append({"id": file_id, "ingest": ingest_result})
-                file_storage.update_file_metadata(file_id, notebook_id=notebook_id)
-            except Exception as exc:
-                errors.append({"id": file_id, "error": str(exc)})
+            )
+            for file_id in item_ids
+        ]
+        linked: List[str] = []
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                if result["ok"]:
+                    linked.append(result["id"])
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Record whatever reached the backend, even if the client went away mid-stream.
+            if linked:
+                await asyncio.to_thread(
+                    file_storage.update_files_metadata,
+                    {file_id: {"notebook_id": notebook_id} for file_id in linked},
+                )
+
+    if stream:
+        async def _stream():
+            linked = failed = 0
+            async for result in _results():
+                linked += result["ok"]
+                failed += not result["ok"]
+                yield _link_result_line(result, stream)
+            yield _link_result_line({"event": "done", "linked": linked, "failed": failed}, stream)
+
+        media_type = "text/event-stream" if stream == "sse" else "application/x-ndjson"
+        return StreamingResponse(_stream(), media_type=media_type)
 
+    successes: List[dict] = []
+    errors: List[dict] = []
+    async for result in _results():
+        if result["ok"]:
+            successes.append({"id": result["id"], "ingest": result["ingest"]})
+        else:
+            errors.append({"id": result["id"], "error": result["error"]})
+    # Same order as the request, whatever order the uploads finished in.
+    position = {file_id: index for index, file_id in enumerate(item_ids)}
+    successes.sort(key=lambda item: position[item["id"]])
+    errors.sort(key=lambda item: position[item["id"]])
     if not successes and errors:
         raise HTTPException(status_code=502, detail={"error": "link_failed", "detail": errors})
     return {"linked": successes, "errors": errors}
@@ -239,4 +698,5 @@ def _to_file_info(record: dict) -> FileInfo:
         created_at=datetime.fromisoformat(created_at) if isinstance(created_at, str) else datetime.utcnow(),
         updated_at=datetime.fromisoformat(updated_at) if isinstance(updated_at, str) else datetime.utcnow(),
         tags=record.get("tags"),
+        processing_failed_at=record.get("processing_failed_at"),
     )
@@ -13,6 +13,11 @@ router = APIRouter(prefix="/nextcloud", tags=["nextcloud"])
 _runtime = build_runtime_from_env()
 
 
+async def close_runtime() -> None:
+    if _runtime is not None:
+        await _runtime.aclose()
+
+
 def _require_runtime() -> NextcloudRuntime:
     if _runtime is None:
         raise HTTPException(
@@ -56,6 +61,11 @@ class ManualIngestRequest(BaseModel):
 class ScanRequest(BaseModel):
     folder: Optional[str] = None
     force: bool = False
+    recursive: bool = False
+    # Recursive, fetching only what changed since the last incremental scan.
+    incremental: bool = False
+    # Files fetched and forwarded at once; defaults to NEXTCLOUD_SCAN_CONCURRENCY.
+    concurrency: Optional[int] = Field(default=None, ge=1, le=32)
 
 
 @router.get("/status")
@@ -64,6 +74,8 @@ async def nextcloud_status(runtime: NextcloudRuntime = Depends(_require_runtime)
         "folder": runtime.manager.settings.rag_folder,
         "state_file": str(runtime.manager.settings.state_file),
         "pending_tasks": runtime.manager.pending_tasks(),
+        "scans": runtime.manager.active_scans(),
+        "rate_limit": runtime.manager.rate_limiter.metrics(),
         "flow_token": bool(runtime.flow_token),
     }
 
@@ -157,6 +169,19 @@ async def scan_folder(
     runtime: NextcloudRuntime = Depends(_require_runtime),
 ) -> Dict[str, Any]:
     try:
-        return await runtime.manager.scan_folder(folder=request.folder, force=request.force)
+        if request.incremental:
+            return await runtime.manager.sync_folder(
+                folder=request.folder,
+                force=request.force,
+                concurrency=request.concurrency,
+            )
+        return await runtime.manager.scan_folder(
+            folder=request.folder,
+            force=request.force,
+            recursive=request.recursive,
+            concurrency=request.concurrency,
+        )
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=str(exc))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc))
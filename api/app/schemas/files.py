@@ -17,6 +17,8 @@ class FileInfo(BaseModel):
     created_at: datetime
     updated_at: datetime
     tags: Optional[dict] = None
+    # Set when extraction/classification gave up on this file's content.
+    processing_failed_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -25,3 +27,16 @@ class FileInfo(BaseModel):
 class FileListResponse(BaseModel):
     items: list[FileInfo]
     count: int
+
+
+class BulkUploadItem(BaseModel):
+    filename: str
+    ok: bool
+    file: Optional[FileInfo] = None
+    error: Optional[str] = None
+
+
+class BulkUploadResponse(BaseModel):
+    items: list[BulkUploadItem]
+    stored: int
+    failed: int
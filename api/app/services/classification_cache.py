@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterator, Optional
+
+from . import file_storage
+
+CLASSIFY_CACHE_ENABLED = os.environ.get("FILES_CLASSIFY_CACHE", "true").strip().lower() in {"1", "true", "yes", "on"}
+CLASSIFY_CACHE_PATH = Path(
+    os.environ.get("FILES_CLASSIFY_CACHE_DB", file_storage.FILE_STORAGE_ROOT / "classifications.sqlite3")
+).resolve()
+CLASSIFY_CACHE_TTL_SECONDS = float(os.environ.get("FILES_CLASSIFY_CACHE_TTL_SEC", str(30 * 24 * 3600)))
+CLASSIFY_CACHE_MAX_ENTRIES = int(os.environ.get("FILES_CLASSIFY_CACHE_MAX_ENTRIES", "100000"))
+# Expired and surplus entries are pruned after this many writes.
+_PRUNE_EVERY = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS classifications (
+    key TEXT PRIMARY KEY,
+    tags TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS classifications_accessed ON classifications (accessed_at);
+"""
+
+
+def filename_features(filename: str) -> str:
+    """
+    Lower-cased name with digit runs collapsed, so recurring templates such as
+    invoice_2024-03.pdf and invoice_2024-04.pdf share an entry.
+    """
+    name = PurePosixPath(filename.replace("\\", "/")).name.lower()
+    return re.sub(r"\d+", "#", name)
+
+
+def cache_key(text: str, filename: str, tag_master_version: str, model: str) -> str:
+    material = json.dumps(
+        [text, filename_features(filename), tag_master_version, model],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """Persistent FileTags cache in SQLite with TTL and LRU size eviction."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        ttl_seconds: float = CLASSIFY_CACHE_TTL_SECONDS,
+        max_entries: int = CLASSIFY_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # The database is created on first use, so importing this module writes nothing.
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            if not self._initialized:
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+            yield conn
+        finally:
+            conn.close()
+
+    def _get_sync(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT tags, created_at FROM classifications WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds > 0 and row[1] < now - self.ttl_seconds:
+                conn.execute("DELETE FROM classifications WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE classifications SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def _put_sync(self, key: str, tags: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO classifications (key, tags, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(tags, ensure_ascii=False), now, now),
+            )
+        self._writes += 1
+        if self._writes % _PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self) -> int:
+        """Drops expired entries, then the least recently used beyond max_entries."""
+        removed = 0
+        with self._connect() as conn:
+            if self.ttl_seconds > 0:
+                removed += conn.execute(
+                    "DELETE FROM classifications WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                ).rowcount
+            removed += conn.execute(
+                "DELETE FROM classifications WHERE key IN ("
+                " SELECT key FROM classifications ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        return removed
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            tags = await asyncio.to_thread(self._get_sync, key)
+        except sqlite3.Error as exc:
+            print(f"Classification cache read failed: {exc}")
+            tags = None
+        if tags is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return tags
+
+    async def put(self, key: str, tags: Dict[str, Any]) -> None:
+        try:
+            await asyncio.to_thread(self._put_sync, key, tags)
+        except sqlite3.Error as exc:
+            print(f"Classification cache write failed: {exc}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "enabled": CLASSIFY_CACHE_ENABLED,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+classification_cache = ClassificationCache(CLASSIFY_CACHE_PATH)
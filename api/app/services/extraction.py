@@ -1,29 +1,305 @@
-import fitz  # type: ignore
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-def extract_text_from_file(file_path: Path, max_pages: int = 5) -> str:
+from . import extractors, text_sidecar
+
+# Extraction runs in worker processes so PyMuPDF parsing never blocks the event loop.
+EXTRACTION_WORKERS = max(1, int(os.environ.get("FILES_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1)))))
+EXTRACTION_TIMEOUT_SECONDS = float(os.environ.get("FILES_EXTRACT_TIMEOUT_SEC", "120"))
+# Bump whenever extraction output changes so stale text sidecars are ignored.
+EXTRACTOR_VERSION = "3"
+# Limits for the full-text sidecar built on the first GET /files/{id}/text.
+SIDECAR_MAX_PAGES = int(os.environ.get("FILES_TEXT_SIDECAR_MAX_PAGES", "2000"))
+SIDECAR_MAX_CHARS = int(os.environ.get("FILES_TEXT_SIDECAR_MAX_CHARS", "5000000"))
+# Character budget for text handed to classification.
+EXTRACT_CHAR_BUDGET = int(os.environ.get("FILES_EXTRACT_CHAR_BUDGET", "10000"))
+# Full-document extraction of large PDFs is split into page ranges that run in
+# parallel on the pool (each worker opens the document itself).
+PDF_PARALLEL_WORKERS = max(1, int(os.environ.get("FILES_PDF_PARALLEL_WORKERS", str(EXTRACTION_WORKERS))))
+PDF_PARALLEL_CHUNK_PAGES = max(1, int(os.environ.get("FILES_PDF_PARALLEL_CHUNK_PAGES", "50")))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("FILES_PDF_PARALLEL_MIN_PAGES", "100"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def extract_text_from_file(
+    file_path: Path,
+    max_pages: int = 5,
+    digest: Optional[str] = None,
+    max_chars: Optional[int] = EXTRACT_CHAR_BUDGET,
+    mime_type: Optional[str] = None,
+) -> str:
     """
-    Extracts text from a file. Currently supports PDF.
-    Limits to max_pages to avoid processing huge files for tagging.
+    Extracts text from any format with a registered extractor (see extractors.py).
+    Limits to max_pages / max_chars to avoid processing huge files for tagging.
+    Serves from the text sidecar of `digest` when one exists.
     """
+    if digest:
+        cached = text_sidecar.read_text(digest, EXTRACTOR_VERSION, max_pages, max_chars)
+        if cached is not None:
+            return cached
     try:
-        if file_path.suffix.lower() == ".pdf":
-            return _extract_pdf(file_path, max_pages)
-        # Add other formats here (docx, txt, etc.)
-        if file_path.suffix.lower() in [".txt", ".md", ".json"]:
-            return file_path.read_text(encoding="utf-8", errors="ignore")[:10000]
-        
-        return ""
+        pages = iter_text(file_path, max_pages=max_pages, max_chars=max_chars, mime_type=mime_type)
+        return "".join(page + "\n" for page in pages)
     except Exception as e:
         print(f"Error extracting text from {file_path}: {e}")
         return ""
 
-def _extract_pdf(file_path: Path, max_pages: int) -> str:
-    text = ""
-    with fitz.open(file_path) as doc:
-        for i, page in enumerate(doc):
-            if i >= max_pages:
+
+def iter_pages(
+    file_path: Path,
+    max_pages: Optional[int] = None,
+    mime_type: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Lazily yields the text of each page or section, using the extractor
+    registered for the file's suffix or MIME type. Unknown formats yield nothing.
+    """
+    extractor = extractors.find_extractor(file_path, mime_type)
+    if extractor is None:
+        return
+    pages = extractor(file_path)
+    try:
+        for i, page in enumerate(pages):
+            if max_pages is not None and i >= max_pages:
                 break
-            text += page.get_text() + "\n"
-    return text
+            yield page
+    finally:
+        pages.close()
+
+
+def iter_text(
+    file_path: Path,
+    *,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    mime_type: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Yields page texts until max_chars is spent (the last page is truncated).
+    No further page is parsed once the budget is reached.
+    """
+    yield from _within_budget(iter_pages(file_path, max_pages, mime_type), max_chars)
+
+
+def _within_budget(pages: Iterable[str], max_chars: Optional[int]) -> Iterator[str]:
+    remaining = max_chars
+    if remaining is not None and remaining <= 0:
+        return
+    for page in pages:
+        if remaining is not None:
+            page = page[:remaining]
+            remaining -= len(page)
+        yield page
+        if remaining is not None and remaining <= 0:
+            return
+
+
+def build_text_sidecar(
+    file_path: Path,
+    digest: str,
+    max_pages: int = 5,
+    mime_type: Optional[str] = None,
+) -> str:
+    """
+    Streams every page once into the sidecar for `digest` and returns the
+    first max_pages pages joined like extract_text_from_file. Nothing is
+    written for formats without an extractor or documents without pages.
+    """
+    if extractors.find_extractor(file_path, mime_type) is None:
+        return ""
+    head: List[str] = []
+    count = 0
+
+    def _pages() -> Iterator[str]:
+        for page in iter_text(
+            file_path, max_pages=SIDECAR_MAX_PAGES, max_chars=SIDECAR_MAX_CHARS, mime_type=mime_type
+        ):
+            nonlocal count
+            count += 1
+            if len(head) < max_pages:
+                head.append(page)
+            yield page
+
+    try:
+        path = text_sidecar.write_sidecar(digest, EXTRACTOR_VERSION, _pages())
+    except Exception as e:
+        print(f"Error extracting text from {file_path}: {e}")
+        return ""
+    if not count:
+        path.unlink(missing_ok=True)
+        return ""
+    return "".join(page + "\n" for page in _within_budget(head, EXTRACT_CHAR_BUDGET))
+
+
+def ensure_text_sidecar(file_path: Path, digest: str, mime_type: Optional[str] = None) -> bool:
+    """Builds the sidecar if it is missing. Returns True when one is available."""
+    if text_sidecar.sidecar_path(digest, EXTRACTOR_VERSION) is None:
+        build_text_sidecar(file_path, digest, max_pages=0, mime_type=mime_type)
+    return text_sidecar.sidecar_path(digest, EXTRACTOR_VERSION) is not None
+
+
+def _page_ranges(page_count: int, chunk_pages: int) -> List[Tuple[int, int]]:
+    return [(start, min(start + chunk_pages, page_count)) for start in range(0, page_count, chunk_pages)]
+
+
+def _parallel_pdf_page_count(file_path: Path, mime_type: Optional[str]) -> int:
+    """Page count when the file should take the parallel PDF path, else 0."""
+    if PDF_PARALLEL_WORKERS < 2 or extractors.find_extractor(file_path, mime_type) is not extractors.extract_pdf_pages:
+        return 0
+    try:
+        page_count = extractors.pdf_page_count(file_path)
+    except Exception:
+        return 0
+    return page_count if page_count >= PDF_PARALLEL_MIN_PAGES else 0
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=EXTRACTION_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _reset_executor(executor: ProcessPoolExecutor) -> None:
+    """Drops the pool after a timeout or crash, terminating stuck workers."""
+    global _executor
+    if _executor is not executor:
+        return
+    _executor = None
+    for process in list(getattr(executor, "_processes", {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_extraction_executor() -> None:
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def extract_text_async(
+    file_path: Path,
+    max_pages: int = 5,
+    digest: Optional[str] = None,
+    mime_type: Optional[str] = None,
+) -> str:
+    """
+    Awaitable extract_text_from_file: runs in the process pool with bounded
+    concurrency and a timeout. Returns "" on timeout, like other extraction failures.
+    Only the classification head (max_pages within EXTRACT_CHAR_BUDGET) is
+    parsed; an existing sidecar for the digest is read instead. The full
+    sidecar is built separately, by ensure_text_sidecar_async.
+    """
+    if digest and text_sidecar.sidecar_path(digest, EXTRACTOR_VERSION) is not None:
+        return await asyncio.to_thread(
+            extract_text_from_file, file_path, max_pages, digest, EXTRACT_CHAR_BUDGET, mime_type
+        )
+    return await run_in_extraction_pool(
+        extract_text_from_file, file_path, max_pages, None, EXTRACT_CHAR_BUDGET, mime_type
+    )
+
+
+async def extract_pdf_parallel(
+    file_path: Path,
+    *,
+    workers: int = PDF_PARALLEL_WORKERS,
+    chunk_pages: int = PDF_PARALLEL_CHUNK_PAGES,
+    max_pages: Optional[int] = None,
+    page_count: Optional[int] = None,
+) -> Optional[List[str]]:
+    """
+    Extracts page ranges of chunk_pages pages on up to `workers` pool workers
+    at once and returns the page texts in page order, or None if any range
+    failed. The pool size (EXTRACTION_WORKERS) caps the effective parallelism.
+    """
+    if page_count is None:
+        page_count = await asyncio.to_thread(extractors.pdf_page_count, file_path)
+    if max_pages is not None:
+        page_count = min(page_count, max_pages)
+    limit = asyncio.Semaphore(max(1, workers))
+
+    async def _run(start: int, stop: int):
+        async with limit:
+            return await run_in_extraction_pool(extractors.extract_pdf_range, file_path, start, stop)
+
+    tasks = [asyncio.ensure_future(_run(start, stop)) for start, stop in _page_ranges(page_count, chunk_pages)]
+    try:
+        chunks = await asyncio.gather(*tasks)
+    except Exception as e:
+        print(f"Error extracting text from {file_path}: {e}")
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+    pages: List[str] = []
+    for chunk in chunks:
+        # run_in_extraction_pool reports timeouts and crashes as ""
+        if not isinstance(chunk, list):
+            return None
+        pages.extend(chunk)
+    return pages
+
+
+async def build_text_sidecar_parallel(
+    file_path: Path,
+    digest: str,
+    max_pages: int = 5,
+    page_count: Optional[int] = None,
+) -> str:
+    """build_text_sidecar for large PDFs, with pages extracted by extract_pdf_parallel."""
+    pages = await extract_pdf_parallel(file_path, max_pages=SIDECAR_MAX_PAGES, page_count=page_count)
+    if pages is None:
+        return ""
+    pages = list(_within_budget(pages, SIDECAR_MAX_CHARS))
+    if not pages:
+        return ""
+    await asyncio.to_thread(text_sidecar.write_sidecar, digest, EXTRACTOR_VERSION, pages)
+    return "".join(page + "\n" for page in _within_budget(pages[:max_pages], EXTRACT_CHAR_BUDGET))
+
+
+async def _build_sidecar_async(file_path: Path, digest: str, max_pages: int, mime_type: Optional[str]) -> str:
+    page_count = await asyncio.to_thread(_parallel_pdf_page_count, file_path, mime_type)
+    if page_count:
+        return await build_text_sidecar_parallel(file_path, digest, max_pages, page_count)
+    return await run_in_extraction_pool(build_text_sidecar, file_path, digest, max_pages, mime_type)
+
+
+async def ensure_text_sidecar_async(file_path: Path, digest: str, mime_type: Optional[str] = None) -> bool:
+    """Awaitable ensure_text_sidecar; large PDFs are extracted in parallel."""
+    if text_sidecar.sidecar_path(digest, EXTRACTOR_VERSION) is None:
+        await _build_sidecar_async(file_path, digest, 0, mime_type)
+    return text_sidecar.sidecar_path(digest, EXTRACTOR_VERSION) is not None
+
+
+async def run_in_extraction_pool(func, *args):
+    """Runs an extraction function in the worker pool with bounded concurrency and a timeout."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(EXTRACTION_WORKERS)
+    async with _semaphore:
+        loop = asyncio.get_running_loop()
+        # A second attempt covers jobs whose pool was torn down by another timeout.
+        for _ in range(2):
+            executor = _get_executor()
+            try:
+                future = loop.run_in_executor(executor, func, *args)
+                return await asyncio.wait_for(future, timeout=EXTRACTION_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                print(f"Extraction timed out after {EXTRACTION_TIMEOUT_SECONDS}s: {args[0]}")
+                _reset_executor(executor)
+                return ""
+            except BrokenProcessPool as e:
+                print(f"Extraction worker crashed for {args[0]}: {e}")
+                _reset_executor(executor)
+        return ""
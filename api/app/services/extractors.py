@@ -0,0 +1,349 @@
+import csv
+import mimetypes
+import re
+import zipfile
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree as ET
+
+try:  # pragma: no cover - optional dependency in some environments
+    import fitz  # PyMuPDF
+except ImportError:  # pragma: no cover
+    fitz = None
+
+# An extractor lazily yields the text of each page or section of a document.
+Extractor = Callable[[Path], Iterator[str]]
+
+# Sections longer than this are split so consumers can stop at a character budget.
+SECTION_CHUNK_CHARS = 64 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+MAX_SHARED_STRINGS = 500_000
+
+_BY_SUFFIX: Dict[str, Extractor] = {}
+_BY_MIME: Dict[str, Extractor] = {}
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+def register_extractor(*, suffixes: Iterable[str] = (), mime_types: Iterable[str] = ()):
+    """Registers an extractor for file suffixes (".docx") and MIME types."""
+
+    def decorator(func: Extractor) -> Extractor:
+        for suffix in suffixes:
+            _BY_SUFFIX[suffix.lower()] = func
+        for mime_type in mime_types:
+            _BY_MIME[mime_type.lower()] = func
+        return func
+
+    return decorator
+
+
+def find_extractor(path: Path, mime_type: Optional[str] = None) -> Optional[Extractor]:
+    """Looks up by suffix, then by the declared MIME type, then by a guessed one."""
+    extractor = _BY_SUFFIX.get(path.suffix.lower())
+    if extractor is not None:
+        return extractor
+    for candidate in (mime_type, mimetypes.guess_type(path.name)[0]):
+        if candidate:
+            extractor = _BY_MIME.get(candidate.split(";", 1)[0].strip().lower())
+            if extractor is not None:
+                return extractor
+    return None
+
+
+class _SectionBuffer:
+    """Accumulates text and hands out sections no longer than SECTION_CHUNK_CHARS."""
+
+    def __init__(self) -> None:
+        self._parts: List[str] = []
+        self._size = 0
+
+    def add(self, text: str) -> Iterator[str]:
+        if not text:
+            return
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= SECTION_CHUNK_CHARS:
+            joined = "".join(self._parts)
+            while len(joined) >= SECTION_CHUNK_CHARS:
+                yield joined[:SECTION_CHUNK_CHARS]
+                joined = joined[SECTION_CHUNK_CHARS:]
+            self._parts = [joined] if joined else []
+            self._size = len(joined)
+
+    def flush(self) -> Iterator[str]:
+        joined = "".join(self._parts).strip("\n")
+        self._parts = []
+        self._size = 0
+        if joined.strip():
+            yield joined
+
+
+def _open_pdf(path: Path):
+    if fitz is None:
+        raise RuntimeError("PyMuPDF is required to extract PDF text")
+    return fitz.open(path)
+
+
+@register_extractor(suffixes=[".pdf"], mime_types=["application/pdf"])
+def extract_pdf_pages(path: Path) -> Iterator[str]:
+    with _open_pdf(path) as doc:
+        for page in doc:
+            yield page.get_text()
+
+
+def pdf_page_count(path: Path) -> int:
+    with _open_pdf(path) as doc:
+        return doc.page_count
+
+
+def extract_pdf_range(path: Path, start: int, stop: int) -> List[str]:
+    """
+    Extracts pages [start, stop) with a document handle of its own, so ranges
+    can be processed by separate worker processes.
+    """
+    with _open_pdf(path) as doc:
+        stop = min(stop, doc.page_count)
+        return [doc[number].get_text() for number in range(start, stop)]
+
+
+@register_extractor(
+    suffixes=[".txt", ".md", ".json"],
+    mime_types=["text/plain", "text/markdown", "application/json"],
+)
+def extract_plain_text(path: Path) -> Iterator[str]:
+    with open(path, "r", encoding="utf-8", errors="ignore") as handle:
+        while True:
+            chunk = handle.read(SECTION_CHUNK_CHARS)
+            if not chunk:
+                break
+            yield chunk
+
+
+@register_extractor(suffixes=[".csv", ".tsv"], mime_types=["text/csv", "text/tab-separated-values"])
+def extract_csv(path: Path) -> Iterator[str]:
+    delimiter = "\t" if path.suffix.lower() == ".tsv" else ","
+    buffer = _SectionBuffer()
+    with open(path, "r", encoding="utf-8", errors="ignore", newline="") as handle:
+        for row in csv.reader(handle, delimiter=delimiter):
+            yield from buffer.add("\t".join(cell.strip() for cell in row) + "\n")
+    yield from buffer.flush()
+
+
+class _HTMLTextParser(HTMLParser):
+    _SKIP = {"script", "style", "noscript", "template", "head"}
+    _BLOCK = {"p", "div", "br", "li", "tr", "section", "article", "table", "ul", "ol", "h3", "h4", "h5", "h6"}
+    _SECTION = {"h1", "h2"}
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.events: List[Tuple[str, str]] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag in self._SECTION:
+            self.events.append(("section", ""))
+        elif tag in self._BLOCK:
+            self.events.append(("text", "\n"))
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self._BLOCK or tag in self._SECTION:
+            self.events.append(("text", "\n"))
+
+    def handle_data(self, data):
+        if not self._skip_depth and data.strip():
+            self.events.append(("text", re.sub(r"\s+", " ", data)))
+
+
+@register_extractor(suffixes=[".html", ".htm", ".xhtml"], mime_types=["text/html", "application/xhtml+xml"])
+def extract_html(path: Path) -> Iterator[str]:
+    """Feeds the parser in fixed-size chunks; <h1>/<h2> start a new section."""
+    parser = _HTMLTextParser()
+    buffer = _SectionBuffer()
+    with open(path, "r", encoding="utf-8", errors="ignore") as handle:
+        while True:
+            chunk = handle.read(READ_CHUNK_BYTES)
+            if chunk:
+                parser.feed(chunk)
+            else:
+                parser.close()
+            events, parser.events = parser.events, []
+            for kind, text in events:
+                if kind == "section":
+                    yield from buffer.flush()
+                else:
+                    yield from buffer.add(text)
+            if not chunk:
+                break
+    yield from buffer.flush()
+
+
+def _iterparse_member(
+    archive: zipfile.ZipFile,
+    name: str,
+    release: Iterable[str] = (),
+) -> Iterator[Tuple[str, ET.Element]]:
+    """
+    Streams (event, element) pairs from a zip member. Elements whose tag is in
+    `release` are detached from their parent once handled, so memory stays
+    bounded by the largest such element rather than the whole document.
+    """
+    release_tags = set(release)
+    stack: List[ET.Element] = []
+    with archive.open(name) as stream:
+        for event, element in ET.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                yield event, element
+                continue
+            stack.pop()
+            yield event, element
+            if element.tag in release_tags and stack:
+                stack[-1].remove(element)
+
+
+def _numbered_members(archive: zipfile.ZipFile, pattern: str) -> List[str]:
+    regex = re.compile(pattern)
+    numbered = []
+    for name in archive.namelist():
+        match = regex.fullmatch(name)
+        if match:
+            numbered.append((int(match.group(1)), name))
+    return [name for _, name in sorted(numbered)]
+
+
+@register_extractor(
+    suffixes=[".docx"],
+    mime_types=["application/vnd.openxmlformats-officedocument.wordprocessingml.document"],
+)
+def extract_docx(path: Path) -> Iterator[str]:
+    """Sections end at explicit page breaks and section properties."""
+    buffer = _SectionBuffer()
+    with zipfile.ZipFile(path) as archive:
+        for event, element in _iterparse_member(archive, "word/document.xml", release=[f"{_W}p", f"{_W}tr"]):
+            if event != "end":
+                continue
+            tag = element.tag
+            if tag == f"{_W}t":
+                yield from buffer.add(element.text or "")
+            elif tag == f"{_W}tab":
+                yield from buffer.add("\t")
+            elif tag == f"{_W}br" and element.get(f"{_W}type") == "page":
+                yield from buffer.flush()
+            elif tag == f"{_W}p":
+                yield from buffer.add("\n")
+            elif tag == f"{_W}sectPr":
+                yield from buffer.flush()
+    yield from buffer.flush()
+
+
+@register_extractor(
+    suffixes=[".pptx"],
+    mime_types=["application/vnd.openxmlformats-officedocument.presentationml.presentation"],
+)
+def extract_pptx(path: Path) -> Iterator[str]:
+    """One section per slide, in slide order."""
+    with zipfile.ZipFile(path) as archive:
+        for name in _numbered_members(archive, r"ppt/slides/slide(\d+)\.xml"):
+            buffer = _SectionBuffer()
+            for event, element in _iterparse_member(archive, name, release=[f"{_A}p"]):
+                if event != "end":
+                    continue
+                if element.tag == f"{_A}t":
+                    yield from buffer.add(element.text or "")
+                elif element.tag == f"{_A}p":
+                    yield from buffer.add("\n")
+            yield from buffer.flush()
+
+
+def _xlsx_sheet_names(archive: zipfile.ZipFile) -> Dict[str, str]:
+    """Maps worksheet member names to their display names."""
+    try:
+        rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    except (KeyError, ET.ParseError):
+        return {}
+    targets = {
+        rel.get("Id"): "xl/" + rel.get("Target", "").lstrip("/").removeprefix("xl/")
+        for rel in rels.iter(f"{_PKG_REL}Relationship")
+    }
+    names: Dict[str, str] = {}
+    for sheet in workbook.iter(f"{_S}sheet"):
+        target = targets.get(sheet.get(f"{_R}id"))
+        if target:
+            names[target] = sheet.get("name", "")
+    return names
+
+
+def _xlsx_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    strings: List[str] = []
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return strings
+    parts: List[str] = []
+    for event, element in _iterparse_member(archive, "xl/sharedStrings.xml", release=[f"{_S}si"]):
+        if event != "end":
+            continue
+        if element.tag == f"{_S}t":
+            parts.append(element.text or "")
+        elif element.tag == f"{_S}si":
+            strings.append("".join(parts))
+            parts = []
+            if len(strings) >= MAX_SHARED_STRINGS:
+                break
+    return strings
+
+
+@register_extractor(
+    suffixes=[".xlsx"],
+    mime_types=["application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"],
+)
+def extract_xlsx(path: Path) -> Iterator[str]:
+    """One section per worksheet (split when large); rows become tab-separated lines."""
+    with zipfile.ZipFile(path) as archive:
+        names = _xlsx_sheet_names(archive)
+        shared = _xlsx_shared_strings(archive)
+        for member in _numbered_members(archive, r"xl/worksheets/sheet(\d+)\.xml"):
+            buffer = _SectionBuffer()
+            title = names.get(member)
+            if title:
+                yield from buffer.add(f"# {title}\n")
+            row: List[str] = []
+            cell_type = None
+            value: Optional[str] = None
+            inline: List[str] = []
+            for event, element in _iterparse_member(archive, member, release=[f"{_S}row"]):
+                tag = element.tag
+                if event == "start":
+                    if tag == f"{_S}c":
+                        cell_type = element.get("t")
+                        value = None
+                        inline = []
+                    continue
+                if tag == f"{_S}v":
+                    value = element.text
+                elif tag == f"{_S}t":
+                    inline.append(element.text or "")
+                elif tag == f"{_S}c":
+                    if cell_type == "s" and value is not None:
+                        index = int(value)
+                        text = shared[index] if index < len(shared) else ""
+                    elif cell_type == "inlineStr":
+                        text = "".join(inline)
+                    else:
+                        text = value or ""
+                    if text:
+                        row.append(text)
+                elif tag == f"{_S}row":
+                    if row:
+                        yield from buffer.add("\t".join(row) + "\n")
+                    row = []
+            yield from buffer.flush()
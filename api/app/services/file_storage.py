@@ -1,37 +1,169 @@
+import hashlib
 import json
 import os
 import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
 from uuid import uuid4
 
+try:  # pragma: no cover - POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
 FILE_STORAGE_ROOT = Path(os.environ.get("FILE_STORAGE_ROOT", "data/files")).resolve()
 FILE_STORAGE_ROOT.mkdir(parents=True, exist_ok=True)
 REGISTRY_PATH = Path(
     os.environ.get("FILE_REGISTRY_PATH", FILE_STORAGE_ROOT / "registry.json")
 ).resolve()
 REGISTRY_PATH.parent.mkdir(parents=True, exist_ok=True)
+REGISTRY_LOCK_PATH = REGISTRY_PATH.with_suffix(".lock")
+OBJECTS_ROOT = FILE_STORAGE_ROOT / "objects"
+OBJECTS_LOCK_PATH = FILE_STORAGE_ROOT / "objects.lock"
+
+# Content-addressed mode stores each distinct payload once under its SHA-256
+# digest; file records become pointers and the registry keeps reference counts.
+CONTENT_ADDRESSED = os.environ.get("FILE_STORAGE_CONTENT_ADDRESSED", "true").strip().lower() in {
+    "1",
+    "true",
+    "yes",
+    "on",
+}
+
+STREAM_CHUNK_BYTES = 1024 * 1024
+# A processing claim older than this is treated as abandoned (crash, restart,
+# lost background task) and handed to the next upload of the same content.
+OBJECT_CLAIM_LEASE_SECONDS = float(os.environ.get("FILE_OBJECT_CLAIM_LEASE_SEC", "3600"))
 
 _registry_lock = threading.Lock()
+_objects_lock = threading.Lock()
+_txn_state = threading.local()
+_cache_lock = threading.Lock()
+_cached_registry: Optional[Dict[str, Any]] = None
+_cached_stat: Optional[Tuple[int, int, int]] = None
+
+
+class RegistryConflictError(RuntimeError):
+    """Raised when the registry changed on disk during a transaction."""
+
+
+class ObjectTooLargeError(ValueError):
+    """Raised by store_stream when the source exceeds max_bytes."""
+
+
+def _empty_registry() -> Dict[str, Dict[str, Any]]:
+    return {"version": 0, "files": {}, "objects": {}, "folders": {}, "trash": []}
 
 
-def _load_registry() -> Dict[str, Dict[str, str]]:
+def _registry_stat() -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = REGISTRY_PATH.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _read_registry() -> Dict[str, Dict[str, Any]]:
     if not REGISTRY_PATH.exists():
-        return {}
+        return _empty_registry()
     try:
         data = json.loads(REGISTRY_PATH.read_text(encoding="utf-8"))
-        if isinstance(data, dict):
-            return data
-        return {}
     except Exception:
-        return {}
+        return _empty_registry()
+    if not isinstance(data, dict):
+        return _empty_registry()
+    if isinstance(data.get("files"), dict):
+        data.setdefault("version", 0)
+        data.setdefault("objects", {})
+        data.setdefault("trash", [])
+        if not isinstance(data.get("folders"), dict):
+            data["folders"] = _build_folder_aggregates(data["files"])
+        return data
+    # Legacy layout: a flat {file_id: record} mapping.
+    return {"version": 0, "files": data, "objects": {}, "folders": _build_folder_aggregates(data), "trash": []}
+
+
+def _load_registry() -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the registry for read-only use. Each worker process keeps a parsed
+    copy and refreshes it whenever another process replaces the file, so the
+    file's stat acts as the change notification. Callers must not mutate it.
+    """
+    global _cached_registry, _cached_stat
+    if getattr(_txn_state, "registry", None) is not None:
+        return _txn_state.registry
+    stat = _registry_stat()
+    with _cache_lock:
+        if _cached_registry is not None and stat is not None and stat == _cached_stat:
+            return _cached_registry
+    data = _read_registry()
+    with _cache_lock:
+        _cached_registry, _cached_stat = data, stat
+    return data
+
+
+def registry_version() -> int:
+    """Monotonic version number, bumped by every committed registry write."""
+    return int(_load_registry().get("version", 0))
 
 
-def _save_registry(data: Dict[str, Dict[str, str]]) -> None:
-    tmp_path = REGISTRY_PATH.with_suffix(".tmp")
+@contextmanager
+def _registry_transaction():
+    """
+    Serialises read-modify-write cycles across threads and across processes
+    (uvicorn workers or containers sharing the volume) with an exclusive lock
+    file, and yields a freshly parsed registry. Changes are persisted by
+    calling _save_registry inside the block.
+    """
+    with _registry_lock:
+        with open(REGISTRY_LOCK_PATH, "a+") as lock_handle:
+            if fcntl is not None:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+            try:
+                _txn_state.expected_stat = _registry_stat()
+                _txn_state.registry = _read_registry()
+                yield _txn_state.registry
+            finally:
+                _txn_state.registry = None
+                _txn_state.expected_stat = None
+                if fcntl is not None:
+                    fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _object_store_lock():
+    """
+    Makes publishing a blob (writing it, or refreshing an existing one) and
+    reclaiming it mutually exclusive across threads and processes. Held only
+    around single filesystem operations.
+    """
+    with _objects_lock:
+        with open(OBJECTS_LOCK_PATH, "a+") as lock_handle:
+            if fcntl is not None:
+                fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_handle.fileno(), fcntl.LOCK_UN)
+
+
+def _save_registry(data: Dict[str, Dict[str, Any]]) -> None:
+    global _cached_registry, _cached_stat
+    # Optimistic check for filesystems where advisory locks are not honoured.
+    expected = getattr(_txn_state, "expected_stat", None)
+    if expected is not None and _registry_stat() != expected:
+        raise RegistryConflictError("File registry was modified concurrently; retry the operation")
+    data["version"] = int(data.get("version", 0)) + 1
+    tmp_path = REGISTRY_PATH.with_name(f"{REGISTRY_PATH.name}.{os.getpid()}.tmp")
     tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
     tmp_path.replace(REGISTRY_PATH)
+    _txn_state.expected_stat = _registry_stat()
+    with _cache_lock:
+        _cached_registry, _cached_stat = None, None
 
 
 def _ensure_within_root(path: Path) -> Path:
@@ -42,28 +174,361 @@ def _ensure_within_root(path: Path) -> Path:
         raise ValueError("Invalid storage path")
 
 
+def _object_dir(name: str) -> Path:
+    return OBJECTS_ROOT / name[:2] / name[2:4]
+
+
 def store_bytes(payload: bytes, suffix: Optional[str] = None) -> Path:
-    file_id = uuid4().hex
-    subdir = Path(file_id[:2]) / file_id[2:4]
-    target_dir = FILE_STORAGE_ROOT / "objects" / subdir
+    path, _ = store_object(payload, suffix=suffix)
+    return path
+
+
+def store_object(payload: bytes, suffix: Optional[str] = None) -> Tuple[Path, str]:
+    """
+    Writes the payload to the object store and returns (path, sha256 digest).
+    In content-addressed mode identical payloads resolve to the same path.
+    """
+    digest = hashlib.sha256(payload).hexdigest()
+    name = digest if CONTENT_ADDRESSED else uuid4().hex
+    target_dir = _object_dir(name)
     target_dir.mkdir(parents=True, exist_ok=True)
-    filename = file_id + (suffix or "")
-    destination = target_dir / filename
-    destination.write_bytes(payload)
-    return _ensure_within_root(destination)
+    destination = target_dir / (name + (suffix or ""))
+    if CONTENT_ADDRESSED:
+        with _object_store_lock():
+            try:
+                # Refresh the mtime so a pending reclaim of this blob backs off.
+                os.utime(destination)
+                return _ensure_within_root(destination), digest
+            except FileNotFoundError:
+                pass
+    tmp_path = target_dir / f".{uuid4().hex}.tmp"
+    tmp_path.write_bytes(payload)
+    with _object_store_lock():
+        tmp_path.replace(destination)
+    return _ensure_within_root(destination), digest
+
+
+def store_stream(
+    source: BinaryIO,
+    suffix: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+) -> Tuple[Path, str, int]:
+    """
+    Streams a file-like object into the object store in fixed-size chunks.
+    Returns (path, sha256 digest, size in bytes). Raises ObjectTooLargeError,
+    leaving nothing behind, once more than max_bytes have been read.
+    """
+    OBJECTS_ROOT.mkdir(parents=True, exist_ok=True)
+    tmp_path = OBJECTS_ROOT / f".{uuid4().hex}.tmp"
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as handle:
+            while True:
+                chunk = source.read(STREAM_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise ObjectTooLargeError(f"exceeds {max_bytes} bytes")
+                hasher.update(chunk)
+                handle.write(chunk)
+        digest = hasher.hexdigest()
+        name = digest if CONTENT_ADDRESSED else uuid4().hex
+        target_dir = _object_dir(name)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        destination = target_dir / (name + (suffix or ""))
+        with _object_store_lock():
+            tmp_path.replace(destination)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return _ensure_within_root(destination), digest, size
+
+
+def _queue_reclaim(registry: Dict[str, Any], path: Path) -> None:
+    """Defers blob deletion to the background reclaimer (see services.reclaimer)."""
+    registry["trash"].append({"path": str(path), "queued_at": time.time()})
+
+
+def _is_object_referenced(registry: Dict[str, Any], path: str) -> bool:
+    if not CONTENT_ADDRESSED:
+        return False
+    entry = registry["objects"].get(Path(path).name[:64])
+    return bool(entry and entry.get("storage_path") == path)
+
+
+def release_unregistered_objects(paths: Iterable[Path]) -> int:
+    """
+    Queues blobs that were stored but never registered (e.g. a rejected bulk
+    upload) for reclaim. Paths a record or object still points at are kept.
+    Returns the number queued.
+    """
+    wanted = {str(path) for path in paths}
+    if not wanted:
+        return 0
+    with _registry_transaction() as registry:
+        referenced = {record.get("storage_path", "") for record in registry["files"].values()}
+        referenced.update(entry.get("storage_path", "") for entry in registry["objects"].values())
+        queued = [path for path in wanted if path not in referenced]
+        for path in queued:
+            _queue_reclaim(registry, Path(path))
+        if queued:
+            _save_registry(registry)
+    return len(queued)
+
+
+def _modified_after(path: Path, cutoff: float) -> bool:
+    try:
+        return path.stat().st_mtime > cutoff
+    except FileNotFoundError:
+        return False
+
+
+def take_reclaim_batch(limit: int, grace_seconds: float = 0.0) -> List[Dict[str, Any]]:
+    """
+    Removes up to `limit` queued deletions that are no longer referenced
+    (a re-upload may have revived the digest) and returns them. Blobs written
+    or refreshed within grace_seconds stay queued: they may belong to an
+    upload that has been stored but not registered yet.
+    """
+    batch: List[Dict[str, Any]] = []
+    with _registry_transaction() as registry:
+        trash = registry["trash"]
+        if not trash:
+            return batch
+        cutoff = time.time() - grace_seconds
+        keep: List[Dict[str, Any]] = []
+        for item in trash:
+            if _is_object_referenced(registry, item.get("path", "")):
+                continue
+            young = grace_seconds > 0 and _modified_after(Path(item.get("path", "")), cutoff)
+            if len(batch) < limit and not young:
+                batch.append(item)
+            else:
+                keep.append(item)
+        if len(keep) != len(trash):
+            registry["trash"] = keep
+            _save_registry(registry)
+    return batch
+
+
+def reclaim_object(item: Dict[str, Any], grace_seconds: float = 0.0) -> Optional[Path]:
+    """
+    Unlinks a blob taken from the reclaim queue unless it was revived since:
+    the registry points at it again, or it was rewritten or refreshed after it
+    was queued or within grace_seconds. The checks and the unlink run under
+    the object store lock, so a concurrent store_object of the same digest
+    either lands first (and the blob is kept) or finds it gone and writes it
+    again. A blob kept only for its age is left to the reconcile sweep.
+    Returns the removed path.
+    """
+    path = _ensure_within_root(Path(item.get("path", "")))
+    with _object_store_lock():
+        if _is_object_referenced(_load_registry(), str(path)):
+            return None
+        try:
+            if path.stat().st_mtime > min(float(item.get("queued_at", 0)), time.time() - grace_seconds):
+                return None
+            path.unlink()
+        except FileNotFoundError:
+            return None
+    return path
+
+
+def for_unreferenced_digests(digests: Iterable[str], action: Callable[[str], Any]) -> int:
+    """
+    Calls action(digest) for every digest without an object entry, inside a
+    registry transaction, so a concurrent registration of the same digest
+    either lands first (and is seen) or only after the action. Returns the
+    number of digests acted on.
+    """
+    wanted = set(digests)
+    if not wanted:
+        return 0
+    acted = 0
+    with _registry_transaction() as registry:
+        for digest in wanted:
+            if digest not in registry["objects"]:
+                action(digest)
+                acted += 1
+    return acted
+
+
+def pending_reclaim_count() -> int:
+    return len(_load_registry()["trash"])
+
+
+def referenced_digests() -> set[str]:
+    registry = _load_registry()
+    digests = {record["sha256"] for record in registry["files"].values() if record.get("sha256")}
+    digests.update(registry["objects"].keys())
+    return digests
+
+
+def hash_file(path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(STREAM_CHUNK_BYTES), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def referenced_storage_paths() -> set[str]:
+    registry = _load_registry()
+    paths = {record.get("storage_path", "") for record in registry["files"].values()}
+    paths.update(entry.get("storage_path", "") for entry in registry["objects"].values())
+    paths.update(item.get("path", "") for item in registry["trash"])
+    return paths
+
+
+def _add_object_reference(registry: Dict[str, Dict[str, Any]], metadata: Dict[str, Any]) -> Optional[Path]:
+    """
+    Increments the reference count of the record's object. Returns a redundant
+    blob path to unlink when the same digest was already stored elsewhere.
+    """
+    digest = metadata.get("sha256")
+    if not CONTENT_ADDRESSED or not digest:
+        return None
+    objects = registry["objects"]
+    entry = objects.get(digest)
+    redundant: Optional[Path] = None
+    if entry is None:
+        entry = {
+            "storage_path": metadata["storage_path"],
+            "size_bytes": metadata.get("size_bytes", 0),
+            "refcount": 0,
+            "status": "new",
+            "created_at": metadata.get("created_at") or datetime.now(timezone.utc).isoformat(),
+        }
+        objects[digest] = entry
+    elif entry.get("storage_path") != metadata["storage_path"]:
+        # Same bytes uploaded under a different suffix: point at the existing blob.
+        redundant = Path(metadata["storage_path"])
+        metadata["storage_path"] = entry["storage_path"]
+    entry["refcount"] = int(entry.get("refcount", 0)) + 1
+    return redundant
+
+
+def _release_object_reference(registry: Dict[str, Dict[str, Any]], record: Dict[str, Any]) -> bool:
+    """Decrements the object's reference count. Returns True when the blob is unreferenced."""
+    digest = record.get("sha256")
+    if not digest or digest not in registry["objects"]:
+        return True
+    entry = registry["objects"][digest]
+    entry["refcount"] = int(entry.get("refcount", 1)) - 1
+    if entry["refcount"] > 0:
+        return False
+    registry["objects"].pop(digest, None)
+    return True
+
+
+def _normalize_folder(value: Optional[str]) -> str:
+    folder = value or "/"
+    if not folder.startswith("/"):
+        folder = f"/{folder}"
+    return folder.replace("//", "/") or "/"
+
+
+def _folder_ancestors(folder: str) -> List[str]:
+    if folder == "/":
+        return []
+    parts = folder.strip("/").split("/")
+    return ["/" + "/".join(parts[:i]) if i else "/" for i in range(len(parts) - 1, -1, -1)]
+
+
+def _build_folder_aggregates(files: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    registry = {"files": files, "folders": {}}
+    for record in files.values():
+        _apply_folder_aggregate(registry, record, 1)
+    return registry["folders"]
+
+
+def _aggregate_key(record: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (
+        record.get("tenant") or "default",
+        record.get("user_id") or "local",
+        _normalize_folder(record.get("folder_path")),
+    )
+
+
+def _apply_folder_aggregate(
+    registry: Dict[str, Dict[str, Any]],
+    record: Dict[str, Any],
+    sign: int,
+    *,
+    rescan: bool = True,
+) -> None:
+    """
+    Adds (sign=1) or removes (sign=-1) a record from its tenant/user folder aggregate.
+    Pass rescan=False when the same folder is about to receive a newer record anyway.
+    """
+    tenant, user, folder = _aggregate_key(record)
+    users = registry["folders"].setdefault(tenant, {})
+    folders = users.setdefault(user, {})
+    stats = folders.setdefault(folder, {"count": 0, "scopes": {}, "size_bytes": 0, "latest_updated_at": ""})
+    scope = (record.get("scope") or "personal").lower()
+    updated_at = record.get("updated_at") or record.get("created_at") or ""
+    stats["count"] += sign
+    stats["scopes"][scope] = stats["scopes"].get(scope, 0) + sign
+    if stats["scopes"][scope] <= 0:
+        stats["scopes"].pop(scope)
+    stats["size_bytes"] += sign * int(record.get("size_bytes") or 0)
+    if sign > 0:
+        stats["latest_updated_at"] = max(stats["latest_updated_at"], updated_at)
+    elif stats["count"] <= 0:
+        folders.pop(folder)
+        if not folders:
+            users.pop(user)
+        if not users:
+            registry["folders"].pop(tenant)
+    elif rescan and updated_at >= stats["latest_updated_at"]:
+        # The newest record left the folder; rescan only this folder's members.
+        stats["latest_updated_at"] = max(
+            (
+                item.get("updated_at") or item.get("created_at") or ""
+                for item in registry["files"].values()
+                if item is not record
+                and _aggregate_key(item) == (tenant, user, folder)
+            ),
+            default="",
+        )
 
 
 def register_file(metadata: Dict[str, str]) -> Dict[str, str]:
-    with _registry_lock:
-        registry = _load_registry()
-        registry[metadata["id"]] = metadata
+    return register_files([metadata])[0]
+
+
+def register_files(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Registers several records with a single registry read/write."""
+    records = list(items)
+    with _registry_transaction() as registry:
+        for metadata in records:
+            previous = registry["files"].get(metadata["id"])
+            if not previous or previous.get("sha256") != metadata.get("sha256"):
+                path = _add_object_reference(registry, metadata)
+                if path is not None and str(path) != metadata["storage_path"]:
+                    _queue_reclaim(registry, path)
+                # New content for an existing id: drop its hold on the old object.
+                if (
+                    previous
+                    and _release_object_reference(registry, previous)
+                    and previous.get("storage_path") != metadata["storage_path"]
+                ):
+                    _queue_reclaim(registry, Path(previous.get("storage_path", "")))
+            if previous:
+                _apply_folder_aggregate(
+                    registry, previous, -1, rescan=_aggregate_key(previous) != _aggregate_key(metadata)
+                )
+            registry["files"][metadata["id"]] = metadata
+            _apply_folder_aggregate(registry, metadata, 1)
         _save_registry(registry)
-    return metadata
+    return records
 
 
 def list_files(*, tenant: Optional[str] = None, user_id: Optional[str] = None, folder_path: Optional[str] = None, doc_type: Optional[str] = None, topic: Optional[str] = None, state: Optional[str] = None) -> List[Dict[str, str]]:
     registry = _load_registry()
-    records = list(registry.values())
+    records = list(registry["files"].values())
     if tenant:
         records = [item for item in records if item.get("tenant") == tenant]
     if user_id:
@@ -72,7 +537,7 @@ def list_files(*, tenant: Optional[str] = None, user_id: Optional[str] = None, f
         folder = folder_path if folder_path.startswith("/") else f"/{folder_path}"
         folder = folder.replace("//", "/") or "/"
         records = [item for item in records if item.get("folder_path") == folder]
-    
+
     # Tag filtering
     if doc_type:
         records = [item for item in records if item.get("tags", {}).get("doc_type") == doc_type]
@@ -82,82 +547,266 @@ def list_files(*, tenant: Optional[str] = None, user_id: Optional[str] = None, f
         records = [item for item in records if item.get("tags", {}).get("state") == state]
 
     records.sort(key=lambda item: item.get("created_at", ""), reverse=True)
-    return records
+    return [dict(item) for item in records]
 
 
-def list_folders(*, tenant: Optional[str] = None, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+def list_files_page(
+    *,
+    after_id: Optional[str] = None,
+    limit: int = 100,
+    tenant: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Records ordered by id, starting after `after_id`; a stable cursor for long walks."""
     registry = _load_registry()
-    scope_map: Dict[str, set[str]] = {}
-    counts: Dict[str, int] = {}
-    for item in registry.values():
-        if tenant and item.get("tenant") != tenant:
-            continue
-        if user_id and item.get("user_id") != user_id:
+    ids = sorted(
+        file_id
+        for file_id, record in registry["files"].items()
+        if (after_id is None or file_id > after_id) and (not tenant or record.get("tenant") == tenant)
+    )
+    return [dict(registry["files"][file_id]) for file_id in ids[:limit]]
+
+
+def list_folders(
+    *,
+    tenant: Optional[str] = None,
+    user_id: Optional[str] = None,
+    path: Optional[str] = None,
+    recursive: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Lists folders from the precomputed aggregates (O(folders), not O(files)).
+    `path` restricts the result to that folder's subtree; `recursive` adds
+    subtree totals and the intermediate folders needed to render a tree.
+    """
+    registry = _load_registry()
+    merged: Dict[str, Dict[str, Any]] = {}
+    for tenant_key, users in registry["folders"].items():
+        if tenant and tenant_key != tenant:
             continue
-        folder = item.get("folder_path") or "/"
-        if not folder.startswith("/"):
-            folder = f"/{folder}"
-        folder = folder.replace("//", "/") or "/"
-        scope = (item.get("scope") or "personal").lower()
-        scope_map.setdefault(folder, set()).add(scope)
-        counts[folder] = counts.get(folder, 0) + 1
+        for user_key, folders in users.items():
+            if user_id and user_key != user_id:
+                continue
+            for folder, stats in folders.items():
+                target = merged.setdefault(
+                    folder, {"count": 0, "scopes": set(), "size_bytes": 0, "latest_updated_at": ""}
+                )
+                target["count"] += stats.get("count", 0)
+                target["scopes"].update(scope for scope, n in stats.get("scopes", {}).items() if n > 0)
+                target["size_bytes"] += stats.get("size_bytes", 0)
+                target["latest_updated_at"] = max(target["latest_updated_at"], stats.get("latest_updated_at", ""))
+
+    if recursive:
+        for folder in list(merged.keys()):
+            for ancestor in _folder_ancestors(folder):
+                merged.setdefault(
+                    ancestor, {"count": 0, "scopes": set(), "size_bytes": 0, "latest_updated_at": ""}
+                )
+        subtree: Dict[str, Dict[str, Any]] = {
+            folder: {"count": 0, "size_bytes": 0, "scopes": set()} for folder in merged
+        }
+        for folder, stats in merged.items():
+            for target in (folder, *_folder_ancestors(folder)):
+                subtree[target]["count"] += stats["count"]
+                subtree[target]["size_bytes"] += stats["size_bytes"]
+                subtree[target]["scopes"].update(stats["scopes"])
 
-    if not scope_map:
-        scope_map["/"] = {"personal"}
-        counts["/"] = 0
+    root = _normalize_folder(path) if path else None
+    if root and root != "/":
+        merged = {
+            folder: stats
+            for folder, stats in merged.items()
+            if folder == root or folder.startswith(root + "/")
+        }
+
+    if not merged and not root:
+        merged["/"] = {"count": 0, "scopes": {"personal"}, "size_bytes": 0, "latest_updated_at": ""}
 
     result = []
-    for path in sorted(scope_map.keys()):
-        scopes = scope_map[path]
-        scope_value = "mixed" if len(scopes) > 1 else next(iter(scopes))
-        result.append({"path": path, "scope": scope_value, "count": counts.get(path, 0)})
+    for folder in sorted(merged.keys()):
+        stats = merged[folder]
+        scopes = stats["scopes"] or (subtree[folder]["scopes"] if recursive else set()) or {"personal"}
+        item: Dict[str, Any] = {
+            "path": folder,
+            "scope": "mixed" if len(scopes) > 1 else next(iter(scopes)),
+            "count": stats["count"],
+            "size_bytes": stats["size_bytes"],
+            "latest_updated_at": stats["latest_updated_at"] or None,
+        }
+        if recursive:
+            item["subtree_count"] = subtree[folder]["count"]
+            item["subtree_size_bytes"] = subtree[folder]["size_bytes"]
+        result.append(item)
     return result
 
 
 def update_file_metadata(file_id: str, **changes: Any) -> Optional[Dict[str, Any]]:
-    with _registry_lock:
-        registry = _load_registry()
-        record = registry.get(file_id)
-        if not record:
-            return None
+    updated = update_files_metadata({file_id: changes})
+    return updated[0] if updated else None
+
+
+def update_files_metadata(
+    changes_by_id: Dict[str, Dict[str, Any]],
+    *,
+    object_tags: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Applies per-record changes in one registry transaction. Unknown ids are skipped.
+    object_tags (digest -> tags) updates the shared tags handed to later duplicates.
+    """
+    if not changes_by_id:
+        return []
+    updated: List[Dict[str, Any]] = []
+    with _registry_transaction() as registry:
         now = datetime.now(timezone.utc).isoformat()
-        record.update(changes)
-        record["updated_at"] = now
-        _save_registry(registry)
-        updated = dict(record)
+        for file_id, changes in changes_by_id.items():
+            record = registry["files"].get(file_id)
+            if not record:
+                continue
+            previous = dict(record)
+            record.update(changes)
+            if has_tags(record.get("tags")):
+                record.pop("processing_failed_at", None)
+            record["updated_at"] = now
+            _apply_folder_aggregate(
+                registry, previous, -1, rescan=_aggregate_key(previous) != _aggregate_key(record)
+            )
+            _apply_folder_aggregate(registry, record, 1)
+            updated.append(dict(record))
+        for digest, tags in (object_tags or {}).items():
+            entry = registry["objects"].get(digest)
+            if entry is not None and has_tags(tags):
+                entry["tags"] = tags
+        if updated:
+            _save_registry(registry)
     return updated
 
 
 def get_file(file_id: str) -> Optional[Dict[str, str]]:
     registry = _load_registry()
-    record = registry.get(file_id)
+    record = registry["files"].get(file_id)
     if not record:
         return None
+    record = dict(record)
     path = Path(record.get("storage_path", ""))
     record["storage_path"] = str(_ensure_within_root(path))
     return record
 
 
-def delete_file(file_id: str) -> bool:
-    with _registry_lock:
-        registry = _load_registry()
-        record = registry.pop(file_id, None)
+def get_files(file_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Batch variant of get_file: one registry read; unknown ids are left out."""
+    registry = _load_registry()
+    records: Dict[str, Dict[str, Any]] = {}
+    for file_id in file_ids:
+        record = registry["files"].get(file_id)
         if record:
+            record = dict(record)
+            record["storage_path"] = str(_ensure_within_root(Path(record.get("storage_path", ""))))
+            records[file_id] = record
+    return records
+
+
+def get_object(digest: str) -> Optional[Dict[str, Any]]:
+    registry = _load_registry()
+    entry = registry["objects"].get(digest)
+    return dict(entry) if entry else None
+
+
+def begin_object_processing(digest: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Claims extraction/classification for a stored object.
+    Returns None when the caller should process the object, otherwise the shared
+    object entry (already tagged, or currently being processed by another upload).
+    """
+    if not digest:
+        return None
+    return begin_objects_processing([digest]).get(digest)
+
+
+def begin_objects_processing(digests: Iterable[Optional[str]]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Batch variant of begin_object_processing keyed by digest. A "pending" claim
+    older than OBJECT_CLAIM_LEASE_SECONDS is taken over by the caller.
+    """
+    # Deduplicated: a digest listed twice must not see its own fresh claim as someone else's.
+    wanted = list(dict.fromkeys(digest for digest in digests if digest))
+    claims: Dict[str, Optional[Dict[str, Any]]] = {digest: None for digest in wanted}
+    if not CONTENT_ADDRESSED or not wanted:
+        return claims
+    changed = False
+    with _registry_transaction() as registry:
+        now = time.time()
+        for digest in wanted:
+            entry = registry["objects"].get(digest)
+            if not entry:
+                continue
+            status = entry.get("status")
+            # Claims written before claimed_at existed count as stale.
+            claimed = status == "pending" and now - float(entry.get("claimed_at") or 0) < OBJECT_CLAIM_LEASE_SECONDS
+            # "done" without tags predates has_tags(); classify those again.
+            if claimed or (status == "done" and has_tags(entry.get("tags"))):
+                claims[digest] = dict(entry)
+                continue
+            entry["status"] = "pending"
+            entry["claimed_at"] = now
+            changed = True
+        if changed:
             _save_registry(registry)
-    if not record:
-        return False
-    try:
-        path = _ensure_within_root(Path(record.get("storage_path", "")))
-        if path.exists():
-            path.unlink()
-            parent = path.parent
-            while parent != FILE_STORAGE_ROOT and parent != parent.parent:
-                if any(parent.iterdir()):
-                    break
-                parent.rmdir()
-                parent = parent.parent
-    except Exception:
-        pass
+    return claims
+
+
+def has_tags(tags: Optional[Dict[str, Any]]) -> bool:
+    """True when at least one tag field is set (empty results come from degraded classification)."""
+    return bool(tags) and any(tags.values())
+
+
+def complete_object_processing(digest: Optional[str], tags: Optional[Dict[str, Any]]) -> int:
+    """
+    Stores the classification result on the object and copies it to every
+    record that points at the same digest. Returns the number of records updated.
+    An empty result marks the object failed so the next duplicate retries it,
+    and stamps processing_failed_at on the untagged records of that digest
+    (including duplicates that waited on the claim) so they can be found and
+    re-tagged.
+    """
+    if not CONTENT_ADDRESSED or not digest:
+        return 0
+    updated = 0
+    with _registry_transaction() as registry:
+        entry = registry["objects"].get(digest)
+        if entry is None:
+            return 0
+        now = datetime.now(timezone.utc).isoformat()
+        if not has_tags(tags):
+            tags = None
+        entry["status"] = "done" if tags is not None else "failed"
+        entry.pop("claimed_at", None)
+        if tags is not None:
+            entry["tags"] = tags
+        for record in registry["files"].values():
+            if record.get("sha256") != digest or has_tags(record.get("tags")):
+                continue
+            if tags is None:
+                record["processing_failed_at"] = now
+                continue
+            _apply_folder_aggregate(registry, record, -1, rescan=False)
+            record["tags"] = tags
+            record.pop("processing_failed_at", None)
+            record["updated_at"] = now
+            _apply_folder_aggregate(registry, record, 1)
+            updated += 1
+        _save_registry(registry)
+    return updated
+
+
+def delete_file(file_id: str) -> bool:
+    with _registry_transaction() as registry:
+        record = registry["files"].pop(file_id, None)
+        if not record:
+            return False
+        if _release_object_reference(registry, record):
+            _queue_reclaim(registry, Path(record.get("storage_path", "")))
+        _apply_folder_aggregate(registry, record, -1)
+        _save_registry(registry)
     return True
 
 
@@ -172,6 +821,7 @@ def create_metadata(
     mime_type: str,
     size_bytes: int,
     storage_path: Path,
+    sha256: Optional[str] = None,
 ) -> Dict[str, str]:
     file_id = uuid4().hex
     now = datetime.now(timezone.utc).isoformat()
@@ -189,4 +839,6 @@ def create_metadata(
         "created_at": now,
         "updated_at": now,
     }
+    if sha256:
+        metadata["sha256"] = sha256
     return metadata
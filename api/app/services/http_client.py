@@ -0,0 +1,62 @@
+import os
+from typing import Dict, Tuple
+
+import httpx
+
+try:  # pragma: no cover - optional dependency (httpx[http2])
+    import h2  # noqa: F401
+except ImportError:  # pragma: no cover
+    h2 = None
+
+# Application-scoped outbound clients: one connection pool per TLS-verification
+# mode, reused across requests so keep-alive connections skip the TCP/TLS
+# handshake. Callers pass their own timeout per request.
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_CLIENT_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("HTTP_CLIENT_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get("HTTP_CLIENT_KEEPALIVE_EXPIRY_SEC", "30"))
+HTTP_DEFAULT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CLIENT_TIMEOUT_SEC", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("HTTP_CLIENT_CONNECT_TIMEOUT_SEC", "10"))
+# HTTP/2 is only used when requested and the h2 package is installed.
+HTTP2_ENABLED = os.environ.get("HTTP_CLIENT_HTTP2", "false").strip().lower() in {"1", "true", "yes", "on"}
+
+_clients: Dict[Tuple[bool, bool], httpx.AsyncClient] = {}
+
+
+def h2_installed() -> bool:
+    return h2 is not None
+
+
+def http2_available() -> bool:
+    return HTTP2_ENABLED and h2_installed()
+
+
+def get_http_client(*, verify: bool = True) -> httpx.AsyncClient:
+    """Returns the shared pooled client for the given TLS-verification mode."""
+    key = (bool(verify), http2_available())
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            verify=verify,
+            http2=key[1],
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(HTTP_DEFAULT_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+        )
+        _clients[key] = client
+    return client
+
+
+def request_timeout(seconds: float) -> httpx.Timeout:
+    """Per-request timeout that keeps the shared connect timeout."""
+    return httpx.Timeout(seconds, connect=min(seconds, HTTP_CONNECT_TIMEOUT_SECONDS))
+
+
+async def close_http_clients() -> None:
+    """Closes every shared client; called on application shutdown."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
@@ -0,0 +1,378 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+# A stage handler receives the job payload and returns the payload for the next
+# stage, or None when the pipeline is finished for this job. Raising retries.
+StageHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+FailureHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_run_at REAL NOT NULL,
+    lease_until REAL,
+    lease_owner TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (stage, status, priority, next_run_at);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, updated_at);
+"""
+
+
+class LeaseLost(RuntimeError):
+    """The job's lease expired and another worker claimed it; this worker's result is dropped."""
+
+
+@dataclass(slots=True)
+class StageSpec:
+    name: str
+    handler: StageHandler
+    concurrency: int = 1
+
+
+class JobQueue:
+    """
+    Durable multi-stage job queue persisted in SQLite.
+
+    Jobs move through the configured stages in order. Each stage has its own
+    pool of asyncio workers; a claimed job holds a lease so that jobs owned by
+    a crashed or restarted process are picked up again once the lease expires.
+    Every claim writes a fresh lease_owner token, and results are only recorded
+    while the row still carries it. Failures are retried with exponential
+    backoff and jitter. Finished (done or exhausted) jobs are purged
+    retention_seconds after their last update.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        stages: Sequence[StageSpec],
+        *,
+        max_attempts: int = 5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        lease_seconds: float = 600.0,
+        poll_interval: float = 1.0,
+        retention_seconds: float = 7 * 24 * 3600.0,
+        purge_interval: float = 300.0,
+        on_failure: Optional[FailureHandler] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.stages = list(stages)
+        self._order = [stage.name for stage in self.stages]
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.purge_interval = purge_interval
+        self.on_failure = on_failure
+        self._clock = clock
+        self._next_purge_at = 0.0
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._workers: List[asyncio.Task[None]] = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "lease_owner" not in columns:
+                # Databases created before lease ownership was tracked.
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease_owner TEXT")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    def _enqueue_many_sync(self, items: Iterable[tuple[str, Dict[str, Any], int]]) -> List[Dict[str, Any]]:
+        now = self._clock()
+        first_stage = self._order[0]
+        jobs: List[Dict[str, Any]] = []
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key, payload, priority in items:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO jobs (id, key, stage, status, priority, payload, attempts,"
+                        " next_run_at, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, 0, ?, ?, ?)",
+                        (uuid4().hex, key, first_stage, priority, json.dumps(payload, ensure_ascii=False), now, now, now),
+                    )
+                    row = conn.execute("SELECT * FROM jobs WHERE key = ?", (key,)).fetchone()
+                    jobs.append(self._row_to_job(row))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return jobs
+
+    async def enqueue(self, key: str, payload: Dict[str, Any], *, priority: int = 0) -> Dict[str, Any]:
+        """Adds a job unless one with the same idempotency key already exists."""
+        return (await self.enqueue_many([(key, payload)], priority=priority))[0]
+
+    async def enqueue_many(
+        self,
+        items: Sequence[tuple[str, Dict[str, Any]]],
+        *,
+        priority: int = 0,
+    ) -> List[Dict[str, Any]]:
+        """Adds several jobs in a single transaction."""
+        if not items:
+            return []
+        jobs = await asyncio.to_thread(
+            self._enqueue_many_sync, [(key, payload, priority) for key, payload in items]
+        )
+        self._wake(self._order[0])
+        return jobs
+
+    def _get_sync(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get_sync, job_id)
+
+    def _list_sync(self, status: Optional[str], stage: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM jobs"
+        clauses: List[str] = []
+        params: List[Any] = []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if stage:
+            clauses.append("stage = ?")
+            params.append(stage)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY updated_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    async def list(self, *, status: Optional[str] = None, stage: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._list_sync, status, stage, limit)
+
+    def _counts_sync(self) -> Dict[str, Dict[str, int]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT stage, status, COUNT(*) AS n FROM jobs GROUP BY stage, status").fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            counts.setdefault(row["stage"], {})[row["status"]] = row["n"]
+        return counts
+
+    async def counts(self) -> Dict[str, Dict[str, int]]:
+        return await asyncio.to_thread(self._counts_sync)
+
+    def _purge_sync(self, older_than: float) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (older_than,)
+            ).rowcount
+
+    async def purge(self) -> int:
+        """Deletes finished jobs older than retention_seconds; their idempotency keys become free again."""
+        if self.retention_seconds <= 0:
+            return 0
+        return await asyncio.to_thread(self._purge_sync, self._clock() - self.retention_seconds)
+
+    async def _maybe_purge(self) -> None:
+        """Runs purge() from an idle worker at most once per purge_interval."""
+        now = time.monotonic()
+        if self.retention_seconds <= 0 or now < self._next_purge_at:
+            return
+        self._next_purge_at = now + self.purge_interval
+        try:
+            removed = await self.purge()
+        except Exception as exc:
+            logger.warning("Job purge failed: %s", exc)
+            return
+        if removed:
+            logger.info("Purged %d finished jobs", removed)
+
+    def _claim_sync(self, stage: str) -> Optional[Dict[str, Any]]:
+        now = self._clock()
+        owner = uuid4().hex
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE stage = ? AND ("
+                    " (status = 'queued' AND next_run_at <= ?)"
+                    " OR (status = 'running' AND lease_until < ?))"
+                    " ORDER BY priority DESC, next_run_at LIMIT 1",
+                    (stage, now, now),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', lease_until = ?, lease_owner = ?, updated_at = ? WHERE id = ?",
+                    (now + self.lease_seconds, owner, now, row["id"]),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        job = self._row_to_job(row)
+        job["lease_owner"] = owner
+        return job
+
+    @staticmethod
+    def _check_lease(cursor: sqlite3.Cursor, job: Dict[str, Any]) -> None:
+        if cursor.rowcount == 0:
+            raise LeaseLost(f"job {job['id']} is no longer leased by this worker")
+
+    def _advance_sync(self, job: Dict[str, Any], payload: Optional[Dict[str, Any]]) -> Optional[str]:
+        now = self._clock()
+        position = self._order.index(job["stage"])
+        next_stage = self._order[position + 1] if payload is not None and position + 1 < len(self._order) else None
+        with self._connect() as conn:
+            if next_stage is None:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = 'done', lease_until = NULL, lease_owner = NULL, last_error = NULL,"
+                    " payload = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                    (
+                        json.dumps(payload if payload is not None else job["payload"], ensure_ascii=False),
+                        now,
+                        job["id"],
+                        job["lease_owner"],
+                    ),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET stage = ?, status = 'queued', attempts = 0, lease_until = NULL, lease_owner = NULL,"
+                    " last_error = NULL, next_run_at = ?, payload = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                    (next_stage, now, json.dumps(payload, ensure_ascii=False), now, job["id"], job["lease_owner"]),
+                )
+            self._check_lease(cursor, job)
+        return next_stage
+
+    def _fail_sync(self, job: Dict[str, Any], error: str) -> bool:
+        """Records a failed attempt. Returns True when the job is exhausted."""
+        now = self._clock()
+        attempts = int(job["attempts"]) + 1
+        exhausted = attempts >= self.max_attempts
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        delay += random.uniform(0, delay / 2)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, lease_until = NULL, lease_owner = NULL, last_error = ?,"
+                " next_run_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                (
+                    "failed" if exhausted else "queued",
+                    attempts,
+                    error[:2000],
+                    now + delay,
+                    now,
+                    job["id"],
+                    job["lease_owner"],
+                ),
+            )
+            self._check_lease(cursor, job)
+        return exhausted
+
+    def _release_sync(self, job: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL, lease_owner = NULL, updated_at = ?"
+                " WHERE id = ? AND lease_owner = ?",
+                (self._clock(), job["id"], job["lease_owner"]),
+            )
+
+    def _wake(self, stage: str) -> None:
+        event = self._wakeups.get(stage)
+        if event is not None:
+            event.set()
+
+    async def _worker(self, spec: StageSpec) -> None:
+        event = self._wakeups[spec.name]
+        while True:
+            try:
+                job = await asyncio.to_thread(self._claim_sync, spec.name)
+            except Exception as exc:
+                logger.warning("Job claim for stage %s failed: %s", spec.name, exc)
+                job = None
+            if job is None:
+                await self._maybe_purge()
+                event.clear()
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                result = await spec.handler(job["payload"])
+            except asyncio.CancelledError:
+                # Shutting down: hand the job back so the next start picks it up.
+                # Shielded so a second cancel cannot interrupt the write.
+                await asyncio.shield(asyncio.to_thread(self._release_sync, job))
+                raise
+            except Exception as exc:
+                logger.warning("Job %s failed in stage %s: %s", job["id"], spec.name, exc)
+                try:
+                    exhausted = await asyncio.to_thread(self._fail_sync, job, str(exc))
+                except LeaseLost as lost:
+                    logger.warning("%s; dropping the failed attempt", lost)
+                    continue
+                if exhausted and self.on_failure is not None:
+                    try:
+                        await self.on_failure(job["payload"])
+                    except Exception as hook_exc:
+                        logger.warning("Failure hook for job %s raised: %s", job["id"], hook_exc)
+                continue
+            try:
+                next_stage = await asyncio.to_thread(self._advance_sync, job, result)
+            except LeaseLost as lost:
+                logger.warning("%s; dropping the stage result", lost)
+                continue
+            if next_stage:
+                self._wake(next_stage)
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        loop = asyncio.get_running_loop()
+        for spec in self.stages:
+            self._wakeups[spec.name] = asyncio.Event()
+            for _ in range(max(1, spec.concurrency)):
+                self._workers.append(loop.create_task(self._worker(spec)))
+
+    async def stop(self) -> None:
+        workers, self._workers = self._workers, []
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
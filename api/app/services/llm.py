@@ -1,44 +1,166 @@
 import json
 import os
-import httpx
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from ..core.tagging import TagMaster
 from ..models.files import FileTags
+from .classification_cache import CLASSIFY_CACHE_ENABLED, cache_key, classification_cache
+from .http_client import get_http_client, request_timeout
+from .llm_batch import BatchItem, ClassificationBatcher
+from .llm_scheduler import BACKFILL_PRIORITY, INTERACTIVE_PRIORITY, classification_scheduler
+
+# Rough prompt-size estimate for the tokens/min budget (Japanese text runs
+# close to one token per character, English nearer four characters).
+CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "2"))
+COMPLETION_TOKENS_ESTIMATE = 200
+# Characters of extracted text sent to the model, alone or in a batch, and
+# hashed into cache keys: the key covers exactly what the model saw.
+PROMPT_TEXT_CHARS = 2000
+# Background documents are classified several per request; interactive ones never wait.
+LLM_BATCH_ENABLED = os.getenv("LLM_BATCH_ENABLED", "true").strip().lower() in {"1", "true", "yes", "on"}
+LLM_BATCH_MAX_ITEMS = int(os.getenv("LLM_BATCH_MAX_ITEMS", "8"))
+LLM_BATCH_WINDOW_SECONDS = float(os.getenv("LLM_BATCH_WINDOW_MS", "500")) / 1000.0
+
+_SYSTEM_MESSAGE = "You are a helpful assistant that outputs JSON."
+
+
+def _candidates(tag_master: TagMaster) -> str:
+    return f"""Candidates:
+- doc_types: {", ".join(tag_master.doc_types)}
+- topics: {", ".join(tag_master.topics)}
+- states: {", ".join(tag_master.states)}
+- extras: {", ".join(tag_master.extras)}
+
+Instructions:
+1. Select ONE doc_type from the list. If none match, use null.
+2. Select ONE topic from the list. If none match, use null.
+3. Extract ONE entity (client name, project name) if present.
+4. Select ONE state from the list. If none match, use null.
+5. Select up to 2 extras from the list."""
+
+
+def _validated_tags(data: Dict[str, Any], tag_master: TagMaster) -> FileTags:
+    """Builds FileTags, dropping values that are not in the tag master."""
+
+    def _pick(category: str) -> Optional[str]:
+        value = data.get(category)
+        if isinstance(value, str) and tag_master.validate_tag(category, value):
+            return value
+        return None
+
+    extras = data.get("extras")
+    entity = data.get("entity")
+    return FileTags(
+        doc_type=_pick("doc_type"),
+        topic=_pick("topic"),
+        entity=entity if isinstance(entity, str) and entity.strip() else None,
+        state=_pick("state"),
+        extras=[
+            value for value in extras if isinstance(value, str) and tag_master.validate_tag("extra", value)
+        ][:2] if isinstance(extras, list) else [],
+    )
+
 
 class LLMService:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o")
+        self.timeout_seconds = float(os.getenv("OPENAI_TIMEOUT_SEC", "30"))
+        self._batcher = ClassificationBatcher(
+            self.classify_batch,
+            max_items=LLM_BATCH_MAX_ITEMS,
+            window_seconds=LLM_BATCH_WINDOW_SECONDS,
+        )
 
-    async def classify_document(self, text: str, filename: str) -> FileTags:
+    async def classify_document(
+        self,
+        text: str,
+        filename: str,
+        *,
+        priority: int = BACKFILL_PRIORITY,
+        bypass_cache: bool = False,
+        tenant: Optional[str] = None,
+    ) -> FileTags:
+        """
+        Classifies through the shared scheduler. Provider errors that survive
+        every retry raise ClassificationUnavailable so the job can be retried
+        later; malformed responses still degrade to empty tags.
+        Results are cached by snippet, filename features, tag master version
+        and model; bypass_cache forces a fresh call (and refreshes the entry).
+        Below interactive priority, documents are batched (see classify_batch).
+        The tenant selects its tag master override, if any.
+        """
         if not self.api_key:
             # Fallback or mock if no API key
             print("Warning: No OPENAI_API_KEY found. Returning empty tags.")
             return FileTags()
 
-        tag_master = TagMaster.get_instance()
-        
+        tag_master = TagMaster.get_instance(tenant)
+        snippet = text[:PROMPT_TEXT_CHARS]
+        key = cache_key(snippet, filename, tag_master.version, self.model)
+        if CLASSIFY_CACHE_ENABLED and not bypass_cache:
+            cached = await classification_cache.get(key)
+            if cached is not None:
+                return FileTags(**cached)
+
+        if LLM_BATCH_ENABLED and LLM_BATCH_MAX_ITEMS > 1 and priority < INTERACTIVE_PRIORITY:
+            tags = await self._batcher.submit(snippet, filename, priority, tenant)
+        else:
+            tags = await self._classify_single(snippet, filename, priority, tenant)
+        if tags is None:
+            return FileTags()
+        # An all-empty answer is not worth reusing; the next upload asks again.
+        if CLASSIFY_CACHE_ENABLED and any(tags.dict().values()):
+            await classification_cache.put(key, tags.dict())
+        return tags
+
+    async def _complete(self, prompt: str, priority: int, completion_tokens: int) -> Any:
+        """Runs one chat completion through the scheduler and returns the parsed JSON content."""
+        messages = [
+            {"role": "system", "content": _SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ]
+        estimated_tokens = int(len(prompt) / CHARS_PER_TOKEN) + completion_tokens
+
+        async def _call() -> Dict[str, Any]:
+            client = get_http_client()
+            response = await client.post(
+                f"{self.base_url}/chat/completions",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json={
+                    "model": self.model,
+                    "messages": messages,
+                    "response_format": {"type": "json_object"},
+                    "temperature": 0.1
+                },
+                timeout=request_timeout(self.timeout_seconds),
+            )
+            response.raise_for_status()
+            return response.json()
+
+        result = await classification_scheduler.submit(_call, priority=priority, tokens=estimated_tokens)
+        usage = result.get("usage") or {}
+        classification_scheduler.record_usage(estimated_tokens, usage.get("total_tokens"))
+        return json.loads(result["choices"][0]["message"]["content"])
+
+    async def _classify_single(
+        self,
+        snippet: str,
+        filename: str,
+        priority: int,
+        tenant: Optional[str] = None,
+    ) -> Optional[FileTags]:
+        """One document per request. Returns None when the response is malformed."""
+        tag_master = TagMaster.get_instance(tenant)
         prompt = f"""
 You are an AI assistant for file organization.
 Analyze the following document content and filename to assign tags based on the provided candidates.
 
 Filename: {filename}
 Content Snippet:
-{text[:2000]}
-
-Candidates:
-- doc_types: {", ".join(tag_master.doc_types)}
-- topics: {", ".join(tag_master.topics)}
-- states: {", ".join(tag_master.states)}
-- extras: {", ".join(tag_master.extras)}
+{snippet}
 
-Instructions:
-1. Select ONE doc_type from the list. If none match, use null.
-2. Select ONE topic from the list. If none match, use null.
-3. Extract ONE entity (client name, project name) if present.
-4. Select ONE state from the list. If none match, use null.
-5. Select up to 2 extras from the list.
+{_candidates(tag_master)}
 
 Output JSON format:
 {{
@@ -49,34 +171,69 @@ Output JSON format:
   "extras": ["string"]
 }}
 """
-
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={"Authorization": f"Bearer {self.api_key}"},
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "system", "content": "You are a helpful assistant that outputs JSON."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "response_format": {"type": "json_object"},
-                        "temperature": 0.1
-                    }
-                )
-                response.raise_for_status()
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
-                data = json.loads(content)
-                
-                return FileTags(
-                    doc_type=data.get("doc_type"),
-                    topic=data.get("topic"),
-                    entity=data.get("entity"),
-                    state=data.get("state"),
-                    extras=data.get("extras", [])
-                )
-        except Exception as e:
+            data = await self._complete(prompt, priority, COMPLETION_TOKENS_ESTIMATE)
+            if not isinstance(data, dict):
+                raise ValueError("response is not a JSON object")
+            return _validated_tags(data, tag_master)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
             print(f"LLM classification failed: {e}")
-            return FileTags()
+            return None
+
+    async def classify_batch(
+        self,
+        items: List[BatchItem],
+        priority: int,
+        tenant: Optional[str] = None,
+    ) -> Dict[str, Optional[FileTags]]:
+        """
+        Classifies several documents with one prompt that lists the candidates
+        once and asks for a JSON array keyed by id. Items missing from a
+        malformed or partial answer are classified one by one.
+        """
+        if len(items) == 1:
+            item = items[0]
+            return {item.id: await self._classify_single(item.text, item.filename, priority, tenant)}
+        tag_master = TagMaster.get_instance(tenant)
+        documents = "\n\n".join(
+            f"### id: {item.id}\nFilename: {item.filename}\nContent Snippet:\n{item.text[:PROMPT_TEXT_CHARS]}"
+            for item in items
+        )
+        prompt = f"""
+You are an AI assistant for file organization.
+Analyze each of the following documents (content and filename) and assign tags based on the provided candidates.
+
+{documents}
+
+{_candidates(tag_master)}
+
+Output JSON format, with exactly one entry per document id:
+{{
+  "results": [
+    {{
+      "id": "string",
+      "doc_type": "string or null",
+      "topic": "string or null",
+      "entity": "string or null",
+      "state": "string or null",
+      "extras": ["string"]
+    }}
+  ]
+}}
+"""
+        results: Dict[str, Optional[FileTags]] = {}
+        try:
+            data = await self._complete(prompt, priority, COMPLETION_TOKENS_ESTIMATE * len(items))
+            entries = data.get("results") if isinstance(data, dict) else None
+            if not isinstance(entries, list):
+                raise ValueError("response has no results array")
+            wanted = {item.id for item in items}
+            for entry in entries:
+                if isinstance(entry, dict) and str(entry.get("id")) in wanted:
+                    results[str(entry["id"])] = _validated_tags(entry, tag_master)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"LLM batch classification failed, falling back to single requests: {e}")
+        for item in items:
+            if item.id not in results:
+                results[item.id] = await self._classify_single(item.text, item.filename, priority, tenant)
+        return results
@@ -0,0 +1,73 @@
+import asyncio
+import itertools
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..models.files import FileTags
+
+
+@dataclass(slots=True)
+class BatchItem:
+    id: str
+    text: str
+    filename: str
+
+
+# Classifies a batch at the given priority for a group (tenant); returns tags
+# (or None) per item id.
+BatchHandler = Callable[[List[BatchItem], int, Optional[str]], Awaitable[Dict[str, Optional[FileTags]]]]
+_Pending = List[Tuple[BatchItem, int, asyncio.Future]]
+
+
+class ClassificationBatcher:
+    """
+    Collects documents for up to window_seconds or max_items, whichever comes
+    first, and hands them to the handler as one batch. Items are only batched
+    with others of the same group. Each caller gets its own item's result; a
+    failing batch fails every caller in it.
+    """
+
+    def __init__(self, handler: BatchHandler, *, max_items: int, window_seconds: float) -> None:
+        self.handler = handler
+        self.max_items = max(1, max_items)
+        self.window_seconds = max(0.0, window_seconds)
+        self._pending: Dict[Optional[str], _Pending] = {}
+        self._timers: Dict[Optional[str], asyncio.TimerHandle] = {}
+        self._ids = itertools.count()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str, filename: str, priority: int, group: Optional[str] = None) -> Optional[FileTags]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(group, [])
+        pending.append((BatchItem(str(next(self._ids)), text, filename), priority, future))
+        if len(pending) >= self.max_items:
+            self._flush(group)
+        elif group not in self._timers:
+            self._timers[group] = loop.call_later(self.window_seconds, self._flush, group)
+        return await future
+
+    def _flush(self, group: Optional[str]) -> None:
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        batch = [entry for entry in self._pending.pop(group, []) if not entry[2].done()]
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._dispatch(batch, group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: _Pending, group: Optional[str]) -> None:
+        try:
+            results = await self.handler(
+                [item for item, _, _ in batch], max(priority for _, priority, _ in batch), group
+            )
+        except Exception as exc:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for item, _, future in batch:
+            if not future.done():
+                future.set_result(results.get(item.id))
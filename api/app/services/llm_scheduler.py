@@ -0,0 +1,227 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from collections import deque
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import httpx
+
+from .rate_limit import Clock, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "4"))
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get("LLM_TOKENS_PER_MINUTE", "90000"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_RETRY_BASE_SECONDS = float(os.environ.get("LLM_RETRY_BASE_SEC", "1"))
+LLM_RETRY_MAX_SECONDS = float(os.environ.get("LLM_RETRY_MAX_SEC", "60"))
+# Higher runs first, matching job priorities.
+INTERACTIVE_PRIORITY = 10
+BACKFILL_PRIORITY = 0
+_WAIT_SAMPLES = 512
+
+
+class ClassificationUnavailable(RuntimeError):
+    """Raised when the provider keeps failing after every retry."""
+
+
+def retry_after_seconds(response: Optional[httpx.Response], *, now: Optional[float] = None) -> Optional[float]:
+    """Parses Retry-After as delta-seconds or an HTTP date."""
+    if response is None:
+        return None
+    raw = (response.headers.get("retry-after") or "").strip()
+    if not raw:
+        return None
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(raw)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    current = now if now is not None else time.time()
+    return max(0.0, when.timestamp() - current)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status == 408 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class ClassificationScheduler:
+    """
+    Admission control for LLM calls: at most max_in_flight run at once, request
+    and token budgets per minute are enforced with token buckets, 429/5xx are
+    retried with jittered backoff (waiting out Retry-After for every caller),
+    and waiting calls are admitted highest priority first. Clock and sleep are
+    injectable for tests.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_in_flight: int = LLM_MAX_IN_FLIGHT,
+        requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE_SECONDS,
+        retry_max: float = LLM_RETRY_MAX_SECONDS,
+        clock: Clock = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max(0, max_retries)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._clock = clock
+        self._sleep = sleep
+        self._requests = TokenBucket.per_minute(requests_per_minute, clock=clock) if requests_per_minute > 0 else None
+        self._tokens = TokenBucket.per_minute(tokens_per_minute, clock=clock) if tokens_per_minute > 0 else None
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._dispatch_lock: Optional[asyncio.Lock] = None
+        self._paused_until = 0.0
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._counters: Dict[str, int] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "rate_limited": 0,
+        }
+
+    def _pump(self) -> None:
+        while self._waiters and self._in_flight < self.max_in_flight:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._pump()
+
+    async def _acquire(self, priority: int, tokens: int) -> None:
+        """Waits for a slot (by priority), then for the rate budgets."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._sequence), future))
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        try:
+            if self._dispatch_lock is None:
+                self._dispatch_lock = asyncio.Lock()
+            # Budgets are reserved one caller at a time so admission order is kept.
+            async with self._dispatch_lock:
+                delay = max(0.0, self._paused_until - self._clock())
+                if self._requests is not None:
+                    delay = max(delay, self._requests.reserve(1))
+                if self._tokens is not None:
+                    delay = max(delay, self._tokens.reserve(tokens))
+                if delay > 0:
+                    await self._sleep(delay)
+        except BaseException:
+            self._release()
+            raise
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, retry_after + random.uniform(0, self.retry_base))
+        return delay
+
+    async def submit(
+        self,
+        call: Callable[[], Awaitable[T]],
+        *,
+        priority: int = BACKFILL_PRIORITY,
+        tokens: int = 1,
+    ) -> T:
+        """
+        Runs `call` under the concurrency and rate limits, retrying retryable
+        HTTP errors. Raises ClassificationUnavailable once retries are spent.
+        """
+        self._counters["submitted"] += 1
+        queued_at = self._clock()
+        attempt = 0
+        while True:
+            await self._acquire(priority, tokens)
+            if attempt == 0:
+                self._waits.append(self._clock() - queued_at)
+            try:
+                result = await call()
+            except Exception as exc:
+                if not _is_retryable(exc):
+                    self._counters["failed"] += 1
+                    raise
+                retry_after = None
+                if isinstance(exc, httpx.HTTPStatusError):
+                    retry_after = retry_after_seconds(exc.response)
+                    if exc.response.status_code == 429:
+                        self._counters["rate_limited"] += 1
+                        pause = retry_after if retry_after is not None else self.retry_base
+                        self._paused_until = max(self._paused_until, self._clock() + pause)
+                if attempt >= self.max_retries:
+                    self._counters["failed"] += 1
+                    raise ClassificationUnavailable(f"LLM request failed after {attempt + 1} attempts: {exc}") from exc
+                delay = self._backoff(attempt, retry_after)
+                attempt += 1
+                self._counters["retries"] += 1
+                logger.info("LLM request failed (%s); retry %d in %.1fs", exc, attempt, delay)
+            else:
+                self._counters["completed"] += 1
+                return result
+            finally:
+                self._release()
+            await self._sleep(delay)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Corrects the token budget once the provider reports real usage."""
+        if self._tokens is not None and actual_tokens is not None:
+            self._tokens.adjust(estimated_tokens - actual_tokens)
+
+    def metrics(self) -> Dict[str, Any]:
+        depth: Dict[str, int] = {}
+        for negated, _, future in self._waiters:
+            if not future.done():
+                depth[str(-negated)] = depth.get(str(-negated), 0) + 1
+        waits = sorted(self._waits)
+        return {
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_priority": depth,
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "paused_for_seconds": round(max(0.0, self._paused_until - self._clock()), 3),
+            "wait_seconds": {
+                "samples": len(waits),
+                "avg": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "p95": round(waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+                "max": round(waits[-1], 3) if waits else 0.0,
+            },
+            "requests_available": round(self._requests.available, 2) if self._requests else None,
+            "tokens_available": round(self._tokens.available) if self._tokens else None,
+            **self._counters,
+        }
+
+
+classification_scheduler = ClassificationScheduler()
@@ -0,0 +1,151 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.tagging import TagMaster
+from ..models.files import FileTags
+
+LOCAL_TAGGER_ENABLED = os.environ.get("FILES_LOCAL_TAGGER", "true").strip().lower() in {"1", "true", "yes", "on"}
+# doc_type confidence needed to skip the LLM.
+LOCAL_TAGGER_THRESHOLD = float(os.environ.get("FILES_LOCAL_TAGGER_THRESHOLD", "0.75"))
+# Only the head of the extracted text (roughly the first page) is matched.
+FIRST_PAGE_CHARS = int(os.environ.get("FILES_LOCAL_TAGGER_CHARS", "3000"))
+
+FILENAME_WEIGHT = 3.0
+TEXT_WEIGHT = 1.0
+# Repeated mentions in the text count up to this many times per tag.
+MAX_TEXT_HITS = 3
+# Pseudo-score for "none of the candidates": keeps a single weak hit from
+# looking certain.
+PRIOR = 1.5
+MIN_SCORE = 2.0
+MAX_EXTRAS = 2
+MAX_MATCHERS = 64
+
+# tag master field -> FileTags field
+_CATEGORIES = (("doc_types", "doc_type"), ("topics", "topic"), ("states", "state"), ("extras", "extras"))
+_ASCII_WORD_CHAR = re.compile(r"[a-z0-9]")
+
+
+def _term_pattern(term: str) -> str:
+    """
+    Latin terms only match whole words ("spec" must not fire on "respect");
+    CJK terms have no word separators and match as plain substrings.
+    """
+    pattern = re.escape(term)
+    if _ASCII_WORD_CHAR.match(term[0]):
+        pattern = r"(?<![a-z0-9])" + pattern
+    if _ASCII_WORD_CHAR.match(term[-1]):
+        pattern += r"(?![a-z0-9])"
+    return pattern
+
+
+@dataclass(slots=True)
+class LocalTagResult:
+    tags: FileTags
+    # Per-category confidence in [0, 1]; "doc_type" decides the fast path.
+    confidence: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def doc_type_confidence(self) -> float:
+        return self.confidence.get("doc_type", 0.0)
+
+    def is_confident(self, threshold: float = LOCAL_TAGGER_THRESHOLD) -> bool:
+        return self.tags.doc_type is not None and self.doc_type_confidence >= threshold
+
+
+class VocabularyMatcher:
+    """
+    Every tag and synonym compiled into one case-insensitive alternation
+    (longest first), so a document is scanned once regardless of vocabulary size.
+    Latin terms are anchored at word boundaries.
+    """
+
+    def __init__(self, tag_master: TagMaster) -> None:
+        self.version = tag_master.version
+        self._terms: Dict[str, List[Tuple[str, str]]] = {}
+        for source, category in _CATEGORIES:
+            for tag in getattr(tag_master, source):
+                for term in [tag, *tag_master.synonyms.get(tag, [])]:
+                    term = term.strip().lower()
+                    if term:
+                        self._terms.setdefault(term, []).append((category, tag))
+        alternatives = sorted(self._terms, key=len, reverse=True)
+        self._pattern = re.compile("|".join(_term_pattern(term) for term in alternatives)) if alternatives else None
+
+    def hits(self, text: str) -> List[Tuple[str, str]]:
+        """(category, tag) for every vocabulary occurrence in text."""
+        if self._pattern is None or not text:
+            return []
+        found: List[Tuple[str, str]] = []
+        for match in self._pattern.finditer(text.lower()):
+            found.extend(self._terms[match.group(0)])
+        return found
+
+
+class LocalTagger:
+    """Keyword classifier over the tag master vocabulary, tried before the LLM."""
+
+    def __init__(self) -> None:
+        # Compiled matchers by tag master version (base and tenant overrides).
+        self._matchers: Dict[str, VocabularyMatcher] = {}
+        self.local = 0
+        self.fallbacks = 0
+
+    def _get_matcher(self, tenant: Optional[str]) -> VocabularyMatcher:
+        tag_master = TagMaster.get_instance(tenant)
+        matcher = self._matchers.get(tag_master.version)
+        if matcher is None:
+            if len(self._matchers) >= MAX_MATCHERS:
+                self._matchers.clear()
+            matcher = VocabularyMatcher(tag_master)
+            self._matchers[tag_master.version] = matcher
+        return matcher
+
+    def classify(self, text: str, filename: str, tenant: Optional[str] = None) -> LocalTagResult:
+        matcher = self._get_matcher(tenant)
+        scores: Dict[str, Dict[str, float]] = {category: {} for _, category in _CATEGORIES}
+        for category, tag in set(matcher.hits(filename)):
+            scores[category][tag] = scores[category].get(tag, 0.0) + FILENAME_WEIGHT
+        counts: Dict[Tuple[str, str], int] = {}
+        for hit in matcher.hits(text[:FIRST_PAGE_CHARS]):
+            counts[hit] = counts.get(hit, 0) + 1
+        for (category, tag), count in counts.items():
+            scores[category][tag] = scores[category].get(tag, 0.0) + TEXT_WEIGHT * min(count, MAX_TEXT_HITS)
+
+        values: Dict[str, Any] = {}
+        confidence: Dict[str, float] = {}
+        for category, tag_scores in scores.items():
+            ranked = sorted(tag_scores.items(), key=lambda item: item[1], reverse=True)
+            if category == "extras":
+                values["extras"] = [tag for tag, score in ranked if score >= MIN_SCORE][:MAX_EXTRAS]
+                continue
+            if not ranked or ranked[0][1] < MIN_SCORE:
+                values[category] = None
+                confidence[category] = 0.0
+                continue
+            top = ranked[0][1]
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            values[category] = ranked[0][0]
+            confidence[category] = round(top / (top + runner_up + PRIOR), 3)
+        return LocalTagResult(tags=FileTags(**values), confidence=confidence)
+
+    def record(self, used_local: bool) -> None:
+        if used_local:
+            self.local += 1
+        else:
+            self.fallbacks += 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.local + self.fallbacks
+        return {
+            "enabled": LOCAL_TAGGER_ENABLED,
+            "threshold": LOCAL_TAGGER_THRESHOLD,
+            "local": self.local,
+            "llm_fallbacks": self.fallbacks,
+            "llm_calls_saved": round(self.local / total, 3) if total else 0.0,
+        }
+
+
+local_tagger = LocalTagger()
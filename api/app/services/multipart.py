@@ -0,0 +1,85 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Dict, Mapping, Optional
+
+# Size of the pieces read from disk (or passed through from a download) while
+# building a request body; memory per upload stays around one chunk.
+MULTIPART_CHUNK_BYTES = int(os.environ.get("HTTP_MULTIPART_CHUNK_KB", "256")) * 1024
+
+
+def _quote(value: str) -> str:
+    # Same escaping as browsers (and httpx) use for form-data parameters.
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+async def iter_file_chunks(path: Path, chunk_size: int = MULTIPART_CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Reads a file in chunks off the event loop."""
+    handle = await asyncio.to_thread(open, path, "rb")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(handle.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        handle.close()
+
+
+class MultipartStream:
+    """
+    multipart/form-data body with plain fields and one file part whose content
+    is an async byte stream. Pass as `content=` with `headers` to an httpx
+    request: the body is produced while it is sent, so the file is never held
+    in memory as a whole. With content_length (the file part's exact size) the
+    body is sent with a Content-Length header; without it, chunked.
+    """
+
+    def __init__(
+        self,
+        fields: Mapping[str, str],
+        *,
+        file_field: str,
+        file_name: str,
+        content: AsyncIterable[bytes],
+        content_type: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ) -> None:
+        self.boundary = os.urandom(16).hex()
+        self._fields = dict(fields)
+        self._file_field = file_field
+        self._file_name = file_name
+        self._content = content
+        self._content_type = content_type or "application/octet-stream"
+        self._head = self._preamble()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+        self.content_length = (
+            len(self._head) + content_length + len(self._tail) if content_length is not None else None
+        )
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": f"multipart/form-data; boundary={self.boundary}"}
+        if self.content_length is not None:
+            headers["Content-Length"] = str(self.content_length)
+        return headers
+
+    def _preamble(self) -> bytes:
+        parts = []
+        for name, value in self._fields.items():
+            parts.append(
+                f'--{self.boundary}\r\nContent-Disposition: form-data; name="{_quote(name)}"\r\n\r\n{value}\r\n'
+            )
+        parts.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote(self._file_field)}"; filename="{_quote(self._file_name)}"\r\n'
+            f"Content-Type: {self._content_type}\r\n\r\n"
+        )
+        return "".join(parts).encode("utf-8")
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self._head
+        async for chunk in self._content:
+            if chunk:
+                yield chunk
+        yield self._tail
@@ -0,0 +1,140 @@
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import file_storage
+from .extraction import extract_text_async
+from .jobs import JobQueue, StageSpec
+from .llm import LLMService
+from .llm_scheduler import BACKFILL_PRIORITY
+from .local_tagger import LOCAL_TAGGER_ENABLED, local_tagger
+from ..models.files import FileTags
+
+JOB_QUEUE_ENABLED = os.environ.get("FILES_JOB_QUEUE", "true").strip().lower() in {"1", "true", "yes", "on"}
+JOB_DB_PATH = Path(
+    os.environ.get("FILES_JOB_DB", file_storage.FILE_STORAGE_ROOT / "jobs.sqlite3")
+).resolve()
+# Finished and exhausted jobs are deleted this long after their last update; 0 keeps them.
+JOB_RETENTION_DAYS = float(os.environ.get("FILES_JOB_RETENTION_DAYS", "7"))
+
+llm_service = LLMService()
+
+# (file_id, storage path, original filename, sha256 digest)
+UploadItem = Tuple[str, Path, str, Optional[str]]
+
+
+async def extract_stage(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    record = file_storage.get_file(payload["file_id"]) or {}
+    text = await extract_text_async(
+        Path(payload["path"]), digest=payload.get("digest"), mime_type=record.get("mime_type")
+    )
+    if not text:
+        print(f"No text extracted from {payload['filename']}")
+        file_storage.complete_object_processing(payload.get("digest"), None)
+        return None
+    return {**payload, "text": text, "tenant": record.get("tenant")}
+
+
+async def classify_stage(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    tags = None
+    if LOCAL_TAGGER_ENABLED:
+        # Confident keyword matches against the tag master skip the LLM entirely.
+        local = local_tagger.classify(payload["text"], payload["filename"], payload.get("tenant"))
+        if local.is_confident():
+            tags = local.tags
+        local_tagger.record(tags is not None)
+    if tags is None:
+        tags = await llm_service.classify_document(
+            payload["text"],
+            payload["filename"],
+            priority=int(payload.get("priority", BACKFILL_PRIORITY)),
+            bypass_cache=bool(payload.get("bypass_cache", False)),
+            tenant=payload.get("tenant"),
+        )
+    result = {key: value for key, value in payload.items() if key != "text"}
+    return {**result, "tags": tags.dict()}
+
+
+async def index_stage(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    file_storage.update_file_metadata(payload["file_id"], tags=payload["tags"])
+    # Share the result with duplicates of the same object
+    file_storage.complete_object_processing(payload.get("digest"), payload["tags"])
+    print(f"File {payload['file_id']} tagged: {FileTags(**payload['tags'])}")
+    return None
+
+
+async def _on_job_failed(payload: Dict[str, Any]) -> None:
+    file_storage.complete_object_processing(payload.get("digest"), None)
+
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """The upload job queue. Its SQLite database is opened on first use, not at import."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(
+            JOB_DB_PATH,
+            [
+                StageSpec("extract", extract_stage, int(os.environ.get("FILES_JOB_EXTRACT_CONCURRENCY", "2"))),
+                StageSpec("classify", classify_stage, int(os.environ.get("FILES_JOB_CLASSIFY_CONCURRENCY", "8"))),
+                StageSpec("index", index_stage, int(os.environ.get("FILES_JOB_INDEX_CONCURRENCY", "1"))),
+            ],
+            max_attempts=int(os.environ.get("FILES_JOB_MAX_ATTEMPTS", "5")),
+            retention_seconds=JOB_RETENTION_DAYS * 24 * 3600,
+            on_failure=_on_job_failed,
+        )
+    return _job_queue
+
+
+async def stop_job_queue() -> None:
+    if _job_queue is not None:
+        await _job_queue.stop()
+
+
+def _job_payload(item: UploadItem, priority: int = BACKFILL_PRIORITY) -> Tuple[str, Dict[str, Any]]:
+    file_id, file_path, filename, digest = item
+    # Idempotency: the same file with the same content is only processed once.
+    key = f"{file_id}:{digest or ''}"
+    return key, {
+        "file_id": file_id,
+        "path": str(file_path),
+        "filename": filename,
+        "digest": digest,
+        # Carried along so classification keeps the upload's lane.
+        "priority": priority,
+    }
+
+
+async def enqueue_uploads(items: List[UploadItem], *, priority: int = 0) -> List[Dict[str, Any]]:
+    return await get_job_queue().enqueue_many([_job_payload(item, priority) for item in items], priority=priority)
+
+
+async def process_file_upload(
+    file_id: str,
+    file_path: Path,
+    filename: str,
+    digest: Optional[str] = None,
+    priority: int = BACKFILL_PRIORITY,
+):
+    """
+    Runs extract -> classify -> index inline (used when the job queue is disabled).
+    """
+    payload: Optional[Dict[str, Any]] = _job_payload((file_id, file_path, filename, digest), priority)[1]
+    try:
+        for stage in (extract_stage, classify_stage, index_stage):
+            payload = await stage(payload)
+            if payload is None:
+                return
+    except Exception as e:
+        print(f"Error processing file upload for {file_id}: {e}")
+        await _on_job_failed({"digest": digest})
+
+
+async def process_file_batch(items: List[UploadItem], priority: int = BACKFILL_PRIORITY):
+    """
+    Background task for bulk uploads: processes every stored file of the batch in order.
+    """
+    for file_id, file_path, filename, digest in items:
+        await process_file_upload(file_id, file_path, filename, digest, priority)
@@ -0,0 +1,51 @@
+import time
+from typing import Callable
+
+Clock = Callable[[], float]
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate` tokens per second up to
+    `capacity`. reserve() always succeeds and returns how long the caller must
+    wait: the balance may go negative, so later callers queue behind earlier
+    reservations instead of racing for the same tokens.
+    """
+
+    def __init__(self, rate: float, capacity: float, *, clock: Clock = time.monotonic) -> None:
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    @classmethod
+    def per_minute(cls, limit: float, *, clock: Clock = time.monotonic) -> "TokenBucket":
+        """A bucket allowing `limit` per minute, bursting up to one minute's worth."""
+        return cls(limit / 60.0, limit, clock=clock)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated)
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    @property
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Takes `amount` tokens (capped at capacity) and returns the delay in seconds."""
+        self._refill()
+        self._tokens -= min(amount, self.capacity)
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def adjust(self, delta: float) -> None:
+        """Returns (delta > 0) or charges (delta < 0) tokens after the fact."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + delta)
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from . import file_storage, text_sidecar
+
+try:  # pragma: no cover - POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+GC_INTERVAL_SECONDS = float(os.environ.get("FILE_GC_INTERVAL_SEC", "30"))
+GC_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("FILE_GC_RECONCILE_INTERVAL_SEC", "3600"))
+GC_BATCH_SIZE = int(os.environ.get("FILE_GC_BATCH_SIZE", "200"))
+# Blobs younger than this are never touched, by the queue or the sweep: they
+# may belong to an upload that has been stored but not registered yet.
+GC_GRACE_SECONDS = float(os.environ.get("FILE_GC_GRACE_SEC", "300"))
+# Sleep GC_THROTTLE_SLEEP_SEC after every GC_THROTTLE_EVERY filesystem operations.
+GC_THROTTLE_EVERY = int(os.environ.get("FILE_GC_THROTTLE_EVERY", "500"))
+GC_THROTTLE_SLEEP_SECONDS = float(os.environ.get("FILE_GC_THROTTLE_SLEEP_SEC", "0.05"))
+GC_REPORT_LIMIT = 100
+GC_LOCK_PATH = file_storage.FILE_STORAGE_ROOT / "gc.lock"
+
+
+class _Throttle:
+    def __init__(self, every: int, pause: float) -> None:
+        self.every = max(1, every)
+        self.pause = pause
+        self._ops = 0
+
+    def tick(self) -> None:
+        self._ops += 1
+        if self.pause > 0 and self._ops % self.every == 0:
+            time.sleep(self.pause)
+
+
+@contextmanager
+def _exclusive_gc_lock() -> Iterator[bool]:
+    """Non-blocking lock so only one worker process reconciles at a time."""
+    with open(GC_LOCK_PATH, "a+") as handle:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _prune_empty_dirs(directories: set[Path], root: Path = file_storage.OBJECTS_ROOT) -> int:
+    """Removes empty shard directories bottom-up, stopping at the tree root."""
+    removed = 0
+    for directory in sorted(directories, key=lambda item: len(item.parts), reverse=True):
+        current = directory
+        while current != root and root in current.parents:
+            try:
+                current.rmdir()
+            except OSError:
+                break
+            removed += 1
+            current = current.parent
+    return removed
+
+
+def _iter_object_files(root: Path) -> Iterator[os.DirEntry]:
+    """Streaming depth-first walk; never materialises the whole tree."""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+        except FileNotFoundError:
+            continue
+
+
+def reclaim_pending(limit: int = GC_BATCH_SIZE) -> Dict[str, int]:
+    """Deletes a batch of blobs queued by delete_file and prunes their shard directories."""
+    batch = file_storage.take_reclaim_batch(limit, GC_GRACE_SECONDS)
+    throttle = _Throttle(GC_THROTTLE_EVERY, GC_THROTTLE_SLEEP_SECONDS)
+    parents: set[Path] = set()
+    digests: set[str] = set()
+    removed = 0
+    for item in batch:
+        try:
+            path = file_storage.reclaim_object(item, GC_GRACE_SECONDS)
+        except (OSError, ValueError):
+            continue
+        if path is None:
+            continue
+        removed += 1
+        parents.add(path.parent)
+        digests.add(path.name[:64])
+        throttle.tick()
+    if file_storage.CONTENT_ADDRESSED:
+        # A reclaimed blob may be a redundant copy of a digest that is still live.
+        file_storage.for_unreferenced_digests(digests, text_sidecar.remove_sidecars)
+    return {"removed": removed, "dirs_removed": _prune_empty_dirs(parents)}
+
+
+def reconcile(*, dry_run: bool = True, grace_seconds: float = GC_GRACE_SECONDS) -> Dict[str, Any]:
+    """
+    Walks the object tree and deletes blobs the registry does not reference
+    (e.g. left behind by a crash between store and register, or stale temp files).
+    With dry_run=True only a report is produced.
+    """
+    report: Dict[str, Any] = {
+        "dry_run": dry_run,
+        "scanned": 0,
+        "orphans": 0,
+        "orphan_bytes": 0,
+        "removed": 0,
+        "dirs_removed": 0,
+        "sample": [],
+        "sidecar_orphans": 0,
+        "sidecars_removed": 0,
+        "skipped": False,
+    }
+    with _exclusive_gc_lock() as acquired:
+        if not acquired:
+            report["skipped"] = True
+            return report
+        referenced = file_storage.referenced_storage_paths()
+        cutoff = time.time() - grace_seconds
+        throttle = _Throttle(GC_THROTTLE_EVERY, GC_THROTTLE_SLEEP_SECONDS)
+        parents: set[Path] = set()
+        for entry in _iter_object_files(file_storage.OBJECTS_ROOT):
+            report["scanned"] += 1
+            throttle.tick()
+            if entry.path in referenced:
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            report["orphans"] += 1
+            report["orphan_bytes"] += stat.st_size
+            if len(report["sample"]) < GC_REPORT_LIMIT:
+                report["sample"].append(entry.path)
+            if dry_run:
+                continue
+            try:
+                with file_storage._object_store_lock():
+                    # Re-checked under the lock: a concurrent store_object may have just revived it.
+                    if os.stat(entry.path).st_mtime > cutoff:
+                        continue
+                    os.unlink(entry.path)
+            except OSError:
+                continue
+            report["removed"] += 1
+            parents.add(Path(entry.path).parent)
+        if not dry_run:
+            report["dirs_removed"] = _prune_empty_dirs(parents)
+
+        # Text sidecars whose digest no longer has any record or object.
+        digests = file_storage.referenced_digests()
+        sidecar_parents: set[Path] = set()
+        for entry in _iter_object_files(text_sidecar.TEXT_ROOT):
+            throttle.tick()
+            if entry.name.split(".")[0] in digests and not entry.name.startswith("."):
+                continue
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            report["sidecar_orphans"] += 1
+            if dry_run:
+                continue
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                continue
+            report["sidecars_removed"] += 1
+            sidecar_parents.add(Path(entry.path).parent)
+        if not dry_run:
+            report["dirs_removed"] += _prune_empty_dirs(sidecar_parents, text_sidecar.TEXT_ROOT)
+    return report
+
+
+class ObjectReclaimer:
+    """Background task that drains queued deletions and periodically reconciles."""
+
+    def __init__(
+        self,
+        *,
+        interval: float = GC_INTERVAL_SECONDS,
+        reconcile_interval: float = GC_RECONCILE_INTERVAL_SECONDS,
+    ) -> None:
+        self.interval = max(1.0, interval)
+        self.reconcile_interval = reconcile_interval
+        self.last_reclaim: Optional[Dict[str, int]] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._last_reconcile = time.monotonic()
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def reconcile(self, *, dry_run: bool = True) -> Dict[str, Any]:
+        report = await asyncio.to_thread(reconcile, dry_run=dry_run)
+        self.last_report = report
+        return report
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "pending": file_storage.pending_reclaim_count(),
+            "last_reclaim": self.last_reclaim,
+            "last_reconcile": self.last_report,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                while True:
+                    result = await asyncio.to_thread(reclaim_pending)
+                    self.last_reclaim = result
+                    if result["removed"] < GC_BATCH_SIZE:
+                        break
+                if self.reconcile_interval > 0 and time.monotonic() - self._last_reconcile >= self.reconcile_interval:
+                    self._last_reconcile = time.monotonic()
+                    await self.reconcile(dry_run=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Object reclaimer pass failed: %s", exc)
+            await asyncio.sleep(self.interval)
+
+
+reclaimer = ObjectReclaimer()
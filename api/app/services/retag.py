@@ -0,0 +1,306 @@
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+
+from . import file_storage, text_sidecar
+from .extraction import EXTRACT_CHAR_BUDGET, EXTRACTOR_VERSION, extract_text_async
+from .llm_scheduler import BACKFILL_PRIORITY
+from .processing import classify_stage
+from .rate_limit import TokenBucket
+
+try:  # pragma: no cover - POSIX only
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RETAG_STATE_PATH = file_storage.FILE_STORAGE_ROOT / "retag.json"
+RETAG_LOCK_PATH = file_storage.FILE_STORAGE_ROOT / "retag.lock"
+RETAG_PAGE_SIZE = int(os.environ.get("FILES_RETAG_PAGE_SIZE", "100"))
+RETAG_CONCURRENCY = int(os.environ.get("FILES_RETAG_CONCURRENCY", "4"))
+# Documents per minute handed to classification; 0 disables the throttle.
+RETAG_RATE_PER_MINUTE = float(os.environ.get("FILES_RETAG_RATE_PER_MIN", "120"))
+RETAG_AUTO_RESUME = os.environ.get("FILES_RETAG_AUTO_RESUME", "true").strip().lower() in {"1", "true", "yes", "on"}
+
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _load_state() -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(RETAG_STATE_PATH.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as exc:
+        logger.warning("Re-tag checkpoint is unreadable; starting over: %s", exc)
+        return None
+
+
+def _save_state(state: Dict[str, Any]) -> None:
+    RETAG_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = RETAG_STATE_PATH.with_suffix(f".{uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp_path.replace(RETAG_STATE_PATH)
+
+
+def _new_state(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": uuid4().hex,
+        "status": "pending",
+        "params": params,
+        # Last file id whose result has been written; the walk resumes after it.
+        "cursor": None,
+        "total": 0,
+        "processed": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "skipped": 0,
+        "failed": 0,
+        "last_error": None,
+        "started_at": _now(),
+        "updated_at": _now(),
+        "finished_at": None,
+    }
+
+
+async def _load_text(record: Dict[str, Any]) -> str:
+    """Prefers the cached text sidecar; otherwise extracts just the classification head."""
+    digest = record.get("sha256")
+    if digest:
+        cached = await asyncio.to_thread(
+            text_sidecar.read_text, digest, EXTRACTOR_VERSION, 5, EXTRACT_CHAR_BUDGET
+        )
+        if cached is not None:
+            return cached
+    return await extract_text_async(
+        Path(record.get("storage_path", "")), digest=digest, mime_type=record.get("mime_type")
+    )
+
+
+class RetagJob:
+    """
+    Re-classifies existing files page by page (ordered by id) with bounded
+    concurrency and a documents-per-minute throttle. Each page's tag updates
+    are written in one registry transaction, then the cursor is checkpointed,
+    so an interrupted run resumes after the last written page.
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task[None]] = None
+        self._lock_handle = None
+        self._stopping = False
+        self.state: Optional[Dict[str, Any]] = _load_state()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def status(self) -> Dict[str, Any]:
+        state = dict(self.state or {"status": "idle"})
+        if state.get("status") == "running" and not self.running:
+            # Checkpointed as running by a process that is gone (or another worker).
+            state["status"] = "interrupted"
+        total = state.get("total") or 0
+        state["progress"] = round(state.get("processed", 0) / total, 4) if total else 0.0
+        return state
+
+    def _acquire_lock(self) -> bool:
+        """Only one process walks the registry at a time."""
+        handle = open(RETAG_LOCK_PATH, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return False
+        self._lock_handle = handle
+        return True
+
+    def _release_lock(self) -> None:
+        handle, self._lock_handle = self._lock_handle, None
+        if handle is not None:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            handle.close()
+
+    def start(
+        self,
+        *,
+        tenant: Optional[str] = None,
+        only_untagged: bool = False,
+        bypass_cache: bool = False,
+        resume: bool = True,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        Starts a run in the background. With resume=True an unfinished run with
+        the same parameters continues from its checkpoint.
+        """
+        if self.running:
+            raise RuntimeError("a re-tag run is already in progress")
+        if not self._acquire_lock():
+            raise RuntimeError("a re-tag run is already in progress in another process")
+        try:
+            params = {"tenant": tenant, "only_untagged": only_untagged, "bypass_cache": bypass_cache}
+            previous = _load_state()
+            if (
+                resume
+                and previous
+                and previous.get("params") == params
+                and previous.get("status") in {"running", "cancelled", "failed"}
+            ):
+                state = previous
+            else:
+                state = _new_state(params)
+                state["total"] = len(file_storage.list_files(tenant=tenant))
+            state.update(status="running", finished_at=None, updated_at=_now())
+            _save_state(state)
+            self.state = state
+            self._task = asyncio.get_running_loop().create_task(self._run(on_progress))
+        except BaseException:
+            # _run releases the lock when it finishes; nothing will run now.
+            self._release_lock()
+            raise
+        return self.status()
+
+    def resume_if_interrupted(self) -> bool:
+        state = _load_state()
+        if not RETAG_AUTO_RESUME or not state or state.get("status") != "running" or self.running:
+            return False
+        try:
+            self.start(**state["params"], resume=True)
+        except RuntimeError:
+            return False
+        return True
+
+    async def cancel(self) -> Dict[str, Any]:
+        """Stops the run for good; a later start() with resume=True can still pick it up."""
+        return await self._cancel_task(stopping=False)
+
+    async def stop(self) -> None:
+        """Stops the run on shutdown, leaving it marked running so the next start resumes it."""
+        await self._cancel_task(stopping=True)
+
+    async def _cancel_task(self, *, stopping: bool) -> Dict[str, Any]:
+        if self._task is not None:
+            self._stopping = stopping
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._stopping = False
+        return self.status()
+
+    async def wait(self) -> Dict[str, Any]:
+        if self._task is not None:
+            await asyncio.shield(self._task)
+        return self.status()
+
+    async def _classify(self, record: Dict[str, Any], params: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        text = await _load_text(record)
+        if not text:
+            return "skipped", None
+        result = await classify_stage(
+            {
+                "file_id": record["id"],
+                "filename": record.get("original_name", ""),
+                "text": text,
+                "tenant": record.get("tenant"),
+                "priority": BACKFILL_PRIORITY,
+                "bypass_cache": params["bypass_cache"],
+            }
+        )
+        return "classified", result["tags"] if result else None
+
+    async def _run(self, on_progress: Optional[ProgressCallback]) -> None:
+        state = self.state
+        params = state["params"]
+        limit = asyncio.Semaphore(max(1, RETAG_CONCURRENCY))
+        bucket = TokenBucket.per_minute(RETAG_RATE_PER_MINUTE) if RETAG_RATE_PER_MINUTE > 0 else None
+
+        async def _one(record: Dict[str, Any]) -> Tuple[Dict[str, Any], str, Any]:
+            async with limit:
+                if bucket is not None:
+                    delay = bucket.reserve(1)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                try:
+                    outcome, tags = await self._classify(record, params)
+                    return record, outcome, tags
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    return record, "failed", str(exc)
+
+        try:
+            while True:
+                page = await asyncio.to_thread(
+                    file_storage.list_files_page,
+                    after_id=state["cursor"],
+                    limit=max(1, RETAG_PAGE_SIZE),
+                    tenant=params["tenant"],
+                )
+                if not page:
+                    break
+                todo = [
+                    record for record in page
+                    if not (params["only_untagged"] and (record.get("tags") or {}).get("doc_type"))
+                ]
+                state["skipped"] += len(page) - len(todo)
+                results = await asyncio.gather(*(_one(record) for record in todo))
+
+                changes: Dict[str, Dict[str, Any]] = {}
+                object_tags: Dict[str, Dict[str, Any]] = {}
+                for record, outcome, value in results:
+                    if outcome == "failed":
+                        state["failed"] += 1
+                        state["last_error"] = f"{record['id']}: {value}"
+                    elif outcome == "skipped":
+                        state["skipped"] += 1
+                    elif not file_storage.has_tags(value):
+                        # No API key or unusable LLM output: keep the existing tags.
+                        state["failed"] += 1
+                        state["last_error"] = f"{record['id']}: classification returned no tags"
+                    elif value == record.get("tags"):
+                        state["unchanged"] += 1
+                    else:
+                        changes[record["id"]] = {"tags": value}
+                        if record.get("sha256"):
+                            object_tags[record["sha256"]] = value
+                if changes:
+                    await asyncio.to_thread(file_storage.update_files_metadata, changes, object_tags=object_tags)
+                state["updated"] += len(changes)
+                state["processed"] += len(page)
+                state["cursor"] = page[-1]["id"]
+                state["updated_at"] = _now()
+                await asyncio.to_thread(_save_state, state)
+                if on_progress is not None:
+                    on_progress(self.status())
+            state["status"] = "done"
+        except asyncio.CancelledError:
+            state["status"] = "running" if self._stopping else "cancelled"
+            raise
+        except Exception as exc:
+            logger.warning("Re-tag run failed: %s", exc)
+            state["status"] = "failed"
+            state["last_error"] = str(exc)
+        finally:
+            state["updated_at"] = _now()
+            if state["status"] != "running":
+                state["finished_at"] = _now()
+            _save_state(state)
+            self._release_lock()
+
+
+retag_job = RetagJob()
@@ -0,0 +1,132 @@
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from . import file_storage
+
+try:  # pragma: no cover - optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# Extracted text is stored once per object digest and extractor version as
+# JSON lines ({"page": n, "text": "..."}) so pages can be streamed back.
+TEXT_ROOT = file_storage.FILE_STORAGE_ROOT / "text"
+SIDECAR_CODEC = os.environ.get("FILES_TEXT_SIDECAR_CODEC", "gzip").strip().lower()
+_SUFFIXES = {"zstd": ".jsonl.zst", "gzip": ".jsonl.gz"}
+
+
+def _codec() -> str:
+    if SIDECAR_CODEC == "zstd" and zstandard is not None:
+        return "zstd"
+    return "gzip"
+
+
+def _sidecar_dir(digest: str) -> Path:
+    return TEXT_ROOT / digest[:2] / digest[2:4]
+
+
+def sidecar_path(digest: str, version: str) -> Optional[Path]:
+    """Returns the existing sidecar for (digest, version), whatever codec wrote it."""
+    base = _sidecar_dir(digest)
+    for suffix in _SUFFIXES.values():
+        candidate = base / f"{digest}.{version}{suffix}"
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _open_text_writer(raw: IO[bytes], codec: str) -> IO[str]:
+    if codec == "zstd":
+        stream = zstandard.ZstdCompressor().stream_writer(raw)
+    else:
+        stream = gzip.GzipFile(fileobj=raw, mode="wb")
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def _open_text_reader(path: Path) -> IO[str]:
+    if not path.name.endswith(_SUFFIXES["zstd"]):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if zstandard is None:
+        raise RuntimeError("zstandard is required to read zstd text sidecars")
+    raw = open(path, "rb")
+    stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+
+def write_sidecar(digest: str, version: str, pages: Iterable[str]) -> Path:
+    """Writes page texts atomically and returns the sidecar path."""
+    codec = _codec()
+    target_dir = _sidecar_dir(digest)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    destination = target_dir / f"{digest}.{version}{_SUFFIXES[codec]}"
+    tmp_path = target_dir / f".{uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, "wb") as raw:
+            with _open_text_writer(raw, codec) as writer:
+                for number, text in enumerate(pages, start=1):
+                    writer.write(json.dumps({"page": number, "text": text}, ensure_ascii=False))
+                    writer.write("\n")
+        tmp_path.replace(destination)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return destination
+
+
+def iter_sidecar_pages(
+    digest: str,
+    version: str,
+    pages: Optional[set[int]] = None,
+) -> Iterator[Tuple[int, str]]:
+    """Streams (page number, text) pairs, optionally restricted to `pages`."""
+    path = sidecar_path(digest, version)
+    if path is None:
+        return
+    last_wanted = max(pages) if pages else None
+    with _open_text_reader(path) as reader:
+        for line in reader:
+            item = json.loads(line)
+            number = int(item["page"])
+            if last_wanted is not None and number > last_wanted:
+                break
+            if pages is None or number in pages:
+                yield number, item.get("text", "")
+
+
+def read_text(digest: str, version: str, max_pages: int, max_chars: Optional[int] = None) -> Optional[str]:
+    """
+    Joins the first max_pages pages within max_chars characters, or returns
+    None when no sidecar exists.
+    """
+    if sidecar_path(digest, version) is None:
+        return None
+    parts: List[str] = []
+    remaining = max_chars
+    for _, text in iter_sidecar_pages(digest, version, set(range(1, max_pages + 1))):
+        if remaining is not None:
+            if remaining <= 0:
+                break
+            text = text[:remaining]
+            remaining -= len(text)
+        parts.append(text + "\n")
+    return "".join(parts)
+
+
+def remove_sidecars(digest: str) -> int:
+    """Deletes every sidecar version for a digest; used when its object is reclaimed."""
+    removed = 0
+    base = _sidecar_dir(digest)
+    if not base.exists():
+        return 0
+    for path in base.glob(f"{digest}.*"):
+        try:
+            path.unlink()
+            removed += 1
+        except OSError:
+            continue
+    return removed
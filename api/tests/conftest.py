@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Module-level paths are resolved at import time; keep them out of the checkout.
+os.environ.setdefault("FILE_STORAGE_ROOT", tempfile.mkdtemp(prefix="raggpt-tests-"))
+
+from api.app.services import file_storage, llm  # noqa: E402
+from api.app.services.classification_cache import ClassificationCache  # noqa: E402
+from api.app.services.llm_scheduler import ClassificationScheduler  # noqa: E402
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Points the registry and object store at an empty per-test directory."""
+    registry_path = tmp_path / "registry.json"
+    monkeypatch.setattr(file_storage, "FILE_STORAGE_ROOT", tmp_path)
+    monkeypatch.setattr(file_storage, "REGISTRY_PATH", registry_path)
+    monkeypatch.setattr(file_storage, "REGISTRY_LOCK_PATH", registry_path.with_suffix(".lock"))
+    monkeypatch.setattr(file_storage, "OBJECTS_ROOT", tmp_path / "objects")
+    monkeypatch.setattr(file_storage, "CONTENT_ADDRESSED", True)
+    monkeypatch.setattr(file_storage, "_cached_registry", None)
+    monkeypatch.setattr(file_storage, "_cached_stat", None)
+    return file_storage
+
+
+class FakeCompletions:
+    """Chat completions endpoint for httpx.MockTransport: records each prompt and answers with reply(prompt)."""
+
+    def __init__(self) -> None:
+        self.prompts = []
+        self.reply = lambda prompt: {}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        content = self.reply(prompt)
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": content if isinstance(content, str) else json.dumps(content)}}],
+                "usage": {"total_tokens": 100},
+            },
+        )
+
+
+@pytest.fixture
+def completions(tmp_path, monkeypatch):
+    """Sends LLMService requests to a FakeCompletions, with no rate limits and an empty cache."""
+    fake = FakeCompletions()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(llm, "get_http_client", lambda: client)
+    monkeypatch.setattr(
+        llm, "classification_scheduler", ClassificationScheduler(requests_per_minute=0, tokens_per_minute=0)
+    )
+    monkeypatch.setattr(llm, "classification_cache", ClassificationCache(tmp_path / "classifications.sqlite3"))
+    return fake
@@ -0,0 +1,104 @@
+import asyncio
+import io
+import zipfile
+
+import httpx
+import pytest
+
+from api.app.main import app
+from api.app.routers import files
+from api.app.services import processing
+
+
+@pytest.fixture
+def bulk(storage, monkeypatch):
+    monkeypatch.setattr(processing, "JOB_QUEUE_ENABLED", False)
+    scheduled = []
+
+    async def _record_batch(items, priority):
+        scheduled.extend(items)
+
+    monkeypatch.setattr(processing, "process_file_batch", _record_batch)
+    return scheduled
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, payload in members.items():
+            archive.writestr(name, payload)
+    return buffer.getvalue()
+
+
+def _post(parts, **form):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/files/bulk",
+                data={"tenant": "t1", "user_id": "u1", "folder_path": "/inbox", **form},
+                files=[("files", part) for part in parts],
+            )
+
+    return asyncio.run(scenario())
+
+
+def test_zip_members_are_stored_as_files_in_subfolders(storage, bulk):
+    archive = _zip(
+        {
+            "report.txt": b"quarterly numbers",
+            "minutes/2024-01.txt": b"minutes",
+            "minutes/copy.txt": b"minutes",
+            "empty.txt": b"",
+            "__MACOSX/._report.txt": b"resource fork",
+            ".DS_Store": b"finder",
+        }
+    )
+    response = _post([("batch.zip", archive, "application/zip"), ("notes.txt", b"loose file", "text/plain")])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["stored"], body["failed"]) == (4, 1)
+    stored = {item["file"]["original_name"]: item["file"]["folder_path"] for item in body["items"] if item["ok"]}
+    assert stored == {"report.txt": "/inbox", "2024-01.txt": "/inbox/minutes", "copy.txt": "/inbox/minutes", "notes.txt": "/inbox"}
+    assert [item["error"] for item in body["items"] if not item["ok"]] == ["empty"]
+    # The two identical members share one object and are processed once.
+    assert sorted(name for _, _, name, _ in bulk) == ["2024-01.txt", "notes.txt", "report.txt"]
+
+
+def test_archives_are_kept_whole_when_expansion_is_off(storage, bulk):
+    response = _post([("batch.zip", _zip({"a.txt": b"a", "b.txt": b"b"}), "application/zip")], expand_archives="false")
+
+    assert response.json()["stored"] == 1
+    assert response.json()["items"][0]["file"]["original_name"] == "batch.zip"
+
+
+def test_oversized_member_is_reported_without_failing_the_request(storage, bulk, monkeypatch):
+    monkeypatch.setattr(files, "BULK_UPLOAD_MAX_FILE_BYTES", 10)
+    archive = _zip({"small.txt": b"fits", "large.txt": b"x" * 11})
+    response = _post([("batch.zip", archive, "application/zip"), ("big.bin", b"y" * 11, "application/octet-stream")])
+
+    body = response.json()
+    assert body["stored"] == 1
+    assert sorted((item["filename"], item["error"]) for item in body["items"] if not item["ok"]) == [
+        ("big.bin", "too_large"),
+        ("large.txt", "too_large"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "limit, value",
+    [("BULK_UPLOAD_MAX_FILES", 2), ("BULK_UPLOAD_MAX_TOTAL_BYTES", 12)],
+)
+def test_request_over_the_budget_is_rejected_and_releases_stored_blobs(storage, bulk, monkeypatch, limit, value):
+    monkeypatch.setattr(files, limit, value)
+    parts = [(f"doc{i}.txt", f"payload {i}".encode(), "text/plain") for i in range(3)]
+
+    response = _post(parts)
+
+    assert response.status_code == 413
+    assert storage.list_files(tenant="t1") == []
+    assert bulk == []
+    # Whatever was stored before the limit hit is handed to the reclaimer.
+    stored = [path for path in (storage.OBJECTS_ROOT).rglob("*") if path.is_file()]
+    assert stored and storage.pending_reclaim_count() == len(stored)
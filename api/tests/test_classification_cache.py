@@ -0,0 +1,75 @@
+import asyncio
+import sqlite3
+
+from api.app.core.tagging import TagMaster, TagMasterData
+from api.app.services import llm
+from api.app.services.classification_cache import ClassificationCache, cache_key, filename_features
+from api.app.services.llm import LLMService
+from api.app.services.llm_scheduler import INTERACTIVE_PRIORITY
+
+ANSWER = {"doc_type": "見積", "topic": "採用", "entity": "Acme", "state": None, "extras": ["NDA"]}
+
+
+def _classify(service, text, filename, **options):
+    return asyncio.run(service.classify_document(text, filename, priority=INTERACTIVE_PRIORITY, **options))
+
+
+def test_filename_features_collapse_digits_and_directories():
+    assert filename_features("Scans\\2024/Invoice_2024-03.PDF") == "invoice_#-#.pdf"
+    assert cache_key("text", "invoice_2024-03.pdf", "v1", "m") == cache_key("text", "invoice_2025-11.pdf", "v1", "m")
+    assert cache_key("text", "a.pdf", "v1", "m") != cache_key("text", "a.pdf", "v2", "m")
+    assert cache_key("text", "a.pdf", "v1", "m") != cache_key("text", "a.pdf", "v1", "other-model")
+
+
+def test_entries_expire_after_the_ttl_and_prune_keeps_the_most_recent(tmp_path):
+    cache = ClassificationCache(tmp_path / "cache.sqlite3", ttl_seconds=60, max_entries=2)
+    for key in ("old", "a", "b", "c"):
+        cache._put_sync(key, {"doc_type": key})
+    with sqlite3.connect(cache.path) as conn:
+        conn.execute("UPDATE classifications SET created_at = created_at - 120 WHERE key = 'old'")
+        conn.execute("UPDATE classifications SET accessed_at = accessed_at - 10 WHERE key = 'a'")
+
+    assert cache._get_sync("old") is None
+    assert cache.prune() == 1
+    assert [cache._get_sync(key) for key in ("a", "b", "c")] == [None, {"doc_type": "b"}, {"doc_type": "c"}]
+
+
+def test_repeat_documents_are_served_from_the_cache(completions):
+    completions.reply = lambda prompt: ANSWER
+    service = LLMService()
+
+    first = _classify(service, "見積書 本文", "quote_0001.pdf")
+    # Same snippet, and a file name that differs only in its digits.
+    second = _classify(service, "見積書 本文", "quote_0002.pdf")
+
+    assert first == second and first.doc_type == "見積"
+    assert len(completions.prompts) == 1
+    assert (llm.classification_cache.hits, llm.classification_cache.misses) == (1, 1)
+
+    _classify(service, "見積書 本文", "quote_0003.pdf", bypass_cache=True)
+    assert len(completions.prompts) == 2
+
+
+def test_tag_master_changes_invalidate_cached_results(completions, monkeypatch):
+    completions.reply = lambda prompt: ANSWER
+    service = LLMService()
+    _classify(service, "本文", "doc.pdf")
+
+    base = TagMaster.get_instance()
+    edited = TagMaster(TagMasterData(**{**base.data.dict(), "extras": ["稟議"]}), "edited-version")
+    monkeypatch.setattr(TagMaster, "get_instance", classmethod(lambda cls, tenant=None: edited))
+    tags = _classify(service, "本文", "doc.pdf")
+
+    assert len(completions.prompts) == 2
+    # Validated against the new vocabulary, where NDA is no longer an extra.
+    assert tags.extras == []
+
+
+def test_empty_answers_are_not_cached(completions):
+    completions.reply = lambda prompt: {"doc_type": "not a tag"}
+    service = LLMService()
+
+    assert _classify(service, "本文", "doc.pdf").doc_type is None
+    _classify(service, "本文", "doc.pdf")
+
+    assert len(completions.prompts) == 2
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import httpx
+
+from api.app.main import app
+from api.app.services import extraction, processing
+
+SLOW_EXTRACT_SECONDS = 0.3
+UPLOADS = 6
+
+
+def _slow_extract(file_path, max_pages=5, digest=None, max_chars=None, mime_type=None):
+    # Stands in for a heavy PyMuPDF parse; sleeping here would stall the event loop if it ran on it.
+    time.sleep(SLOW_EXTRACT_SECONDS)
+    return f"text of {file_path}"
+
+
+def test_healthz_stays_responsive_during_pdf_upload_burst(storage, monkeypatch):
+    monkeypatch.setattr(processing, "JOB_QUEUE_ENABLED", False)
+    monkeypatch.setattr(processing.llm_service, "api_key", None)
+    # Picked up by extract_text_async and shipped to the pool workers by reference.
+    monkeypatch.setattr(extraction, "extract_text_from_file", _slow_extract)
+    calls = []
+    real_run = extraction.run_in_extraction_pool
+
+    async def _counting_run(func, *args):
+        calls.append(func)
+        return await real_run(func, *args)
+
+    monkeypatch.setattr(extraction, "run_in_extraction_pool", _counting_run)
+
+    async def _scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            uploads = [
+                asyncio.create_task(
+                    client.post(
+                        "/files/",
+                        data={"tenant": "t1", "user_id": "u1"},
+                        files={"file": (f"doc{i}.pdf", b"%%PDF-1.4 burst %d" % i, "application/pdf")},
+                    )
+                )
+                for i in range(UPLOADS)
+            ]
+            latencies = []
+            while not all(task.done() for task in uploads):
+                started = time.perf_counter()
+                response = await client.get("/healthz")
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200
+                await asyncio.sleep(0.02)
+            responses = await asyncio.gather(*uploads)
+        return responses, latencies
+
+    try:
+        started = time.perf_counter()
+        responses, latencies = asyncio.run(_scenario())
+        elapsed = time.perf_counter() - started
+    finally:
+        extraction.shutdown_extraction_executor()
+        extraction._semaphore = None
+
+    assert all(response.status_code == 200 for response in responses)
+    assert calls == [_slow_extract] * UPLOADS
+    # The burst kept the pool busy for a while, and health checks were answered throughout.
+    assert elapsed >= SLOW_EXTRACT_SECONDS * UPLOADS / extraction.EXTRACTION_WORKERS
+    assert len(latencies) >= 5
+    assert max(latencies) < 0.25
@@ -0,0 +1,136 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from api.app.services import extractors
+
+_W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+_A = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+_S = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+_PKG = 'xmlns="http://schemas.openxmlformats.org/package/2006/relationships"'
+
+
+def _package(path: Path, members) -> Path:
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, xml in members.items():
+            archive.writestr(name, xml)
+    return path
+
+
+def _sections(path: Path, mime_type=None):
+    extractor = extractors.find_extractor(path, mime_type)
+    assert extractor is not None
+    return list(extractor(path))
+
+
+def test_docx_paragraphs_and_page_breaks(tmp_path):
+    document = (
+        f"<w:document {_W}><w:body>"
+        "<w:p><w:r><w:t>First</w:t><w:tab/><w:t>page</w:t></w:r></w:p>"
+        '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+        "<w:p><w:r><w:t>Second page</w:t></w:r></w:p>"
+        "<w:sectPr/></w:body></w:document>"
+    )
+    path = _package(tmp_path / "doc.docx", {"word/document.xml": document})
+
+    assert _sections(path) == ["First\tpage", "Second page"]
+
+
+def test_pptx_one_section_per_slide_in_numeric_order(tmp_path):
+    def slide(*paragraphs):
+        body = "".join(f"<a:p><a:r><a:t>{text}</a:t></a:r></a:p>" for text in paragraphs)
+        return f"<p:sld {_A} xmlns:p='urn:p'><p:txBody>{body}</p:txBody></p:sld>"
+
+    path = _package(
+        tmp_path / "deck.pptx",
+        {
+            "ppt/slides/slide10.xml": slide("Ten"),
+            "ppt/slides/slide2.xml": slide("Two", "bullets"),
+            "ppt/slides/slide1.xml": slide("One"),
+        },
+    )
+
+    assert _sections(path) == ["One", "Two\nbullets", "Ten"]
+
+
+def test_xlsx_sheets_with_shared_and_inline_strings(tmp_path):
+    workbook = (
+        f"<workbook {_S} {_R}><sheets>"
+        '<sheet name="Budget" r:id="rId1"/><sheet name="Notes" r:id="rId2"/>'
+        "</sheets></workbook>"
+    )
+    rels = (
+        f"<Relationships {_PKG}>"
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Target="/xl/worksheets/sheet2.xml"/>'
+        "</Relationships>"
+    )
+    shared = f"<sst {_S}><si><t>Item</t></si><si><r><t>Co</t></r><r><t>st</t></r></si></sst>"
+    sheet1 = (
+        f"<worksheet {_S}><sheetData>"
+        '<row><c t="s"><v>0</v></c><c t="s"><v>1</v></c></row>'
+        '<row><c t="inlineStr"><is><t>Paper</t></is></c><c><v>120</v></c></row>'
+        "</sheetData></worksheet>"
+    )
+    sheet2 = f'<worksheet {_S}><sheetData><row><c t="inlineStr"><is><t>ok</t></is></c></row></sheetData></worksheet>'
+    path = _package(
+        tmp_path / "book.xlsx",
+        {
+            "xl/workbook.xml": workbook,
+            "xl/_rels/workbook.xml.rels": rels,
+            "xl/sharedStrings.xml": shared,
+            "xl/worksheets/sheet1.xml": sheet1,
+            "xl/worksheets/sheet2.xml": sheet2,
+        },
+    )
+
+    assert _sections(path) == ["# Budget\nItem\tCost\nPaper\t120", "# Notes\nok"]
+
+
+def test_html_skips_scripts_and_splits_at_headings(tmp_path):
+    path = tmp_path / "page.html"
+    path.write_text(
+        "<html><head><title>ignored</title><script>var x = 1;</script></head><body>"
+        "<p>Intro &amp; overview</p><h1>Chapter</h1><p>Body   text</p><ul><li>one</li><li>two</li></ul>"
+        "</body></html>",
+        encoding="utf-8",
+    )
+
+    assert _sections(path) == ["Intro & overview", "Chapter\n\nBody text\n\n\none\n\ntwo"]
+
+
+def test_csv_and_tsv_rows_become_tab_separated_lines(tmp_path):
+    csv_path = tmp_path / "table.csv"
+    csv_path.write_text('name,note\nalpha," quoted, with comma "\n', encoding="utf-8")
+    tsv_path = tmp_path / "table.tsv"
+    tsv_path.write_text("a\tb\n", encoding="utf-8")
+
+    assert _sections(csv_path) == ["name\tnote\nalpha\tquoted, with comma"]
+    assert _sections(tsv_path) == ["a\tb"]
+
+
+def test_long_sections_are_split_at_the_chunk_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(extractors, "SECTION_CHUNK_CHARS", 8)
+    path = tmp_path / "long.csv"
+    path.write_text("abcdef\nghijkl\n", encoding="utf-8")
+
+    assert _sections(path) == ["abcdef\ng", "hijkl"]
+
+
+@pytest.mark.parametrize(
+    "name, mime_type, expected",
+    [
+        ("REPORT.DOCX", None, extractors.extract_docx),
+        ("upload.bin", "text/html; charset=utf-8", extractors.extract_html),
+        ("upload", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", extractors.extract_xlsx),
+        # The suffix wins over a generic declared type.
+        ("notes.md", "application/octet-stream", extractors.extract_plain_text),
+        # No declared type: guessed from the name.
+        ("page.shtml", None, extractors.extract_html),
+        ("archive.zip", "application/zip", None),
+    ],
+)
+def test_registry_dispatch_by_suffix_then_mime(name, mime_type, expected):
+    assert extractors.find_extractor(Path(name), mime_type) is expected
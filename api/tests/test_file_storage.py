@@ -0,0 +1,97 @@
+def _register(storage, payload: bytes, *, file_id=None, suffix=".txt"):
+    path, digest = storage.store_object(payload, suffix=suffix)
+    metadata = storage.create_metadata(
+        tenant="t1",
+        user_id="u1",
+        scope="personal",
+        folder_path="/",
+        notebook_id=None,
+        original_name=f"doc{suffix}",
+        mime_type="text/plain",
+        size_bytes=len(payload),
+        storage_path=path,
+        sha256=digest,
+    )
+    if file_id is not None:
+        metadata["id"] = file_id
+    return storage.register_file(metadata)
+
+
+def test_duplicate_uploads_share_one_object(storage):
+    first = _register(storage, b"same bytes")
+    second = _register(storage, b"same bytes")
+
+    assert first["storage_path"] == second["storage_path"]
+    assert storage.get_object(first["sha256"])["refcount"] == 2
+
+    storage.delete_file(first["id"])
+    assert storage.get_object(first["sha256"])["refcount"] == 1
+    assert storage.pending_reclaim_count() == 0
+
+
+def test_reregistering_with_new_content_releases_old_object(storage):
+    original = _register(storage, b"version one")
+    replaced = _register(storage, b"version two", file_id=original["id"])
+
+    assert storage.get_object(original["sha256"]) is None
+    assert storage.get_object(replaced["sha256"])["refcount"] == 1
+    batch = storage.take_reclaim_batch(10)
+    assert [item["path"] for item in batch] == [original["storage_path"]]
+
+
+def test_reregistering_keeps_old_object_shared_with_other_records(storage):
+    kept = _register(storage, b"shared")
+    moved = _register(storage, b"shared")
+    _register(storage, b"different", file_id=moved["id"])
+
+    assert storage.get_object(kept["sha256"])["refcount"] == 1
+    assert storage.pending_reclaim_count() == 0
+
+
+def test_empty_classification_is_not_shared(storage):
+    record = _register(storage, b"needs tags")
+    digest = record["sha256"]
+
+    assert storage.begin_object_processing(digest) is None
+    storage.complete_object_processing(digest, {"doc_type": None, "topic": None, "extras": []})
+    assert storage.get_object(digest)["status"] == "failed"
+    # The next duplicate claims the object and classifies it again.
+    assert storage.begin_object_processing(digest) is None
+
+    storage.complete_object_processing(digest, {"doc_type": "Invoice", "extras": []})
+    shared = storage.begin_object_processing(digest)
+    assert shared["status"] == "done"
+    assert shared["tags"]["doc_type"] == "Invoice"
+
+
+def test_stale_claim_is_taken_over(storage, monkeypatch):
+    record = _register(storage, b"claimed then abandoned")
+    digest = record["sha256"]
+    assert storage.begin_object_processing(digest) is None
+    # A live claim makes later duplicates wait for its result.
+    duplicate = _register(storage, b"claimed then abandoned")
+    assert storage.begin_object_processing(digest)["status"] == "pending"
+
+    # The claimant died: once the lease is over the next duplicate processes the object.
+    claimed_at = storage.get_object(digest)["claimed_at"]
+    monkeypatch.setattr(storage.time, "time", lambda: claimed_at + storage.OBJECT_CLAIM_LEASE_SECONDS + 1)
+    assert storage.begin_object_processing(digest) is None
+
+    assert storage.complete_object_processing(digest, {"doc_type": "Invoice", "extras": []}) == 2
+    assert storage.get_file(duplicate["id"])["tags"]["doc_type"] == "Invoice"
+    assert "claimed_at" not in storage.get_object(digest)
+
+
+def test_failed_claim_marks_waiting_duplicates(storage):
+    record = _register(storage, b"cannot be classified")
+    digest = record["sha256"]
+    assert storage.begin_object_processing(digest) is None
+    waiting = _register(storage, b"cannot be classified")
+    assert storage.begin_object_processing(digest)["status"] == "pending"
+
+    storage.complete_object_processing(digest, None)
+
+    for file_id in (record["id"], waiting["id"]):
+        assert storage.get_file(file_id)["processing_failed_at"]
+    storage.update_file_metadata(waiting["id"], tags={"doc_type": "Invoice"})
+    assert "processing_failed_at" not in storage.get_file(waiting["id"])
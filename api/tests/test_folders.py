@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+import pytest
+
+from api.app.main import app
+
+
+def _register(storage, folder: str, size: int, *, tenant="t1", scope="personal"):
+    payload = f"{folder}:{size}:{tenant}:{scope}".encode().ljust(size, b".")
+    path, digest = storage.store_object(payload, suffix=".txt")
+    metadata = storage.create_metadata(
+        tenant=tenant,
+        user_id="u1",
+        scope=scope,
+        folder_path=folder,
+        notebook_id=None,
+        original_name="doc.txt",
+        mime_type="text/plain",
+        size_bytes=size,
+        storage_path=path,
+        sha256=digest,
+    )
+    return storage.register_file(metadata)
+
+
+@pytest.fixture
+def tree(storage):
+    _register(storage, "/", 100)
+    _register(storage, "/docs", 200)
+    _register(storage, "/docs", 300, scope="org")
+    _register(storage, "/docs/2024/q1", 400)
+    _register(storage, "/docs/2024/q1", 500)
+    _register(storage, "/docs", 999, tenant="t2")
+    return storage
+
+
+def _by_path(folders):
+    return {item["path"]: item for item in folders}
+
+
+def test_flat_listing_reports_direct_counts_and_sizes(tree):
+    folders = _by_path(tree.list_folders(tenant="t1"))
+
+    assert sorted(folders) == ["/", "/docs", "/docs/2024/q1"]
+    assert (folders["/docs"]["count"], folders["/docs"]["size_bytes"]) == (2, 500)
+    assert folders["/docs"]["scope"] == "mixed"
+    assert (folders["/docs/2024/q1"]["count"], folders["/docs/2024/q1"]["size_bytes"]) == (2, 900)
+    assert "subtree_count" not in folders["/docs"]
+
+
+def test_recursive_listing_adds_intermediate_folders_and_subtree_totals(tree):
+    folders = _by_path(tree.list_folders(tenant="t1", recursive=True))
+
+    assert sorted(folders) == ["/", "/docs", "/docs/2024", "/docs/2024/q1"]
+    assert (folders["/docs/2024"]["count"], folders["/docs/2024"]["subtree_count"]) == (0, 2)
+    assert folders["/docs/2024"]["scope"] == "personal"
+    assert (folders["/docs"]["subtree_count"], folders["/docs"]["subtree_size_bytes"]) == (4, 1400)
+    assert (folders["/"]["subtree_count"], folders["/"]["subtree_size_bytes"]) == (5, 1500)
+
+
+def test_path_filter_keeps_only_the_subtree(tree):
+    folders = tree.list_folders(tenant="t1", path="/docs/2024", recursive=True)
+
+    assert [item["path"] for item in folders] == ["/docs/2024", "/docs/2024/q1"]
+    assert tree.list_folders(tenant="t1", path="/missing") == []
+
+
+def test_aggregates_follow_moves_and_deletes(tree):
+    record = _register(tree, "/docs/2024/q1", 50)
+    tree.update_file_metadata(record["id"], folder_path="/archive")
+    folders = _by_path(tree.list_folders(tenant="t1"))
+    assert (folders["/archive"]["count"], folders["/archive"]["size_bytes"]) == (1, 50)
+    assert folders["/docs/2024/q1"]["size_bytes"] == 900
+
+    tree.delete_file(record["id"])
+    assert "/archive" not in _by_path(tree.list_folders(tenant="t1"))
+    # Rebuilding from the records gives the same aggregates as the incremental updates.
+    registry = tree._load_registry()
+    assert tree._build_folder_aggregates(registry["files"]) == registry["folders"]
+
+
+def test_folders_endpoint(tree):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/files/folders", params={"tenant": "t1", "path": "/docs", "recursive": "true"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.json()["folders"] == tree.list_folders(tenant="t1", path="/docs", recursive=True)
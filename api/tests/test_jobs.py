@@ -0,0 +1,168 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from api.app.services.jobs import JobQueue, LeaseLost, StageSpec
+
+
+class FakeClock:
+    def __init__(self, now: float = 1_000_000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def _passthrough(payload):
+    return payload
+
+
+def _queue(tmp_path, clock=None, **options) -> JobQueue:
+    stages = options.pop("stages", [StageSpec("extract", _passthrough), StageSpec("index", _passthrough)])
+    return JobQueue(tmp_path / "jobs.sqlite3", stages, clock=clock or FakeClock(), **options)
+
+
+def test_failed_attempts_back_off_until_exhausted(tmp_path):
+    clock = FakeClock()
+    queue = _queue(tmp_path, clock, max_attempts=3, backoff_base=2.0)
+    queue._enqueue_many_sync([("k1", {"n": 1}, 0)])
+
+    delays = []
+    for attempt in range(1, 4):
+        job = queue._claim_sync("extract")
+        assert job["attempts"] == attempt - 1
+        exhausted = queue._fail_sync(job, "boom")
+        row = queue._get_sync(job["id"])
+        delays.append(row["next_run_at"] - clock.now)
+        if exhausted:
+            break
+        # Not due again until the backoff has passed.
+        assert queue._claim_sync("extract") is None
+        clock.now = row["next_run_at"]
+
+    assert exhausted and attempt == 3
+    assert (row["status"], row["attempts"], row["last_error"]) == ("failed", 3, "boom")
+    # Exponential with up to 50% jitter: 2 s, then 4 s.
+    assert 2.0 <= delays[0] <= 3.0
+    assert 4.0 <= delays[1] <= 6.0
+
+
+def test_expired_lease_is_taken_over_and_the_stale_worker_loses_its_write(tmp_path):
+    clock = FakeClock()
+    queue = _queue(tmp_path, clock, lease_seconds=60)
+    queue._enqueue_many_sync([("k1", {"n": 1}, 0)])
+    stale = queue._claim_sync("extract")
+    assert queue._claim_sync("extract") is None
+
+    clock.now += 61
+    fresh = queue._claim_sync("extract")
+    assert fresh["id"] == stale["id"] and fresh["lease_owner"] != stale["lease_owner"]
+
+    with pytest.raises(LeaseLost):
+        queue._fail_sync(stale, "late failure")
+    with pytest.raises(LeaseLost):
+        queue._advance_sync(stale, {"n": "stale"})
+    assert queue._advance_sync(fresh, {"n": "fresh"}) == "index"
+
+    row = queue._get_sync(fresh["id"])
+    assert (row["stage"], row["status"], row["attempts"]) == ("index", "queued", 0)
+    assert row["payload"] == {"n": "fresh"}
+
+
+def test_jobs_of_a_crashed_process_resume_after_restart(tmp_path):
+    clock = FakeClock()
+    crashed = _queue(tmp_path, clock, lease_seconds=60)
+    crashed._enqueue_many_sync([("k1", {"n": 1}, 0)])
+    # Claimed, then the process died without releasing it.
+    job_id = crashed._claim_sync("extract")["id"]
+
+    async def scenario():
+        clock.now += 61
+        restarted = _queue(tmp_path, clock, lease_seconds=60, poll_interval=0.01)
+        restarted.start()
+        try:
+            for _ in range(200):
+                job = await restarted.get(job_id)
+                if job["status"] == "done":
+                    return job
+                await asyncio.sleep(0.01)
+        finally:
+            await restarted.stop()
+
+    job = asyncio.run(scenario())
+    assert (job["stage"], job["status"], job["lease_owner"]) == ("index", "done", None)
+
+
+def test_worker_retries_then_reports_exhausted_jobs(tmp_path):
+    calls = []
+    failed = []
+
+    async def flaky(payload):
+        calls.append(payload["n"])
+        raise RuntimeError("still broken")
+
+    async def on_failure(payload):
+        failed.append(payload["n"])
+
+    async def scenario():
+        queue = _queue(
+            tmp_path,
+            stages=[StageSpec("extract", flaky)],
+            # Real time, so the zero backoff makes retries due immediately.
+            clock=time.time,
+            max_attempts=3,
+            backoff_base=0.0,
+            poll_interval=0.01,
+            on_failure=on_failure,
+        )
+        await queue.enqueue("k1", {"n": 7})
+        queue.start()
+        try:
+            for _ in range(200):
+                if failed:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+        return (await queue.list())[0]
+
+    job = asyncio.run(scenario())
+    assert calls == [7, 7, 7]
+    assert failed == [7]
+    assert (job["status"], job["attempts"]) == ("failed", 3)
+
+
+def test_stop_hands_running_jobs_back(tmp_path):
+    started = []
+
+    async def slow(payload):
+        started.append(payload["n"])
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        queue = _queue(tmp_path, clock=time.time, stages=[StageSpec("extract", slow)], poll_interval=0.01)
+        job = await queue.enqueue("k1", {"n": 1})
+        queue.start()
+        while not started:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return await queue.get(job["id"])
+
+    job = asyncio.run(scenario())
+    assert (job["status"], job["lease_owner"], job["lease_until"]) == ("queued", None, None)
+
+
+def test_databases_without_lease_owner_are_migrated(tmp_path):
+    with sqlite3.connect(tmp_path / "jobs.sqlite3") as conn:
+        conn.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, key TEXT NOT NULL UNIQUE, stage TEXT NOT NULL,"
+            " status TEXT NOT NULL, priority INTEGER NOT NULL DEFAULT 0, payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, next_run_at REAL NOT NULL, lease_until REAL,"
+            " last_error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+    queue = _queue(tmp_path)
+    queue._enqueue_many_sync([("k1", {"n": 1}, 0)])
+
+    assert queue._claim_sync("extract")["lease_owner"]
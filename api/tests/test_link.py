@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from api.app.main import app
+from api.app.routers import files
+
+
+@pytest.fixture
+def ingest(storage, monkeypatch):
+    """Fake ingest backend: records uploaded file names, body sizes and the peak number of concurrent uploads."""
+    monkeypatch.setattr(files, "LINK_CONCURRENCY", 2)
+    seen = {"uploads": [], "in_flight": 0, "peak": 0, "sizes": []}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        seen["sizes"].append((request.headers.get("content-length"), str(len(body))))
+        seen["in_flight"] += 1
+        seen["peak"] = max(seen["peak"], seen["in_flight"])
+        await asyncio.sleep(0.01)
+        seen["in_flight"] -= 1
+        name = body.split(b'filename="', 1)[1].split(b'"', 1)[0].decode()
+        seen["uploads"].append(name)
+        if name == "rejected.txt":
+            return httpx.Response(500, request=request)
+        return httpx.Response(200, json={"status": "ok", "name": name})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(files, "get_http_client", lambda verify=True: client)
+    return seen
+
+
+def _register(storage, name):
+    path, digest = storage.store_object(f"contents of {name}".encode(), suffix=".txt")
+    return storage.register_file(
+        storage.create_metadata(
+            tenant="t1",
+            user_id="u1",
+            scope="personal",
+            folder_path="/",
+            notebook_id=None,
+            original_name=name,
+            mime_type="text/plain",
+            size_bytes=len(name),
+            storage_path=path,
+            sha256=digest,
+        )
+    )["id"]
+
+
+def _link(item_ids, **params):
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(
+                "/files/link",
+                params=params,
+                json={"tenant": "t1", "user_id": "u1", "notebook_id": "nb1", "item_ids": item_ids},
+            )
+
+    return asyncio.run(scenario())
+
+
+def test_files_are_linked_concurrently_up_to_the_limit(storage, ingest):
+    ids = [_register(storage, f"doc{index}.txt") for index in range(5)]
+    rejected = _register(storage, "rejected.txt")
+
+    response = _link([*ids, "missing", rejected])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert ingest["peak"] == 2
+    # File sizes are known, so nothing is sent chunked.
+    assert all(declared == actual for declared, actual in ingest["sizes"])
+    assert [item["id"] for item in body["linked"]] == ids
+    assert [item["id"] for item in body["errors"]] == ["missing", rejected]
+    assert body["errors"][0]["error"] == "not_found"
+    # Only files the backend accepted are recorded on the notebook.
+    assert [storage.get_file(file_id)["notebook_id"] for file_id in ids] == ["nb1"] * 5
+    assert storage.get_file(rejected)["notebook_id"] == ""
+
+
+def test_streamed_results_end_with_a_summary(storage, ingest):
+    ids = [_register(storage, "a.txt"), _register(storage, "rejected.txt")]
+
+    response = _link(ids, stream="ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert sorted((line["id"], line["ok"]) for line in lines[:-1]) == sorted([(ids[0], True), (ids[1], False)])
+    assert lines[-1] == {"event": "done", "linked": 1, "failed": 1}
+
+
+def test_request_fails_when_nothing_could_be_linked(storage, ingest):
+    response = _link([_register(storage, "rejected.txt")])
+
+    assert response.status_code == 502
+    assert response.json()["detail"]["error"] == "link_failed"
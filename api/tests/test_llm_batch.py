@@ -0,0 +1,112 @@
+import asyncio
+import re
+
+import pytest
+
+from api.app.models.files import FileTags
+from api.app.services.llm import LLMService
+from api.app.services.llm_batch import BatchItem, ClassificationBatcher
+
+
+def _recording_handler(batches):
+    async def handler(items, priority, group):
+        batches.append(([item.filename for item in items], priority, group))
+        return {item.id: FileTags(entity=item.filename) for item in items}
+
+    return handler
+
+
+def test_full_batches_go_out_at_once_and_groups_are_kept_apart():
+    batches = []
+
+    async def scenario():
+        # A window this long would time the test out, so only max_items can flush.
+        batcher = ClassificationBatcher(_recording_handler(batches), max_items=2, window_seconds=3600)
+        return await asyncio.gather(
+            batcher.submit("x", "a.pdf", 0, "t1"),
+            batcher.submit("x", "b.pdf", 5, "t2"),
+            batcher.submit("x", "c.pdf", 3, "t1"),
+            batcher.submit("x", "d.pdf", 0, "t2"),
+        )
+
+    results = asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+    assert [tags.entity for tags in results] == ["a.pdf", "b.pdf", "c.pdf", "d.pdf"]
+    # Each batch runs at the highest priority among its items.
+    assert sorted(batches) == [(["a.pdf", "c.pdf"], 3, "t1"), (["b.pdf", "d.pdf"], 5, "t2")]
+
+
+def test_partial_batches_go_out_when_the_window_closes():
+    batches = []
+
+    async def scenario():
+        batcher = ClassificationBatcher(_recording_handler(batches), max_items=8, window_seconds=0.01)
+        return await asyncio.gather(batcher.submit("x", "a.pdf", 0), batcher.submit("x", "b.pdf", 0))
+
+    results = asyncio.run(scenario())
+    assert [tags.entity for tags in results] == ["a.pdf", "b.pdf"]
+    assert batches == [(["a.pdf", "b.pdf"], 0, None)]
+
+
+def test_a_failing_batch_fails_every_caller_in_it():
+    async def handler(items, priority, group):
+        raise RuntimeError("provider down")
+
+    async def scenario():
+        batcher = ClassificationBatcher(handler, max_items=2, window_seconds=3600)
+        return await asyncio.gather(
+            batcher.submit("x", "a.pdf", 0), batcher.submit("x", "b.pdf", 0), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert [str(result) for result in results] == ["provider down", "provider down"]
+
+
+def _items(*names):
+    return [BatchItem(str(index), f"text of {name}", name) for index, name in enumerate(names)]
+
+
+def _single_prompt_name(prompt):
+    match = re.search(r"^Filename: (.+)$", prompt, re.MULTILINE)
+    return match.group(1)
+
+
+def test_one_prompt_classifies_the_whole_batch(completions):
+    completions.reply = lambda prompt: {
+        "results": [
+            {"id": "0", "doc_type": "見積", "extras": ["NDA", "unknown"]},
+            {"id": "1", "doc_type": "契約書", "topic": "not a topic"},
+        ]
+    }
+
+    results = asyncio.run(LLMService().classify_batch(_items("quote.pdf", "contract.pdf"), 0))
+
+    assert len(completions.prompts) == 1
+    # The candidate lists are sent once, not once per document.
+    assert completions.prompts[0].count("Candidates:") == 1
+    assert (results["0"].doc_type, results["0"].extras) == ("見積", ["NDA"])
+    assert (results["1"].doc_type, results["1"].topic) == ("契約書", None)
+
+
+@pytest.mark.parametrize(
+    "batch_answer, singles",
+    [
+        # Partial answer: only the missing document is asked again.
+        ({"results": [{"id": "0", "doc_type": "見積"}, {"id": "99", "doc_type": "契約書"}]}, ["contract.pdf"]),
+        # Malformed answer: every document is asked again.
+        ("not json", ["quote.pdf", "contract.pdf"]),
+        ({"results": "none"}, ["quote.pdf", "contract.pdf"]),
+    ],
+)
+def test_documents_missing_from_the_batch_answer_fall_back_to_single_calls(completions, batch_answer, singles):
+    def reply(prompt):
+        if "### id:" in prompt:
+            return batch_answer
+        return {"doc_type": "議事録", "entity": _single_prompt_name(prompt)}
+
+    completions.reply = reply
+    results = asyncio.run(LLMService().classify_batch(_items("quote.pdf", "contract.pdf"), 0))
+
+    assert [_single_prompt_name(prompt) for prompt in completions.prompts[1:]] == singles
+    assert results["1"].doc_type == "議事録" and results["1"].entity == "contract.pdf"
+    if "quote.pdf" not in singles:
+        assert results["0"].doc_type == "見積"
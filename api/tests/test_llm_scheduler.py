@@ -0,0 +1,174 @@
+import asyncio
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from api.app.services.llm_scheduler import (
+    BACKFILL_PRIORITY,
+    INTERACTIVE_PRIORITY,
+    ClassificationScheduler,
+    ClassificationUnavailable,
+    retry_after_seconds,
+)
+
+from virtual_clock import VirtualClock
+
+
+def _scheduler(clock: VirtualClock, **overrides) -> ClassificationScheduler:
+    # Rate limits are off unless a test turns them on; jitter is zero with retry_base=0.
+    options = {"max_in_flight": 4, "requests_per_minute": 0, "tokens_per_minute": 0, "retry_base": 0.0}
+    options.update(overrides)
+    return ClassificationScheduler(**options, clock=clock, sleep=clock.sleep)
+
+
+def _simulate(scenario):
+    clock = VirtualClock()
+    return asyncio.run(scenario(clock))
+
+
+def _http_error(status: int, **headers) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://llm.test/chat/completions")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+
+def test_waiting_calls_are_admitted_highest_priority_first():
+    async def scenario(clock):
+        scheduler = _scheduler(clock, max_in_flight=1)
+        started = []
+
+        async def submit(name, priority):
+            async def call():
+                started.append((name, clock.now))
+                await clock.sleep(1.0)
+
+            await scheduler.submit(call, priority=priority)
+
+        await clock.run(
+            submit("running", BACKFILL_PRIORITY),
+            submit("backfill", BACKFILL_PRIORITY),
+            submit("interactive", INTERACTIVE_PRIORITY),
+        )
+        return started, scheduler.metrics()
+
+    started, metrics = _simulate(scenario)
+    assert started == [("running", 0.0), ("interactive", 1.0), ("backfill", 2.0)]
+    assert (metrics["in_flight"], metrics["queue_depth"], metrics["completed"]) == (0, 0, 3)
+
+
+def test_request_budget_spaces_calls_after_the_burst():
+    async def scenario(clock):
+        # Two per minute: a burst of two, then one every 30 s.
+        scheduler = _scheduler(clock, requests_per_minute=2)
+
+        async def submit():
+            async def call():
+                return clock.now
+
+            return await scheduler.submit(call)
+
+        return await clock.run(*(submit() for _ in range(4)))
+
+    assert _simulate(scenario) == [0.0, 0.0, 30.0, 60.0]
+
+
+def test_token_budget_is_corrected_by_reported_usage():
+    async def scenario(clock):
+        # 10 tokens per second, bursting to 600.
+        scheduler = _scheduler(clock, tokens_per_minute=600)
+
+        async def submit(tokens, start_at=0.0, actual=None):
+            await clock.sleep(start_at)
+
+            async def call():
+                return clock.now
+
+            started = await scheduler.submit(call, tokens=tokens)
+            scheduler.record_usage(tokens, actual)
+            return started
+
+        # The first call estimated 500 tokens but used 100, so 400 come back.
+        first, second = await clock.run(submit(500, actual=100), submit(500, start_at=1.0))
+        third = (await clock.run(submit(500)))[0]
+        return first, second, third
+
+    first, second, third = _simulate(scenario)
+    assert (first, second) == (0.0, 1.0)
+    # 600 - 100 - 500 + 10 refilled = 10 left at t=1; 490 more take 49 s.
+    assert third == 50.0
+
+
+def test_rate_limited_call_waits_out_retry_after_for_every_caller():
+    async def scenario(clock):
+        scheduler = _scheduler(clock)
+        attempts = []
+
+        async def limited():
+            attempts.append(clock.now)
+            if len(attempts) == 1:
+                raise _http_error(429, **{"Retry-After": "7"})
+            return "tags"
+
+        async def later():
+            await clock.sleep(1.0)
+
+            async def call():
+                return clock.now
+
+            return await scheduler.submit(call)
+
+        result, other_started = await clock.run(scheduler.submit(limited), later())
+        return attempts, result, other_started, scheduler.metrics()
+
+    attempts, result, other_started, metrics = _simulate(scenario)
+    assert attempts == [0.0, 7.0] and result == "tags"
+    # The pause holds back callers that never saw the 429 too.
+    assert other_started == 7.0
+    assert (metrics["rate_limited"], metrics["retries"], metrics["failed"]) == (1, 1, 0)
+
+
+def test_server_errors_are_retried_until_exhausted_and_client_errors_are_not():
+    async def scenario(clock):
+        scheduler = _scheduler(clock, max_retries=2)
+        calls = {"server": 0, "client": 0}
+
+        async def server_error():
+            calls["server"] += 1
+            raise _http_error(503)
+
+        async def client_error():
+            calls["client"] += 1
+            raise _http_error(400)
+
+        async def outcome(call):
+            try:
+                await scheduler.submit(call)
+            except Exception as exc:
+                return type(exc)
+
+        outcomes = await clock.run(outcome(server_error), outcome(client_error))
+        return calls, outcomes, scheduler.metrics()
+
+    calls, outcomes, metrics = _simulate(scenario)
+    assert calls == {"server": 3, "client": 1}
+    assert outcomes == [ClassificationUnavailable, httpx.HTTPStatusError]
+    assert (metrics["retries"], metrics["failed"], metrics["in_flight"]) == (2, 2, 0)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("12", 12.0),
+        ("-3", 0.0),
+        (format_datetime(datetime.fromtimestamp(1_000_030, tz=timezone.utc), usegmt=True), 30.0),
+        ("soon", None),
+        (None, None),
+    ],
+)
+def test_retry_after_accepts_seconds_and_http_dates(value, expected):
+    headers = {"Retry-After": value} if value is not None else {}
+    response = httpx.Response(429, headers=headers)
+
+    assert retry_after_seconds(response, now=1_000_000.0) == expected
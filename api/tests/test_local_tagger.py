@@ -0,0 +1,43 @@
+import pytest
+
+from api.app.core.tagging import TagMaster, TagMasterData
+from api.app.services.local_tagger import LocalTagger, VocabularyMatcher
+
+
+@pytest.fixture
+def tagger(monkeypatch):
+    snapshot = TagMaster(
+        TagMasterData(
+            doc_types=["仕様書", "報告書", "契約書"],
+            topics=["開発"],
+            states=["ドラフト"],
+            extras=["FY2024"],
+            synonyms={"仕様書": ["spec", "設計書"], "報告書": ["report"], "契約書": ["契約", "contract"]},
+        ),
+        "test-vocabulary",
+    )
+    monkeypatch.setattr(TagMaster, "get_instance", classmethod(lambda cls, tenant=None: snapshot))
+    return LocalTagger()
+
+
+def test_latin_synonyms_do_not_match_inside_other_words(tagger):
+    result = tagger.classify("We respect the inspection results. Special care in perspective.", "respect_letter.pdf")
+
+    assert result.tags.doc_type is None
+    assert not result.is_confident()
+
+
+def test_latin_synonyms_match_whole_words(tagger):
+    result = tagger.classify("Spec for the API. See the spec appendix.", "api_spec_v2.pdf")
+
+    assert result.tags.doc_type == "仕様書"
+    assert result.is_confident()
+
+
+def test_cjk_terms_match_as_substrings(tagger):
+    matcher = VocabularyMatcher(TagMaster.get_instance())
+
+    assert ("doc_type", "契約書") in matcher.hits("業務委託契約について")
+    assert ("doc_type", "仕様書") in matcher.hits("基本設計書v2")
+    assert matcher.hits("FY20245 reporting contractor") == []
+    assert ("extras", "FY2024") in matcher.hits("予算(fy2024)")
@@ -0,0 +1,73 @@
+import asyncio
+import email
+from email import policy
+
+import httpx
+
+from api.app.services.multipart import MultipartStream, iter_file_chunks
+
+
+async def _chunks(*pieces):
+    for piece in pieces:
+        yield piece
+
+
+def _send(body: MultipartStream):
+    """Posts the body through httpx and returns the request as the server saw it."""
+    seen = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        seen["headers"] = request.headers
+        seen["body"] = await request.aread()
+        return httpx.Response(200)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await client.post("http://rag.test/ingest", headers=body.headers, content=body)
+
+    asyncio.run(scenario())
+    return seen["headers"], seen["body"]
+
+
+def _parts(headers, body):
+    message = email.message_from_bytes(
+        f"Content-Type: {headers['content-type']}\r\n\r\n".encode() + body, policy=policy.HTTP
+    )
+    return [
+        (part.get_param("name", header="content-disposition"), part.get_filename(), part.get_payload(decode=True))
+        for part in message.iter_parts()
+    ]
+
+
+def test_known_length_is_sent_as_content_length(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF" + bytes(range(256)) * 40)
+    body = MultipartStream(
+        {"notebook_id": "nb1", "metadata": '{"a": 1}'},
+        file_field="file",
+        file_name="report.pdf",
+        content=iter_file_chunks(path, chunk_size=1000),
+        content_type="application/pdf",
+        content_length=path.stat().st_size,
+    )
+
+    headers, sent = _send(body)
+
+    assert "transfer-encoding" not in headers
+    assert int(headers["content-length"]) == len(sent) == body.content_length
+    assert _parts(headers, sent) == [
+        ("notebook_id", None, b"nb1"),
+        ("metadata", None, b'{"a": 1}'),
+        ("file", "report.pdf", path.read_bytes()),
+    ]
+
+
+def test_unknown_length_falls_back_to_chunked_transfer():
+    body = MultipartStream({}, file_field="file", file_name='a "quoted".txt', content=_chunks(b"ab", b"", b"cd"))
+
+    headers, sent = _send(body)
+
+    assert body.content_length is None
+    assert headers["transfer-encoding"] == "chunked" and "content-length" not in headers
+    assert b'filename="a %22quoted%22.txt"' in sent
+    assert _parts(headers, sent)[0][2] == b"abcd"
@@ -0,0 +1,145 @@
+import asyncio
+
+from api.app.integrations.nextcloud import NextcloudRateLimiter
+
+from virtual_clock import VirtualClock
+
+
+def _limiter(clock: VirtualClock, **overrides) -> NextcloudRateLimiter:
+    options = {"metadata_per_min": 60, "downloads_per_min": 60, "burst": 5}
+    options.update(overrides)
+    return NextcloudRateLimiter(**options, clock=clock, sleep=clock.sleep)
+
+
+def _simulate(scenario):
+    clock = VirtualClock()
+    return clock, asyncio.run(scenario(clock))
+
+
+def test_burst_up_to_capacity_then_one_per_interval():
+    async def scenario(clock):
+        limiter = _limiter(clock)
+
+        async def caller():
+            async with limiter.metadata():
+                return clock.now
+
+        return await clock.run(*(caller() for _ in range(8)))
+
+    _, started = _simulate(scenario)
+    assert started == [0.0] * 5 + [1.0, 2.0, 3.0]
+
+
+def test_tokens_refill_at_the_configured_rate():
+    async def scenario(clock):
+        limiter = _limiter(clock, metadata_per_min=120, burst=4)
+
+        async def caller(start_at):
+            await clock.sleep(start_at)
+            async with limiter.metadata():
+                return clock.now
+
+        # Drain the burst, idle 1.5 s (3 tokens back at 2/s), then ask for 4 more.
+        return await clock.run(*(caller(0.0) for _ in range(4)), *(caller(1.5) for _ in range(4)))
+
+    _, started = _simulate(scenario)
+    assert started == [0.0] * 4 + [1.5, 1.5, 1.5, 2.0]
+
+
+def test_concurrent_callers_are_served_in_arrival_order():
+    async def scenario(clock):
+        limiter = _limiter(clock, burst=1)
+        served = []
+
+        async def caller(index):
+            async with limiter.metadata():
+                served.append((index, clock.now))
+
+        await clock.run(*(caller(index) for index in range(6)))
+        return served
+
+    _, served = _simulate(scenario)
+    assert served == [(index, float(index)) for index in range(6)]
+
+
+def test_metadata_and_download_budgets_are_separate():
+    async def scenario(clock):
+        limiter = _limiter(clock, burst=1)
+
+        async def caller(kind):
+            async with getattr(limiter, kind)():
+                return kind, clock.now
+
+        return await clock.run(caller("metadata"), caller("download"), caller("metadata"), caller("download"))
+
+    _, started = _simulate(scenario)
+    assert started == [("metadata", 0.0), ("download", 0.0), ("metadata", 1.0), ("download", 1.0)]
+
+
+def test_large_downloads_respect_the_bytes_per_second_budget():
+    async def scenario(clock):
+        limiter = _limiter(clock, download_bytes_per_sec=1000)
+
+        async def body():
+            # One chunk larger than the bucket, then a small one.
+            yield b"x" * 4500
+            yield b"y" * 500
+
+        async def download():
+            received = []
+            async with limiter.download():
+                async for chunk in limiter.throttle_bytes(body()):
+                    received.append((len(chunk), clock.now))
+            return received
+
+        return await clock.run(download())
+
+    _, (received,) = _simulate(scenario)
+    # The first second's worth is free; the remaining 4000 bytes take 4 s.
+    assert received == [(4500, 3.5), (500, 4.0)]
+
+
+def test_in_flight_cap_limits_concurrent_requests():
+    async def scenario(clock):
+        limiter = _limiter(clock, metadata_per_min=6000, burst=100, max_in_flight=2)
+        peak = 0
+
+        async def caller():
+            nonlocal peak
+            async with limiter.metadata():
+                peak = max(peak, limiter.in_flight)
+                await clock.sleep(1.0)
+                return clock.now
+
+        finished = await clock.run(*(caller() for _ in range(5)))
+        return peak, finished, limiter.metrics()["in_flight"]
+
+    _, (peak, finished, in_flight_after) = _simulate(scenario)
+    assert peak == 2
+    assert finished == [1.0, 1.0, 2.0, 2.0, 3.0]
+    assert in_flight_after == 0
+
+
+def test_cancelled_waiter_hands_its_reservation_back():
+    async def scenario(clock):
+        limiter = _limiter(clock, burst=1)
+
+        async def caller(start_at=0.0):
+            await clock.sleep(start_at)
+            async with limiter.metadata():
+                return clock.now
+
+        async def cancel_later(task):
+            await clock.sleep(0.5)
+            task.cancel()
+
+        (first,) = await clock.run(caller())
+        doomed = asyncio.ensure_future(caller())  # queued for t=1
+        await asyncio.sleep(0)
+        (_, late) = await clock.run(cancel_later(doomed), caller(0.75))
+        return first, doomed.cancelled(), late
+
+    _, (first, cancelled, late) = _simulate(scenario)
+    assert first == 0.0 and cancelled
+    # Without the refund the late caller would queue behind the cancelled one until t=2.
+    assert late == 1.0
@@ -0,0 +1,178 @@
+import asyncio
+import shutil
+
+import httpx
+import pytest
+
+from api.app.integrations.nextcloud import NextcloudIngestManager, NextcloudSettings, RagIngestSettings
+from scripts.webdav_standin import DEFAULT_PREFIX, create_app
+
+
+def _write(path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "dav"
+    _write(root / "RAG" / "a.txt", "alpha")
+    _write(root / "RAG" / "sub" / "b.txt", "bravo")
+    _write(root / "RAG" / "sub" / "deep" / "c.txt", "charlie")
+    _write(root / "RAG" / "other" / "d.txt", "delta")
+    _write(root / "outside.txt", "not in the library")
+    return root
+
+
+def _manager(tmp_path, root, *, sync_collection: bool, scan_concurrency: int = 4):
+    """Manager talking to the stand-in in-process; uploads to the RAG backend are recorded instead."""
+    settings = NextcloudSettings(
+        base_url=f"http://standin{DEFAULT_PREFIX}",
+        username="standin",
+        password="x",
+        rate_limit_per_min=60000,
+        state_file=tmp_path / "state.json",
+        sync_collection=sync_collection,
+        # Like Nextcloud: no Depth: infinity, so the ETag path walks folder by folder.
+        depth_infinity=False,
+        scan_concurrency=scan_concurrency,
+    )
+    app = create_app(root, depth_infinity=False, sync_collection=sync_collection)
+    http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), auth=("standin", "x"))
+    manager = NextcloudIngestManager(settings, RagIngestSettings("http://rag", None, "t1", "u1", "nb"), http)
+    manager.uploads = []
+    manager.declared_lengths = []
+
+    async def _record_upload(*, file_name, content, content_type, source_path, metadata=None, content_length=None):
+        body = b"".join([chunk async for chunk in content])
+        manager.uploads.append((source_path, body))
+        manager.declared_lengths.append(content_length)
+        return {"status": "ok"}
+
+    manager.rag.ingest = _record_upload
+    return manager
+
+
+def _ingested(result):
+    return sorted(item["path"] for item in result["processed"] if item["status"] == "ingested")
+
+
+@pytest.mark.parametrize("sync_collection, mode", [(True, "sync-collection"), (False, "etag")])
+def test_incremental_sync_picks_up_additions_changes_and_deletions(tmp_path, library, sync_collection, mode):
+    async def scenario():
+        manager = _manager(tmp_path, library, sync_collection=sync_collection)
+        try:
+            first = await manager.sync_folder()
+            assert first["mode"] == mode
+            assert _ingested(first) == ["/RAG/a.txt", "/RAG/other/d.txt", "/RAG/sub/b.txt", "/RAG/sub/deep/c.txt"]
+
+            unchanged = await manager.sync_folder()
+            assert _ingested(unchanged) == []
+
+            _write(library / "RAG" / "sub" / "new.txt", "echo")
+            _write(library / "RAG" / "a.txt", "alpha, second edition")
+            shutil.rmtree(library / "RAG" / "other")
+            second = await manager.sync_folder()
+            assert _ingested(second) == ["/RAG/a.txt", "/RAG/sub/new.txt"]
+            assert "/RAG/other/d.txt" in second["removed"]
+            assert manager.state.lookup("/RAG/other/d.txt") is None
+            assert ("/RAG/a.txt", b"alpha, second edition") in manager.uploads
+            # Sizes from the download are passed on, so uploads are not sent chunked.
+            assert manager.declared_lengths == [len(body) for _, body in manager.uploads]
+
+            # Forgotten on deletion, so the re-created file counts as new.
+            _write(library / "RAG" / "other" / "d.txt", "delta")
+            third = await manager.sync_folder()
+            assert _ingested(third) == ["/RAG/other/d.txt"]
+        finally:
+            await manager.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_full_walk_lists_the_whole_library(tmp_path, library):
+    async def scenario():
+        manager = _manager(tmp_path, library, sync_collection=False)
+        try:
+            result = await manager.scan_folder(recursive=True)
+            again = await manager.scan_folder(recursive=True)
+        finally:
+            await manager.aclose()
+        return result, again
+
+    result, again = asyncio.run(scenario())
+    assert _ingested(result) == ["/RAG/a.txt", "/RAG/other/d.txt", "/RAG/sub/b.txt", "/RAG/sub/deep/c.txt"]
+    assert again["summary"] == {"ingested": 0, "skipped": 4, "errors": 0}
+
+
+def _gated_uploads(manager, *, fail=()):
+    """Wraps the recorded uploads: tracks how many run at once, fails the given paths, and waits on `gate`."""
+    record = manager.rag.ingest
+    seen = {"in_flight": 0, "peak": 0, "gate": asyncio.Event()}
+
+    async def _upload(**kwargs):
+        seen["in_flight"] += 1
+        seen["peak"] = max(seen["peak"], seen["in_flight"])
+        try:
+            await seen["gate"].wait()
+            if kwargs["source_path"] in fail:
+                raise RuntimeError("ingest backend rejected the file")
+            return await record(**kwargs)
+        finally:
+            seen["in_flight"] -= 1
+
+    manager.rag.ingest = _upload
+    return seen
+
+
+def test_scan_workers_respect_the_concurrency_limit_and_isolate_errors(tmp_path, library):
+    for index in range(4):
+        _write(library / "RAG" / f"extra{index}.txt", f"extra {index}")
+    progress = []
+
+    async def scenario():
+        manager = _manager(tmp_path, library, sync_collection=False)
+        uploads = _gated_uploads(manager, fail={"/RAG/sub/b.txt"})
+        try:
+            scan = asyncio.ensure_future(
+                manager.scan_folder(
+                    recursive=True, concurrency=3, on_progress=lambda state, result: progress.append(state)
+                )
+            )
+            while uploads["in_flight"] < 3:
+                await asyncio.sleep(0.01)
+            assert manager.active_scans()[0]["total"] == 8
+            uploads["gate"].set()
+            result = await scan
+        finally:
+            await manager.aclose()
+        return result, uploads["peak"], manager.active_scans()
+
+    result, peak, active = asyncio.run(scenario())
+    assert peak == 3
+    assert result["summary"] == {"ingested": 7, "skipped": 0, "errors": 1}
+    (failed,) = [item for item in result["processed"] if item["status"] == "error"]
+    assert failed["path"] == "/RAG/sub/b.txt" and "rejected" in failed["error"]
+    # Results keep the listing order, whatever order the workers finished in.
+    assert [item["path"] for item in result["processed"]] == sorted(item["path"] for item in result["processed"])
+    assert [state["done"] for state in progress] == list(range(1, 9))
+    assert (progress[-1]["ingested"], progress[-1]["errors"]) == (7, 1)
+    assert active == []
+
+
+def test_cancelling_a_scan_stops_every_worker(tmp_path, library):
+    async def scenario():
+        manager = _manager(tmp_path, library, sync_collection=False)
+        uploads = _gated_uploads(manager)
+        try:
+            scan = asyncio.ensure_future(manager.scan_folder(recursive=True, concurrency=2))
+            while uploads["in_flight"] < 2:
+                await asyncio.sleep(0.01)
+            scan.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await scan
+            return uploads["in_flight"], manager.uploads, manager.active_scans()
+        finally:
+            await manager.aclose()
+
+    assert asyncio.run(scenario()) == (0, [], [])
@@ -0,0 +1,108 @@
+import io
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from api.app.services import reclaimer, text_sidecar
+
+
+@pytest.fixture
+def gc(storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(text_sidecar, "TEXT_ROOT", tmp_path / "text")
+    monkeypatch.setattr(reclaimer, "GC_LOCK_PATH", tmp_path / "gc.lock")
+    return storage
+
+
+def _register(storage, payload: bytes):
+    path, digest = storage.store_object(payload, suffix=".txt")
+    metadata = storage.create_metadata(
+        tenant="t1",
+        user_id="u1",
+        scope="personal",
+        folder_path="/",
+        notebook_id=None,
+        original_name="doc.txt",
+        mime_type="text/plain",
+        size_bytes=len(payload),
+        storage_path=path,
+        sha256=digest,
+    )
+    return storage.register_file(metadata)
+
+
+def _age(path, seconds: float) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_queued_blob_is_removed_once_past_the_grace_window(gc):
+    record = _register(gc, b"old upload")
+    _age(record["storage_path"], reclaimer.GC_GRACE_SECONDS + 60)
+    gc.delete_file(record["id"])
+
+    assert reclaimer.reclaim_pending()["removed"] == 1
+    assert not Path(record["storage_path"]).exists()
+    assert gc.pending_reclaim_count() == 0
+
+
+def test_blob_stored_for_a_pending_registration_survives_reclaim(gc):
+    record = _register(gc, b"shared payload")
+    _age(record["storage_path"], reclaimer.GC_GRACE_SECONDS + 60)
+    # A bulk upload streams the same bytes; its record is only registered at the end of the request.
+    path, digest, _ = gc.store_stream(io.BytesIO(b"shared payload"), suffix=".txt")
+    # Meanwhile the last registered reference goes away and the reclaimer runs.
+    gc.delete_file(record["id"])
+
+    assert reclaimer.reclaim_pending()["removed"] == 0
+    assert path.exists()
+    assert gc.pending_reclaim_count() == 1
+
+    metadata = gc.create_metadata(
+        tenant="t1",
+        user_id="u1",
+        scope="personal",
+        folder_path="/",
+        notebook_id=None,
+        original_name="copy.txt",
+        mime_type="text/plain",
+        size_bytes=14,
+        storage_path=path,
+        sha256=digest,
+    )
+    gc.register_files([metadata])
+    # Registered again: the queued deletion is dropped instead of unlinking a live blob.
+    _age(path, reclaimer.GC_GRACE_SECONDS + 60)
+    assert reclaimer.reclaim_pending()["removed"] == 0
+    assert path.exists()
+    assert gc.pending_reclaim_count() == 0
+
+
+def test_reclaim_keeps_blob_refreshed_after_it_was_queued(gc):
+    record = _register(gc, b"revived")
+    gc.delete_file(record["id"])
+    (item,) = gc.take_reclaim_batch(10)
+    gc.store_object(b"revived", suffix=".txt")
+
+    assert gc.reclaim_object(item) is None
+    assert Path(record["storage_path"]).exists()
+
+
+def test_reconcile_removes_old_orphans_only(gc):
+    kept = _register(gc, b"referenced")
+    orphan, _ = gc.store_object(b"orphan", suffix=".txt")
+    young, _ = gc.store_object(b"young orphan", suffix=".txt")
+    for path in (kept["storage_path"], orphan):
+        _age(path, reclaimer.GC_GRACE_SECONDS + 60)
+
+    report = reclaimer.reconcile(dry_run=True)
+    assert (report["orphans"], report["removed"]) == (1, 0)
+    assert report["sample"] == [str(orphan)]
+    assert orphan.exists()
+
+    report = reclaimer.reconcile(dry_run=False)
+    assert report["removed"] == 1
+    assert not orphan.exists()
+    assert young.exists()
+    assert Path(kept["storage_path"]).exists()
@@ -0,0 +1,100 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+PROCESSES = 4
+THREADS = 3
+FILES_PER_THREAD = 10
+
+# Registers files from several threads; run in several processes at once.
+_WORKER = textwrap.dedent(
+    """
+    import sys
+    import threading
+
+    from api.app.services import file_storage
+
+    def register(thread):
+        for n in range(%(files)d):
+            payload = f"{sys.argv[1]}-{thread}-{n}".encode()
+            # Every third payload is shared by all writers, so refcounts are contended too.
+            if n %% 3 == 0:
+                payload = b"shared payload"
+            path, digest = file_storage.store_object(payload, suffix=".txt")
+            file_storage.register_file(
+                file_storage.create_metadata(
+                    tenant="t1",
+                    user_id=sys.argv[1],
+                    scope="personal",
+                    folder_path=f"/p{sys.argv[1]}",
+                    notebook_id=None,
+                    original_name=f"{thread}-{n}.txt",
+                    mime_type="text/plain",
+                    size_bytes=len(payload),
+                    storage_path=path,
+                    sha256=digest,
+                )
+            )
+
+    threads = [threading.Thread(target=register, args=(i,)) for i in range(%(threads)d)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    """
+) % {"files": FILES_PER_THREAD, "threads": THREADS}
+
+
+def test_concurrent_registrations_from_processes_and_threads_are_not_lost(storage, tmp_path):
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "FILE_STORAGE_ROOT": str(tmp_path),
+        "FILE_REGISTRY_PATH": str(storage.REGISTRY_PATH),
+    }
+    workers = [
+        subprocess.Popen([sys.executable, "-c", _WORKER, str(index)], env=env, stderr=subprocess.PIPE)
+        for index in range(PROCESSES)
+    ]
+    for worker in workers:
+        _, stderr = worker.communicate(timeout=120)
+        assert worker.returncode == 0, stderr.decode()
+
+    registry = json.loads(storage.REGISTRY_PATH.read_text(encoding="utf-8"))
+    total = PROCESSES * THREADS * FILES_PER_THREAD
+    assert len(registry["files"]) == total
+    assert registry["version"] == total
+    refcounts = sum(entry["refcount"] for entry in registry["objects"].values())
+    assert refcounts == total
+    shared = [entry for entry in registry["objects"].values() if entry["refcount"] > 1]
+    assert len(shared) == 1
+    counts = {user: folders[f"/p{user}"]["count"] for user, folders in registry["folders"]["t1"].items()}
+    assert counts == {str(index): THREADS * FILES_PER_THREAD for index in range(PROCESSES)}
+
+
+def test_write_behind_the_lock_is_detected(storage):
+    storage.register_file(
+        storage.create_metadata(
+            tenant="t1",
+            user_id="u1",
+            scope="personal",
+            folder_path="/",
+            notebook_id=None,
+            original_name="a.txt",
+            mime_type="text/plain",
+            size_bytes=1,
+            storage_path=storage.store_bytes(b"a", ".txt"),
+        )
+    )
+    with storage._registry_transaction() as registry:
+        # Another writer on a filesystem that ignores advisory locks.
+        storage.REGISTRY_PATH.write_text(json.dumps({"files": {}, "version": 99}), encoding="utf-8")
+        registry["files"].clear()
+        with pytest.raises(storage.RegistryConflictError):
+            storage._save_registry(registry)
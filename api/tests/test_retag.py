@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from api.app.services import retag
+
+NEW_TAGS = {"doc_type": "見積", "topic": None, "entity": None, "state": None, "extras": []}
+OLD_TAGS = {"doc_type": "契約書", "topic": None, "entity": None, "state": None, "extras": []}
+
+
+@pytest.fixture
+def retagging(storage, tmp_path, monkeypatch):
+    """A re-tag job over the test registry; classification answers by file name."""
+    monkeypatch.setattr(retag, "RETAG_STATE_PATH", tmp_path / "retag.json")
+    monkeypatch.setattr(retag, "RETAG_LOCK_PATH", tmp_path / "retag.lock")
+    monkeypatch.setattr(retag, "RETAG_PAGE_SIZE", 2)
+    monkeypatch.setattr(retag, "RETAG_RATE_PER_MINUTE", 0)
+    classified = []
+    gate = {"open": True}
+
+    async def load_text(record):
+        return "" if record["original_name"] == "blank.txt" else f"text of {record['original_name']}"
+
+    async def classify_stage(payload):
+        name = payload["filename"]
+        classified.append(name)
+        while not gate["open"]:
+            await asyncio.sleep(0.01)
+        if name == "broken.txt":
+            raise RuntimeError("provider down")
+        tags = {"empty.txt": {**NEW_TAGS, "doc_type": None}, "same.txt": OLD_TAGS}.get(name, NEW_TAGS)
+        return {"file_id": payload["file_id"], "tags": tags}
+
+    monkeypatch.setattr(retag, "_load_text", load_text)
+    monkeypatch.setattr(retag, "classify_stage", classify_stage)
+    return classified, gate
+
+
+def _register(storage, name, tenant="t1"):
+    path, digest = storage.store_object(name.encode(), suffix=".txt")
+    record = storage.register_file(
+        storage.create_metadata(
+            tenant=tenant,
+            user_id="u1",
+            scope="personal",
+            folder_path="/",
+            notebook_id=None,
+            original_name=name,
+            mime_type="text/plain",
+            size_bytes=len(name),
+            storage_path=path,
+            sha256=digest,
+        )
+    )
+    storage.update_file_metadata(record["id"], tags=OLD_TAGS)
+    return record["id"]
+
+
+def test_run_walks_every_page_and_writes_only_changed_tags(storage, retagging):
+    classified, _ = retagging
+    ids = {name: _register(storage, name) for name in ("new.txt", "same.txt", "blank.txt", "empty.txt", "broken.txt")}
+    _register(storage, "other-tenant.txt", tenant="t2")
+    progress = []
+
+    async def scenario():
+        job = retag.RetagJob()
+        job.start(tenant="t1", on_progress=progress.append)
+        return await job.wait()
+
+    state = asyncio.run(scenario())
+
+    assert sorted(classified) == ["broken.txt", "empty.txt", "new.txt", "same.txt"]
+    assert (state["status"], state["total"], state["processed"], state["progress"]) == ("done", 5, 5, 1.0)
+    assert (state["updated"], state["unchanged"], state["skipped"], state["failed"]) == (1, 1, 1, 2)
+    assert [entry["processed"] for entry in progress] == [2, 4, 5]
+    assert storage.get_file(ids["new.txt"])["tags"] == NEW_TAGS
+    # Failed and empty classifications keep the existing tags.
+    assert storage.get_file(ids["empty.txt"])["tags"] == OLD_TAGS
+    assert storage.get_file(ids["broken.txt"])["tags"] == OLD_TAGS
+
+
+def test_stopped_run_resumes_after_the_last_written_page(storage, retagging):
+    classified, gate = retagging
+    for index in range(4):
+        _register(storage, f"doc{index}.txt")
+
+    async def interrupt():
+        job = retag.RetagJob()
+        first_page = asyncio.Event()
+
+        def on_progress(status):
+            gate["open"] = False
+            first_page.set()
+
+        job.start(on_progress=on_progress)
+        await first_page.wait()
+        while len(classified) < 4:
+            await asyncio.sleep(0.01)
+        await job.stop()
+        return job.status()
+
+    stopped = asyncio.run(interrupt())
+    assert (stopped["status"], stopped["processed"]) == ("interrupted", 2)
+    first_page = set(classified[:2])
+
+    gate["open"] = True
+    classified.clear()
+
+    async def resume():
+        job = retag.RetagJob()
+        assert job.resume_if_interrupted()
+        return await job.wait()
+
+    state = asyncio.run(resume())
+    assert (state["status"], state["processed"], state["updated"]) == ("done", 4, 4)
+    assert not first_page & set(classified) and len(classified) == 2
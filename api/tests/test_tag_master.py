@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from api.app.core import tagging
+from api.app.core.tagging import TagMaster, TagMasterData
+
+BASE = {
+    "doc_types": ["契約書", "見積"],
+    "topics": ["採用"],
+    "states": ["ドラフト"],
+    "extras": ["NDA"],
+    "synonyms": {"見積": ["quote"], "NDA": ["秘密保持"]},
+}
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _write(path, payload) -> None:
+    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    # Same-size rewrites within one mtime tick would otherwise look unchanged.
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def tag_files(tmp_path, monkeypatch):
+    """Base and per-tenant tag master files in tmp_path, checked every 5 s of a fake clock."""
+    clock = FakeClock()
+    base = tmp_path / "tag_master.json"
+    overrides = tmp_path / "tenants"
+    overrides.mkdir()
+    _write(base, BASE)
+    monkeypatch.setattr(tagging, "TAG_MASTER_PATH", base)
+    monkeypatch.setattr(tagging, "TAG_MASTER_OVERRIDES_DIR", overrides)
+    monkeypatch.setattr(tagging, "TAG_MASTER_RELOAD_INTERVAL_SECONDS", 5.0)
+    monkeypatch.setattr(tagging, "time", SimpleNamespace(monotonic=clock))
+    monkeypatch.setattr(TagMaster, "_instance", None)
+    monkeypatch.setattr(TagMaster, "_tenants", OrderedDict())
+    monkeypatch.setattr(TagMaster, "_checked_at", 0.0)
+    return SimpleNamespace(clock=clock, base=base, overrides=overrides)
+
+
+def test_edited_file_is_picked_up_after_the_check_interval(tag_files):
+    first = TagMaster.get_instance()
+    _write(tag_files.base, {**BASE, "doc_types": ["契約書", "見積", "議事録"]})
+
+    tag_files.clock.now += 4
+    assert TagMaster.get_instance() is first
+
+    tag_files.clock.now += 1
+    second = TagMaster.get_instance()
+    assert second is not first
+    assert second.validate_tag("doc_type", "議事録") and second.revision > first.revision
+    assert second.version != first.version
+    # Callers still holding the old snapshot keep a consistent view.
+    assert first.doc_types == ("契約書", "見積") and not first.validate_tag("doc_type", "議事録")
+
+
+def test_a_broken_edit_keeps_the_last_good_snapshot(tag_files):
+    first = TagMaster.get_instance()
+    tag_files.base.write_text("{ half written", encoding="utf-8")
+
+    tag_files.clock.now += 5
+    assert TagMaster.get_instance() is first
+
+    _write(tag_files.base, {**BASE, "topics": ["人事制度"]})
+    tag_files.clock.now += 5
+    assert TagMaster.get_instance().topics == ("人事制度",)
+
+
+def test_tenant_overrides_replace_lists_and_merge_synonyms(tag_files):
+    _write(tag_files.overrides / "acme.json", {"topics": ["補助金申請"], "synonyms": {"NDA": ["機密"]}})
+
+    acme = TagMaster.get_instance("acme")
+    base = TagMaster.get_instance()
+
+    assert acme.tenant == "acme" and acme.version != base.version
+    assert acme.topics == ("補助金申請",) and acme.doc_types == base.doc_types
+    assert dict(acme.synonyms) == {"見積": ("quote",), "NDA": ("機密",)}
+    assert acme.validate_tag("topic", "補助金申請") and not base.validate_tag("topic", "補助金申請")
+    # Tenants without an override, and names that cannot be a file, get the base vocabulary.
+    assert TagMaster.get_instance("other") is base
+    assert TagMaster.get_instance("../acme") is base
+    assert TagMaster.get_instance("acme") is acme
+
+
+def test_override_edits_only_rebuild_that_tenant(tag_files):
+    _write(tag_files.overrides / "acme.json", {"topics": ["補助金申請"]})
+    _write(tag_files.overrides / "globex.json", {"topics": ["人事制度"]})
+    acme = TagMaster.get_instance("acme")
+    globex = TagMaster.get_instance("globex")
+
+    _write(tag_files.overrides / "acme.json", {"topics": ["採用", "補助金申請"]})
+    tag_files.clock.now += 5
+    assert TagMaster.get_instance("acme").topics == ("採用", "補助金申請")
+    assert TagMaster.get_instance("globex") is globex
+
+    # A base edit rebuilds every tenant on its next lookup.
+    _write(tag_files.base, {**BASE, "states": ["確定版"]})
+    tag_files.clock.now += 5
+    assert TagMaster.get_instance("globex").states == ("確定版",)
+    assert TagMaster.get_instance("acme") is not acme
+
+
+def test_revisions_stay_unique_across_threads():
+    data = TagMasterData(**BASE)
+    revisions = []
+
+    def build():
+        revisions.extend(TagMaster(data, "v").revision for _ in range(200))
+
+    threads = [threading.Thread(target=build) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(revisions)) == len(revisions)
@@ -0,0 +1,37 @@
+import asyncio
+import heapq
+import itertools
+
+
+class VirtualClock:
+    """Deterministic time: sleep() parks the caller until run() advances the clock to its deadline."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self._sleepers = []
+        self._order = itertools.count()
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self.now + max(0.0, delay), next(self._order), future))
+        await future
+
+    async def _settle(self) -> None:
+        for _ in range(20):
+            await asyncio.sleep(0)
+
+    async def run(self, *coros):
+        tasks = [asyncio.ensure_future(coro) for coro in coros]
+        while True:
+            await self._settle()
+            if all(task.done() for task in tasks):
+                return [task.result() for task in tasks]
+            while self._sleepers and self._sleepers[0][2].done():
+                heapq.heappop(self._sleepers)
+            assert self._sleepers, "callers are blocked without a pending wake-up"
+            wake_at, _, future = heapq.heappop(self._sleepers)
+            self.now = max(self.now, wake_at)
+            future.set_result(None)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Benchmark sequential vs parallel full-document PDF text extraction."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def _parse_ints(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def _generate_pdf(path: Path, pages: int) -> None:
+    import fitz  # PyMuPDF
+
+    line = "The quick brown fox jumps over the lazy dog. 0123456789 " * 2
+    with fitz.open() as doc:
+        for number in range(pages):
+            page = doc.new_page()
+            text = "\n".join(f"{number}:{row} {line}" for row in range(60))
+            page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=7)
+        doc.save(path)
+
+
+async def _run(args: argparse.Namespace) -> int:
+    from api.app.services import extraction, extractors
+
+    path = Path(args.pdf) if args.pdf else None
+    tmpdir = None
+    if path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        path = Path(tmpdir.name) / "bench.pdf"
+        print(f"Generating {args.pages}-page PDF ...")
+        _generate_pdf(path, args.pages)
+
+    try:
+        page_count = extractors.pdf_page_count(path)
+        print(f"{path} ({page_count} pages), {os.cpu_count()} CPUs")
+
+        started = time.perf_counter()
+        baseline = list(extractors.extract_pdf_pages(path))
+        sequential = time.perf_counter() - started
+        print(f"sequential              {sequential:8.2f}s")
+
+        # Spawn the pool once so process start-up is not part of the timings.
+        await extraction.run_in_extraction_pool(extractors.pdf_page_count, path)
+        for workers in args.workers:
+            for chunk_pages in args.chunk_pages:
+                timings = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    pages = await extraction.extract_pdf_parallel(
+                        path, workers=workers, chunk_pages=chunk_pages, page_count=page_count
+                    )
+                    timings.append(time.perf_counter() - started)
+                    if pages != baseline:
+                        print(f"workers={workers} chunk={chunk_pages}: output differs from sequential run")
+                        return 1
+                best = min(timings)
+                print(
+                    f"workers={workers:<3} chunk={chunk_pages:<5} {best:8.2f}s  "
+                    f"speedup x{sequential / best:.2f}"
+                )
+    finally:
+        extraction.shutdown_extraction_executor()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pdf", help="PDF to benchmark (default: generate one)")
+    parser.add_argument("--pages", type=int, default=1000, help="Pages of the generated PDF")
+    parser.add_argument("--workers", type=_parse_ints, default=[2, 4, os.cpu_count() or 1])
+    parser.add_argument("--chunk-pages", type=_parse_ints, default=[25, 50, 100])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per setting (best is reported)")
+    args = parser.parse_args()
+    # The pool size is read at import time and caps every worker setting.
+    os.environ["FILES_EXTRACT_WORKERS"] = str(max(args.workers))
+    os.environ.setdefault("FILES_EXTRACT_TIMEOUT_SEC", "600")
+    sys.exit(asyncio.run(_run(args)))
+
+
+if __name__ == "__main__":
+    main()
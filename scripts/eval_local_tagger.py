@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Compare the local keyword tagger with LLM tags on files in the library.
+
+Stored tags may have been written by the local tagger itself, which inflates
+agreement; --live-llm classifies every file with the LLM for a clean reference.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from api.app.services import file_storage, text_sidecar
+from api.app.services.extraction import EXTRACT_CHAR_BUDGET, EXTRACTOR_VERSION, extract_text_from_file
+from api.app.services.local_tagger import LOCAL_TAGGER_THRESHOLD, local_tagger
+
+CATEGORIES = ("doc_type", "topic", "state")
+
+
+def _parse_floats(value: str) -> list[float]:
+    return [float(item) for item in value.split(",") if item.strip()]
+
+
+def _load_text(record: dict) -> str:
+    digest = record.get("sha256")
+    if digest:
+        cached = text_sidecar.read_text(digest, EXTRACTOR_VERSION, 5, EXTRACT_CHAR_BUDGET)
+        if cached is not None:
+            return cached
+    return extract_text_from_file(
+        Path(record.get("storage_path", "")), mime_type=record.get("mime_type")
+    )
+
+
+async def _reference_tags(record: dict, text: str, live: bool) -> dict:
+    if not live:
+        return record.get("tags") or {}
+    from api.app.services.llm import LLMService
+
+    tags = await LLMService().classify_document(text, record.get("original_name", ""))
+    return tags.dict()
+
+
+async def _run(args: argparse.Namespace) -> int:
+    records = [
+        record
+        for record in file_storage.list_files(tenant=args.tenant)
+        if args.live_llm or (record.get("tags") or {}).get("doc_type")
+    ][: args.limit]
+    if not records:
+        print("No tagged files to evaluate.")
+        return 1
+
+    samples = []
+    for record in records:
+        text = _load_text(record)
+        if not text:
+            continue
+        reference = await _reference_tags(record, text, args.live_llm)
+        samples.append((local_tagger.classify(text, record.get("original_name", ""), record.get("tenant")), reference))
+    print(f"Evaluated {len(samples)} files (reference: {'live LLM' if args.live_llm else 'stored tags'})")
+
+    for threshold in args.thresholds:
+        confident = [(result, ref) for result, ref in samples if result.is_confident(threshold)]
+        saved = len(confident) / len(samples) if samples else 0.0
+        parts = [f"threshold={threshold:.2f}", f"llm_calls_saved={saved:.1%}"]
+        for category in CATEGORIES:
+            judged = [
+                (getattr(result.tags, category), ref.get(category))
+                for result, ref in confident
+                if getattr(result.tags, category) is not None
+            ]
+            agree = sum(1 for local, ref in judged if local == ref)
+            parts.append(f"{category}={agree}/{len(judged)}" + (f" ({agree / len(judged):.1%})" if judged else ""))
+        print("  ".join(parts))
+
+    if args.show_disagreements:
+        for result, ref in samples:
+            if result.is_confident(args.thresholds[0]) and result.tags.doc_type != ref.get("doc_type"):
+                print(f"- local={result.tags.doc_type} ({result.doc_type_confidence}) llm={ref.get('doc_type')}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate the local tagger against LLM tags.")
+    parser.add_argument("--tenant", help="Only evaluate files of this tenant")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument(
+        "--thresholds",
+        type=_parse_floats,
+        default=[LOCAL_TAGGER_THRESHOLD, 0.6, 0.7, 0.8, 0.9],
+        help="Comma-separated doc_type confidence thresholds to report",
+    )
+    parser.add_argument("--live-llm", action="store_true", help="Classify with the LLM now instead of using stored tags")
+    parser.add_argument("--show-disagreements", action="store_true")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,23 @@ import argparse
 import asyncio
 import sys
 from pathlib import Path
+from typing import Optional
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from api.app.integrations.nextcloud import build_runtime_from_env
+from api.app.integrations.nextcloud import NextcloudIngestManager, build_runtime_from_env
+
+
+def _print_progress(progress: dict, result: Optional[dict]) -> None:
+    path = result.get("path") if result else None
+    print(
+        f"[{progress['done']}/{progress['total']}] ingested={progress['ingested']} "
+        f"skipped={progress['skipped']} errors={progress['errors']} {path or ''}",
+        file=sys.stderr,
+        flush=True,
+    )
 
 
 async def _run(args: argparse.Namespace) -> int:
@@ -21,7 +32,13 @@ async def _run(args: argparse.Namespace) -> int:
         print("NEXTCLOUD_WEBDAV_* env vars are not configured.", file=sys.stderr)
         return 2
 
-    manager = runtime.manager
+    try:
+        return await _ingest(runtime.manager, args)
+    finally:
+        await runtime.aclose()
+
+
+async def _ingest(manager: NextcloudIngestManager, args: argparse.Namespace) -> int:
     if args.path:
         result = await manager.ingest_by_path(
             args.path,
@@ -31,8 +48,27 @@ async def _run(args: argparse.Namespace) -> int:
         print(result)
         return 0 if result.get("status") == "ingested" else 1
 
-    result = await manager.scan_folder(folder=args.folder, force=args.force)
-    print(f"Scanned {result['folder']}: {len(result['processed'])} files")
+    on_progress = _print_progress if args.progress else None
+    if args.incremental:
+        result = await manager.sync_folder(
+            folder=args.folder,
+            force=args.force,
+            concurrency=args.concurrency,
+            on_progress=on_progress,
+        )
+    else:
+        result = await manager.scan_folder(
+            folder=args.folder,
+            force=args.force,
+            recursive=args.recursive,
+            concurrency=args.concurrency,
+            on_progress=on_progress,
+        )
+    summary = result["summary"]
+    print(
+        f"Scanned {result['folder']}: {len(result['processed'])} files "
+        f"(ingested={summary['ingested']} skipped={summary['skipped']} errors={summary['errors']})"
+    )
     for entry in result["processed"]:
         status = entry.get("status")
         path = entry.get("path")
@@ -46,6 +82,18 @@ def main() -> None:
     parser.add_argument("--path", help="Specific Nextcloud path (/RAG/foo.pdf) to ingest")
     parser.add_argument("--folder", help="Override folder path (default: NEXTCLOUD_RAG_FOLDER)")
     parser.add_argument("--force", action="store_true", help="Re-upload even if ETag matches state")
+    parser.add_argument("--recursive", action="store_true", help="Scan subfolders too")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Recursive scan of only what changed since the last incremental run",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Files downloaded and ingested at once (default: NEXTCLOUD_SCAN_CONCURRENCY)",
+    )
+    parser.add_argument("--progress", action="store_true", help="Print a line per file as the scan runs")
     args = parser.parse_args()
     try:
         exit_code = asyncio.run(_run(args))
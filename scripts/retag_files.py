@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Re-classify files already in the library and write the new tags back.
+
+Progress is checkpointed after every page, so an interrupted run continues
+where it stopped when started again with the same options (unless --fresh).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from api.app.services import retag
+from api.app.services.http_client import close_http_clients
+
+
+def _print_progress(status: dict) -> None:
+    print(
+        f"[{status['progress']:.1%}] processed={status['processed']}/{status['total']} "
+        f"updated={status['updated']} unchanged={status['unchanged']} "
+        f"skipped={status['skipped']} failed={status['failed']}",
+        flush=True,
+    )
+
+
+async def _run(args: argparse.Namespace) -> int:
+    if args.page_size:
+        retag.RETAG_PAGE_SIZE = args.page_size
+    if args.concurrency:
+        retag.RETAG_CONCURRENCY = args.concurrency
+    if args.rate_per_min is not None:
+        retag.RETAG_RATE_PER_MINUTE = args.rate_per_min
+    try:
+        retag.retag_job.start(
+            tenant=args.tenant,
+            only_untagged=args.only_untagged,
+            bypass_cache=args.bypass_cache,
+            resume=not args.fresh,
+            on_progress=_print_progress,
+        )
+    except RuntimeError as exc:
+        print(f"Cannot start: {exc}", file=sys.stderr)
+        return 1
+    try:
+        status = await retag.retag_job.wait()
+    except asyncio.CancelledError:
+        await retag.retag_job.cancel()
+        raise
+    finally:
+        await close_http_clients()
+    print(f"Finished with status {status['status']}")
+    if status.get("last_error"):
+        print(f"Last error: {status['last_error']}")
+    return 0 if status["status"] == "done" else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-tag files in the library.")
+    parser.add_argument("--tenant", help="Only re-tag files of this tenant")
+    parser.add_argument("--only-untagged", action="store_true", help="Skip files that already have a doc_type")
+    parser.add_argument("--bypass-cache", action="store_true", help="Ignore cached classifications")
+    parser.add_argument("--fresh", action="store_true", help="Discard the checkpoint and start from the first file")
+    parser.add_argument("--page-size", type=int, help="Files per page (one registry write per page)")
+    parser.add_argument("--concurrency", type=int, help="Files classified at once")
+    parser.add_argument("--rate-per-min", type=float, help="Files classified per minute (0 = unthrottled)")
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(_run(args)))
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume.", file=sys.stderr)
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Local WebDAV stand-in for exercising the Nextcloud sync offline.
+
+Serves a directory with the subset of WebDAV the integration uses: PROPFIND
+(Depth 0/1/infinity), GET, and the RFC 6578 sync-collection REPORT. Folder
+ETags change whenever anything below them changes, as on Nextcloud. Sync
+tokens are kept in memory, so restarting the stand-in invalidates them.
+
+    python scripts/webdav_standin.py --root ./sample --port 8090
+    NEXTCLOUD_WEBDAV_BASE_URL=http://127.0.0.1:8090/remote.php/dav/files/standin \\
+    NEXTCLOUD_USERNAME=standin NEXTCLOUD_APP_PASSWORD=x \\
+        python scripts/nextcloud_ingest.py --incremental
+
+create_app() can also be mounted in-process with httpx.ASGITransport.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mimetypes
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+from xml.sax.saxutils import escape
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.routing import Route
+
+DEFAULT_PREFIX = "/remote.php/dav/files/standin"
+_DAV = "{DAV:}"
+
+# path (relative, "/"-separated, "" for the root) -> (is_dir, etag, size, mtime)
+_Snapshot = Dict[str, Tuple[bool, str, int, float]]
+
+
+def _snapshot(root: Path) -> _Snapshot:
+    result: _Snapshot = {}
+
+    def _visit(folder: Path, rel: str) -> str:
+        digest = hashlib.sha1()
+        for child in sorted(folder.iterdir(), key=lambda item: item.name):
+            child_rel = f"{rel}/{child.name}" if rel else child.name
+            if child.is_dir():
+                etag = _visit(child, child_rel)
+            else:
+                stat = child.stat()
+                etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+                result[child_rel] = (False, etag, stat.st_size, stat.st_mtime)
+            digest.update(f"{child.name}\0{etag}\0".encode("utf-8"))
+        etag = digest.hexdigest()[:20]
+        result[rel] = (True, etag, 0, folder.stat().st_mtime)
+        return etag
+
+    _visit(root, "")
+    return result
+
+
+class _Standin:
+    def __init__(self, root: Path, prefix: str, depth_infinity: bool, sync_collection: bool) -> None:
+        self.root = root.resolve()
+        self.prefix = prefix.rstrip("/")
+        self.depth_infinity = depth_infinity
+        self.sync_collection = sync_collection
+        self._tokens: List[_Snapshot] = []
+
+    def _relative(self, request: Request) -> Optional[str]:
+        path = unquote(request.url.path)
+        if not (path == self.prefix or path.startswith(self.prefix + "/")):
+            return None
+        rel = path[len(self.prefix):].strip("/")
+        target = (self.root / rel).resolve()
+        if target != self.root and self.root not in target.parents:
+            return None
+        return rel
+
+    def _href(self, rel: str, is_dir: bool) -> str:
+        href = quote(f"{self.prefix}/{rel}" if rel else self.prefix)
+        return href + "/" if is_dir else href
+
+    def _response_xml(self, rel: str, info: Tuple[bool, str, int, float]) -> str:
+        is_dir, etag, size, mtime = info
+        props = [
+            f"<d:getetag>&quot;{etag}&quot;</d:getetag>",
+            f"<d:getlastmodified>{formatdate(mtime, usegmt=True)}</d:getlastmodified>",
+        ]
+        if is_dir:
+            props.append("<d:resourcetype><d:collection/></d:resourcetype>")
+        else:
+            content_type = mimetypes.guess_type(rel)[0] or "application/octet-stream"
+            props.append("<d:resourcetype/>")
+            props.append(f"<d:getcontentlength>{size}</d:getcontentlength>")
+            props.append(f"<d:getcontenttype>{escape(content_type)}</d:getcontenttype>")
+        return (
+            f"<d:response><d:href>{escape(self._href(rel, is_dir))}</d:href>"
+            f"<d:propstat><d:prop>{''.join(props)}</d:prop><d:status>HTTP/1.1 200 OK</d:status></d:propstat>"
+            "</d:response>"
+        )
+
+    @staticmethod
+    def _multistatus(body: str) -> Response:
+        payload = f'<?xml version="1.0" encoding="utf-8"?>\n<d:multistatus xmlns:d="DAV:">{body}</d:multistatus>'
+        return Response(payload, status_code=207, media_type="application/xml; charset=utf-8")
+
+    @staticmethod
+    def _below(rel: str, base: str, depth: Optional[int]) -> bool:
+        if base and not (rel == base or rel.startswith(base + "/")):
+            return False
+        if depth is None:
+            return True
+        rest = rel[len(base):].strip("/")
+        return (rest.count("/") + 1 if rest else 0) <= depth
+
+    async def propfind(self, request: Request) -> Response:
+        rel = self._relative(request)
+        snapshot = _snapshot(self.root)
+        if rel is None or rel not in snapshot:
+            return Response(status_code=404)
+        depth_header = request.headers.get("depth", "infinity").lower()
+        if depth_header == "infinity" and not self.depth_infinity:
+            return Response(
+                '<?xml version="1.0"?><d:error xmlns:d="DAV:"><d:propfind-finite-depth/></d:error>',
+                status_code=403,
+                media_type="application/xml",
+            )
+        depth = None if depth_header == "infinity" else int(depth_header)
+        body = "".join(
+            self._response_xml(path, info)
+            for path, info in sorted(snapshot.items())
+            if self._below(path, rel, depth)
+        )
+        return self._multistatus(body)
+
+    async def report(self, request: Request) -> Response:
+        if not self.sync_collection:
+            return Response(status_code=501)
+        rel = self._relative(request)
+        snapshot = _snapshot(self.root)
+        if rel is None or rel not in snapshot or not snapshot[rel][0]:
+            return Response(status_code=404)
+        document = ET.fromstring(await request.body())
+        if document.tag != f"{_DAV}sync-collection":
+            return Response(status_code=501)
+        token = (document.findtext(f"{_DAV}sync-token") or "").strip()
+        current = {path: info for path, info in snapshot.items() if path != rel and self._below(path, rel, None)}
+        if not self._tokens or self._tokens[-1] != snapshot:
+            self._tokens.append(snapshot)
+        new_token = f"http://standin/sync/{len(self._tokens) - 1}"
+
+        if token:
+            try:
+                index = int(token.rsplit("/", 1)[1])
+                previous = self._tokens[index]
+            except (IndexError, ValueError):
+                return Response(
+                    '<?xml version="1.0"?><d:error xmlns:d="DAV:"><d:valid-sync-token/></d:error>',
+                    status_code=403,
+                    media_type="application/xml",
+                )
+            old = {path: info for path, info in previous.items() if path != rel and self._below(path, rel, None)}
+        else:
+            old = {}
+        parts = [
+            self._response_xml(path, info)
+            for path, info in sorted(current.items())
+            if old.get(path, (None, None))[1] != info[1]
+        ]
+        parts.extend(
+            f"<d:response><d:href>{escape(self._href(path, info[0]))}</d:href>"
+            "<d:status>HTTP/1.1 404 Not Found</d:status></d:response>"
+            for path, info in sorted(old.items())
+            if path not in current
+        )
+        return self._multistatus("".join(parts) + f"<d:sync-token>{escape(new_token)}</d:sync-token>")
+
+    async def get(self, request: Request) -> Response:
+        rel = self._relative(request)
+        target = self.root / rel if rel is not None else None
+        if target is None or not target.is_file():
+            return Response(status_code=404)
+        return FileResponse(target)
+
+    async def dispatch(self, request: Request) -> Response:
+        handler = {"PROPFIND": self.propfind, "REPORT": self.report, "GET": self.get}.get(request.method)
+        if handler is None:
+            return Response(status_code=405)
+        return await handler(request)
+
+
+def create_app(
+    root: Path,
+    *,
+    prefix: str = DEFAULT_PREFIX,
+    depth_infinity: bool = True,
+    sync_collection: bool = True,
+) -> Starlette:
+    standin = _Standin(root, prefix, depth_infinity, sync_collection)
+    return Starlette(
+        routes=[Route("/{path:path}", standin.dispatch, methods=["GET", "PROPFIND", "REPORT"])]
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a directory as a minimal WebDAV server.")
+    parser.add_argument("--root", type=Path, required=True, help="Directory to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="URL path the directory is served under")
+    parser.add_argument("--no-depth-infinity", action="store_true", help="Refuse Depth: infinity like Nextcloud")
+    parser.add_argument("--no-sync-collection", action="store_true", help="Answer sync-collection with 501")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(
+            args.root,
+            prefix=args.prefix,
+            depth_infinity=not args.no_depth_infinity,
+            sync_collection=not args.no_sync_collection,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()